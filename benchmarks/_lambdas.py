@@ -0,0 +1,63 @@
+"""
+Utilidades compartidas por los benchmarks.
+Carga cada lambda_function.py como módulo independiente (todas se llaman
+igual) con lambdas/common en el path, igual que dentro del ZIP.
+"""
+import os
+import sys
+import json
+import importlib.util
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDAS_DIR = os.path.join(REPO_ROOT, 'lambdas')
+COMMON_DIR = os.path.join(LAMBDAS_DIR, 'common')
+
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+_loaded = {}
+
+def load_lambda(name):
+    """Importa lambdas/<name>/lambda_function.py como '<name>_lambda'."""
+    if name not in _loaded:
+        path = os.path.join(LAMBDAS_DIR, name, 'lambda_function.py')
+        spec = importlib.util.spec_from_file_location(f'{name}_lambda', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _loaded[name] = module
+    return _loaded[name]
+
+def api_event(method, path, body=None, query=None):
+    """Evento mínimo de API Gateway (v1) para invocar un lambda_handler."""
+    return {
+        'httpMethod': method,
+        'path': path,
+        'queryStringParameters': query,
+        'body': json.dumps(body) if body is not None else None,
+    }
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+AUDIT_TABLE_NAME = 'SmartLocker_AuditLogs'
+
+def ensure_audit_table(table_name=AUDIT_TABLE_NAME):
+    """Crea la tabla de auditoría en DynamoDB Local (DYNAMODB_ENDPOINT_URL) si no existe."""
+    import boto3
+    dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ['DYNAMODB_ENDPOINT_URL'])
+    if table_name in [t.name for t in dynamodb.tables.all()]:
+        return dynamodb.Table(table_name)
+    table = dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'locker_id', 'KeyType': 'HASH'},
+                   {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[{'AttributeName': 'locker_id', 'AttributeType': 'S'},
+                              {'AttributeName': 'timestamp', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    table.wait_until_exists()
+    return table
@@ -0,0 +1,155 @@
+"""
+Benchmark del write-behind de access_logs (audit_sink.AccessLogSink).
+
+Lanza intentos de acceso contra el Lambda de seguridad (con IP y
+User-Agent en el evento, como API Gateway) en tres modos y compara la
+latencia por request:
+  off         ACCESS_LOG_ENABLED=0: sin escritura en access_logs (referencia)
+  invocation  el modo por defecto: INSERT + commit al final de cada
+              invocación, con la respuesta ya armada
+  background  ACCESS_LOG_BACKGROUND_FLUSH=1 (opt-in): encola y un hilo
+              escribe en lotes multi-fila con su propia conexión
+Después de cada modo espera a que se vacíe el buffer y cuenta las filas
+nuevas en access_logs (deben ser una por intento) y el promedio de filas
+por INSERT. DynamoDB se reemplaza por un sink nulo: solo se mide MySQL.
+
+Requiere una BD MySQL local con el schema aplicado y las variables
+RDS_HOST, RDS_USER, RDS_PASSWORD, RDS_DB_NAME.
+
+Uso:
+    python benchmarks/bench_access_log.py --attempts 2000
+    python benchmarks/bench_access_log.py --attempts 5000 --max-overhead-ms 2
+Sale con código 1 si faltan filas o si el modo por defecto (invocation)
+agrega más de --max-overhead-ms al p50 respecto de off.
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('METRICS_ENABLED', '0')
+# Sin throttling: cada intento (incluidos los fallidos) debe llegar a access_logs
+os.environ.setdefault('THROTTLE_LOCKER_MAX_FAILURES', '1000000000')
+os.environ.setdefault('THROTTLE_IP_MAX_FAILURES', '1000000000')
+from _lambdas import load_lambda, api_event, percentile
+
+import db_utils
+from audit_sink import AuditSink, AccessLogSink
+
+LOCKER_CODE = 'BENCH-ACCESS-LOG'
+VALID_OTP = '123456'
+USER_AGENT = 'bench-access-log/1.0'
+
+class NullAuditSink(AuditSink):
+    """AuditSink que descarta los lotes: el benchmark no depende de DynamoDB."""
+
+    def _write_batch(self, items):
+        pass
+
+def setup():
+    """Locker ocupado con OTP legacy conocido, válido 10 minutos."""
+    salt = os.urandom(16).hex()
+    otp_hash = hashlib.sha256((VALID_OTP + salt).encode('utf-8')).hexdigest()
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("INSERT IGNORE INTO lockers (code, status, created_at) VALUES (%s, 'available', NOW())",
+                        (LOCKER_CODE,))
+            cur.execute("""
+                UPDATE lockers SET status='occupied', current_otp_hash=%s, otp_salt=%s, otp_secret=NULL,
+                    otp_valid_until=DATE_ADD(NOW(), INTERVAL 10 MINUTE), updated_at=NOW()
+                WHERE code=%s
+            """, (otp_hash, salt, LOCKER_CODE))
+            conn.commit()
+            cur.execute("SELECT id FROM lockers WHERE code=%s", (LOCKER_CODE,))
+            return cur.fetchone()['id']
+    finally:
+        conn.close()
+
+def logged_rows(locker_id):
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) AS n FROM access_logs WHERE locker_id = %s AND user_agent = %s",
+                        (locker_id, USER_AGENT))
+            return cur.fetchone()['n']
+    finally:
+        conn.close()
+
+def attempt_event(locker_id, i, valid_every):
+    otp = VALID_OTP if valid_every and i % valid_every == 0 else f'{i % 1000000:06d}x'
+    event = api_event('POST', f'/security/lockers/{locker_id}/access-attempt', {'otp': otp})
+    event['headers'] = {'User-Agent': USER_AGENT}
+    event['requestContext'] = {'identity': {'sourceIp': f'10.0.{i % 250}.{i % 200 + 1}'}}
+    return event
+
+def run(security, locker_id, mode, attempts, valid_every):
+    sink = AccessLogSink(background=(mode == 'background'), enabled=(mode != 'off'))
+    security.access_log = sink
+    # Sin cache OTP: todos los modos leen MySQL igual en cada intento
+    security.locker_cache = security.LockerStateCache(0, security.OTP_CACHE_TTL_SECONDS)
+    before = logged_rows(locker_id)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(attempts):
+        event = attempt_event(locker_id, i, valid_every)
+        t0 = time.perf_counter()
+        security.lambda_handler(event, None)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+
+    # El hilo termina los lotes pendientes; luego se cuentan las filas
+    deadline = time.monotonic() + 30
+    while sink.pending() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    sink.flush()
+    return {
+        'mode': mode,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'rps': attempts / elapsed,
+        'rows': logged_rows(locker_id) - before,
+        'stats': dict(sink.stats),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attempts', type=int, default=2000)
+    parser.add_argument('--valid-every', type=int, default=10)
+    parser.add_argument('--max-overhead-ms', type=float, default=5.0,
+                        help='sobrecosto máximo aceptado del modo invocation sobre off (p50)')
+    args = parser.parse_args()
+
+    security = load_lambda('security')
+    security.audit_sink = NullAuditSink(security.AUDIT_TABLE_NAME, background=False)
+    locker_id = setup()
+    # Calentamiento: conexión, secreto y encoder ya listos antes de medir
+    run(security, locker_id, 'off', 50, args.valid_every)
+
+    results = {}
+    failed = False
+    for mode in ('off', 'invocation', 'background'):
+        r = results[mode] = run(security, locker_id, mode, args.attempts, args.valid_every)
+        expected = 0 if mode == 'off' else args.attempts
+        rows_per_insert = r['stats']['written'] / max(r['stats']['batches'], 1)
+        ok = r['rows'] == expected
+        failed |= not ok
+        print(f"{mode:10s} p50={r['p50']:7.3f}ms  p99={r['p99']:7.3f}ms  {r['rps']:8.0f} req/s  "
+              f"filas={r['rows']}/{expected} {'OK' if ok else 'FALLA'}  "
+              f"filas por INSERT={rows_per_insert:.1f}  descartadas={r['stats']['dropped']}")
+
+    off = results['off']
+    for mode in ('invocation', 'background'):
+        print(f"{mode:10s} sobrecosto p50={results[mode]['p50'] - off['p50']:+.3f}ms  "
+              f"p99={results[mode]['p99'] - off['p99']:+.3f}ms")
+    overhead = results['invocation']['p50'] - off['p50']
+    if overhead > args.max_overhead_ms:
+        print(f"FALLA: invocation agrega {overhead:.3f}ms al p50 (máximo {args.max_overhead_ms}ms)")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Benchmark de contención en la asignación de lockers.
+
+N hilos (usuarios) compiten por M lockers. Se compara la versión anterior
+(SELECT usuario + SELECT estado + UPDATE) con el UPDATE condicional único
+de lockers/lambda_function.assign_locker.
+
+Requiere una BD MySQL local con el schema aplicado y las variables
+RDS_HOST, RDS_USER, RDS_PASSWORD, RDS_DB_NAME.
+
+Uso:
+    python benchmarks/bench_assign_contention.py --threads 64 --lockers 32
+Sale con código 1 si la versión atómica produce doble asignación.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AUTH_TOKEN_SECRET', 'benchmark-secret')
+from _lambdas import load_lambda, api_event
+
+import db_utils
+import auth_tokens
+
+CODE_PREFIX = 'BENCH-'
+EMAIL_DOMAIN = '@bench.local'
+
+def setup(n_users, n_lockers):
+    """Crea/resetea lockers y usuarios sintéticos; devuelve (user_ids, locker_ids)."""
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE lockers SET status='available', current_user_id=NULL WHERE code LIKE %s",
+                        (CODE_PREFIX + '%',))
+            cur.executemany(
+                "INSERT IGNORE INTO lockers (code, status, created_at) VALUES (%s, 'available', NOW())",
+                [(f'{CODE_PREFIX}{i}',) for i in range(n_lockers)]
+            )
+            cur.executemany(
+                "INSERT IGNORE INTO users (email, password_hash, name, role, created_at) "
+                "VALUES (%s, 'x$x', %s, 'user', NOW())",
+                [(f'bench{i}{EMAIL_DOMAIN}', f'Bench {i}') for i in range(n_users)]
+            )
+            conn.commit()
+            cur.execute("SELECT id FROM lockers WHERE code LIKE %s ORDER BY id LIMIT %s",
+                        (CODE_PREFIX + '%', n_lockers))
+            locker_ids = [r['id'] for r in cur.fetchall()]
+            cur.execute("SELECT id FROM users WHERE email LIKE %s ORDER BY id LIMIT %s",
+                        ('%' + EMAIL_DOMAIN, n_users))
+            user_ids = [r['id'] for r in cur.fetchall()]
+        return user_ids, locker_ids
+    finally:
+        conn.close()
+
+def occupied_count():
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) AS n FROM lockers WHERE code LIKE %s AND status='occupied'",
+                        (CODE_PREFIX + '%',))
+            return cur.fetchone()['n']
+    finally:
+        conn.close()
+
+def legacy_assign(user_id, locker_id):
+    """Versión anterior: tres round trips con ventana de carrera entre ellos."""
+    conn = db_utils.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM lockers WHERE current_user_id = %s", (user_id,))
+            if cur.fetchone():
+                return 409
+            cur.execute("SELECT status FROM lockers WHERE id = %s", (locker_id,))
+            locker = cur.fetchone()
+            if not locker or locker['status'] != 'available':
+                return 409
+            cur.execute("UPDATE lockers SET status='occupied', current_user_id=%s WHERE id=%s",
+                        (user_id, locker_id))
+            conn.commit()
+            return 200
+    except Exception:
+        return 500
+    finally:
+        db_utils.release_db_connection(conn)
+
+def atomic_assign(user_id, locker_id):
+    lockers = load_lambda('lockers')
+    event = api_event('POST', '/lockers/assign', {'user_id': user_id, 'locker_id': locker_id, 'days': 1})
+    event['headers'] = {'Authorization': f'Bearer {auth_tokens.issue_token(user_id, "user")}'}
+    return lockers.lambda_handler(event, None)['statusCode']
+
+def run(assign_fn, user_ids, locker_ids):
+    """Cada hilo intenta lockers en orden aleatorio hasta conseguir uno."""
+    successes = []
+    start_barrier = threading.Barrier(len(user_ids))
+
+    def worker(user_id):
+        order = list(locker_ids)
+        random.shuffle(order)
+        start_barrier.wait()
+        for locker_id in order:
+            if assign_fn(user_id, locker_id) == 200:
+                successes.append((user_id, locker_id))
+                return
+
+    threads = [threading.Thread(target=worker, args=(u,)) for u in user_ids]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return successes, elapsed
+
+def report(label, successes, elapsed):
+    occupied = occupied_count()
+    doubles = len(successes) - occupied
+    print(f"{label:8s} asignaciones={len(successes):5d} ocupados={occupied:5d} "
+          f"doble_asignacion={doubles:4d} tiempo={elapsed:.3f}s "
+          f"asign/s={len(successes) / elapsed if elapsed else 0:.1f}")
+    return doubles
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--lockers', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    user_ids, locker_ids = setup(args.threads, args.lockers)
+    legacy_doubles = report('legacy', *run(legacy_assign, user_ids, locker_ids))
+
+    user_ids, locker_ids = setup(args.threads, args.lockers)
+    atomic_doubles = report('atomic', *run(atomic_assign, user_ids, locker_ids))
+
+    setup(0, args.lockers)
+    if atomic_doubles:
+        print("FALLO: la asignación atómica produjo doble asignación")
+        return 1
+    if legacy_doubles:
+        print(f"(la versión anterior produjo {legacy_doubles} dobles asignaciones)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Benchmark de arranque en frío con credenciales desde un secreto (db_utils.get_db_config).
+
+Cada "contenedor" es un proceso nuevo que importa db_utils y simula N
+invocaciones seguidas. El secreto se lee del sustituto local
+(RDS_SECRET_ID=file://...) con una latencia agregada que imita a Secrets
+Manager (--fetch-latency-ms), o de Secrets Manager/LocalStack real si se
+pasa --secret-id. Reporta la latencia de la primera invocación contra las
+siguientes y cuántas bajadas hizo cada contenedor (debe ser 1).
+
+Escenarios:
+  cold     N invocaciones por contenedor: solo la primera paga la bajada
+  refresh  TTL corto: la renovación ocurre en segundo plano sin bloquear
+  rotate   (requiere MySQL, --with-db) el secreto cacheado trae una contraseña
+           vieja; el acceso denegado fuerza una relectura y la conexión sale
+
+Uso:
+    python benchmarks/bench_cold_start.py --containers 10 --invocations 50 --fetch-latency-ms 60
+    python benchmarks/bench_cold_start.py --with-db        # RDS_* con un MySQL local
+Sale con código 1 si algún contenedor baja el secreto en línea más de una vez.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))] if ordered else 0.0
+
+# --- proceso hijo: un contenedor ---
+
+def child(args):
+    sys.path.insert(0, HERE)
+    import _lambdas  # agrega lambdas/common al path
+    import db_utils
+
+    real_fetch = db_utils._fetch_secret
+
+    def slow_fetch(secret_id):
+        time.sleep(args.fetch_latency_ms / 1000.0)
+        return real_fetch(secret_id)
+
+    if args.secret_id.startswith('file://'):
+        db_utils._fetch_secret = slow_fetch
+
+    result = {'invocations_ms': [], 'inline_fetches': 0}
+    if args.scenario == 'rotate':
+        # El secreto cacheado tiene la contraseña vieja; el archivo ya tiene la nueva
+        db_utils.get_secret(args.secret_id)
+        with open(args.secret_id[len('file://'):], 'w') as f:
+            json.dump(json.loads(os.environ['BENCH_ROTATED_SECRET']), f)
+        started = time.perf_counter()
+        conn = db_utils.get_db_connection()
+        result['invocations_ms'].append((time.perf_counter() - started) * 1000)
+        db_utils.release_db_connection(conn)
+    else:
+        for _ in range(args.invocations):
+            fetches_before = db_utils.secret_stats['fetches'] - db_utils.secret_stats['background_refreshes']
+            started = time.perf_counter()
+            if args.with_db:
+                conn = db_utils.get_db_connection()
+                db_utils.release_db_connection(conn)
+            else:
+                db_utils.get_db_config()
+            result['invocations_ms'].append((time.perf_counter() - started) * 1000)
+            inline = db_utils.secret_stats['fetches'] - db_utils.secret_stats['background_refreshes'] - fetches_before
+            result['inline_fetches'] += max(inline, 0)
+            if args.interval_ms:
+                time.sleep(args.interval_ms / 1000.0)
+        # Dejar terminar una renovación en curso para contarla
+        time.sleep(args.fetch_latency_ms / 1000.0 * 2)
+    result['stats'] = dict(db_utils.secret_stats)
+    print(json.dumps(result))
+    return 0
+
+# --- proceso padre ---
+
+def write_secret(path, password):
+    secret = {
+        'username': os.environ.get('RDS_USER', 'bench'),
+        'password': password,
+        'host': os.environ.get('RDS_HOST', '127.0.0.1'),
+        'port': int(os.environ.get('RDS_PORT', '3306')),
+        'dbname': os.environ.get('RDS_DB_NAME', 'smartlocker_db'),
+    }
+    with open(path, 'w') as f:
+        json.dump(secret, f)
+    return secret
+
+def run_container(args, scenario, env):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', '--scenario', scenario,
+           '--invocations', str(args.invocations), '--fetch-latency-ms', str(args.fetch_latency_ms),
+           '--secret-id', env['RDS_SECRET_ID'], '--interval-ms', str(args.interval_ms if scenario == 'refresh' else 0)]
+    if args.with_db:
+        cmd.append('--with-db')
+    started = time.perf_counter()
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else 'proceso hijo falló')
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+def report(label, results):
+    first = [r['invocations_ms'][0] for r in results]
+    rest = [ms for r in results for ms in r['invocations_ms'][1:]]
+    inline = [r['inline_fetches'] for r in results]
+    print(f"\n{label}: {len(results)} contenedores")
+    print(f"  1ª invocación   p50={percentile(first, 50):8.2f}ms  max={max(first):8.2f}ms")
+    if rest:
+        print(f"  siguientes      p50={percentile(rest, 50):8.3f}ms  p99={percentile(rest, 99):8.3f}ms  "
+              f"max={max(rest):8.3f}ms")
+    print(f"  bajadas en línea por contenedor: {sorted(set(inline))}  "
+          f"renovaciones en segundo plano: {sum(r['stats']['background_refreshes'] for r in results)}")
+    return inline
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--containers', type=int, default=10)
+    parser.add_argument('--invocations', type=int, default=50)
+    parser.add_argument('--fetch-latency-ms', type=float, default=50.0, help='latencia simulada de Secrets Manager')
+    parser.add_argument('--interval-ms', type=float, default=100.0, help='pausa entre invocaciones (refresh)')
+    parser.add_argument('--secret-id', help='secreto real (Secrets Manager o SECRETSMANAGER_ENDPOINT_URL)')
+    parser.add_argument('--with-db', action='store_true', help='abrir la conexión a MySQL en cada invocación')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--scenario', default='cold', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    tmp_dir = tempfile.mkdtemp(prefix='bench-secret-')
+    secret_path = os.path.join(tmp_dir, 'rds.json')
+    secret = write_secret(secret_path, os.environ.get('RDS_PASSWORD', 'bench-password'))
+    env = dict(os.environ, METRICS_ENABLED='0',
+               RDS_SECRET_ID=args.secret_id or f'file://{secret_path}')
+    if args.secret_id:
+        args.fetch_latency_ms = 0
+
+    failed = False
+    cold = [run_container(args, 'cold', env) for _ in range(args.containers)]
+    failed |= any(n != 1 for n in report('cold (TTL por defecto)', cold))
+
+    refresh_env = dict(env, SECRET_TTL_SECONDS='1', SECRET_REFRESH_AHEAD_SECONDS='0.5')
+    refresh = [run_container(args, 'refresh', refresh_env) for _ in range(max(1, args.containers // 5))]
+    inline = report(f"refresh (TTL 1s, {args.invocations} invocaciones cada {args.interval_ms:.0f}ms)", refresh)
+    failed |= any(n != 1 for n in inline)
+
+    if args.with_db and not args.secret_id:
+        # Archivo con una contraseña vieja; el hijo lo reescribe con la buena ya cacheada la vieja
+        write_secret(secret_path, 'contraseña-vieja')
+        rotate_env = dict(env, BENCH_ROTATED_SECRET=json.dumps(secret))
+        result = run_container(args, 'rotate', rotate_env)
+        ok = result['stats']['auth_refreshes'] == 1
+        print(f"\nrotate: conexión en {result['invocations_ms'][0]:.1f}ms tras "
+              f"{result['stats']['auth_refreshes']} relectura por acceso denegado {'OK' if ok else 'FALLA'}")
+        failed |= not ok
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
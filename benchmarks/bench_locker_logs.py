@@ -0,0 +1,151 @@
+"""
+Benchmark del historial por locker (GET /admin/lockers/{id}/logs).
+
+Carga N items de auditoría en DynamoDB Local con la misma forma que escribe
+security (locker_id + sort key de audit_sort_key) y pagina el historial de un locker
+"caliente" a través del Lambda admin. Verifica que solo se use Query (un
+Scan hace fallar la corrida), que el orden sea del más reciente al más
+viejo sin repetidos entre páginas, y que el filtro por status y el rango de
+tiempo se respeten. Reporta latencia por página.
+
+Requiere DYNAMODB_ENDPOINT_URL (ej. http://localhost:8000).
+
+Uso:
+    python benchmarks/bench_locker_logs.py --items 1000000 --lockers 200 --pages 50
+    python benchmarks/bench_locker_logs.py --skip-load --pages 200
+Sale con código 1 si encuentra un Scan o un error de orden/paginación.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AUTH_TOKEN_SECRET', 'benchmark-secret')
+os.environ.setdefault('METRICS_ENABLED', '0')
+from _lambdas import load_lambda, api_event, percentile, ensure_audit_table
+
+import auth_tokens
+from audit_sink import audit_sort_key
+
+STATUSES = [('SUCCESS', 70), ('FAILED', 20), ('EXPIRED', 5), ('THROTTLED', 5)]
+HOT_LOCKER = '1'
+
+class QueryOnlyTable:
+    """Envuelve la tabla: cuenta los Query y falla ante cualquier Scan."""
+
+    def __init__(self, table):
+        self._table = table
+        self.queries = 0
+
+    def query(self, **kwargs):
+        self.queries += 1
+        return self._table.query(**kwargs)
+
+    def scan(self, **kwargs):
+        raise AssertionError('El historial por locker no debe usar Scan')
+
+def load_items(table, n_items, n_lockers, hot_share, seed):
+    """El locker caliente recibe hot_share de los items; el resto se reparte."""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    names, weights = [s for s, _ in STATUSES], [w for _, w in STATUSES]
+    t0 = time.perf_counter()
+    with table.batch_writer() as batch:
+        for i in range(n_items):
+            locker_id = HOT_LOCKER if rng.random() < hot_share else str(rng.randint(2, n_lockers))
+            status = rng.choices(names, weights)[0]
+            item = {
+                'locker_id': locker_id,
+                'timestamp': audit_sort_key(start + timedelta(microseconds=i * 2500)),
+                'status': status,
+                'reason': 'OTP válido' if status == 'SUCCESS' else 'OTP incorrecto',
+            }
+            if status == 'THROTTLED':
+                item['count'] = rng.randint(1, 20)
+            batch.put_item(Item=item)
+    elapsed = time.perf_counter() - t0
+    print(f"carga: {n_items} items en {elapsed:.1f}s ({n_items / elapsed:,.0f} items/s)")
+
+def page_through(admin, token, query, max_pages):
+    """Pagina con el cursor; devuelve (items, latencias_ms, problemas)."""
+    items, latencies, problems = [], [], []
+    cursor = None
+    for _ in range(max_pages):
+        params = dict(query, **({'cursor': cursor} if cursor else {}))
+        event = api_event('GET', f'/admin/lockers/{HOT_LOCKER}/logs', query=params)
+        event['headers'] = {'Authorization': f'Bearer {token}'}
+        t0 = time.perf_counter()
+        response = admin.lambda_handler(event, None)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if response['statusCode'] != 200:
+            problems.append(f"status {response['statusCode']}: {response['body']}")
+            break
+        body = json.loads(response['body'])
+        items.extend(body['items'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    stamps = [item['id'] for item in items]
+    descending = query.get('order') != 'asc'
+    if stamps != sorted(stamps, reverse=descending):
+        problems.append('orden incorrecto entre páginas')
+    if len(stamps) != len(set(stamps)):
+        problems.append('items repetidos entre páginas')
+    return items, latencies, problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=1000000)
+    parser.add_argument('--lockers', type=int, default=200)
+    parser.add_argument('--hot-share', type=float, default=0.05, help='fracción de items del locker caliente')
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-load', action='store_true', help='usar los items ya cargados')
+    args = parser.parse_args()
+
+    if not os.environ.get('DYNAMODB_ENDPOINT_URL'):
+        print("Falta DYNAMODB_ENDPOINT_URL (DynamoDB Local)")
+        return 2
+
+    table = ensure_audit_table()
+    if not args.skip_load:
+        load_items(table, args.items, args.lockers, args.hot_share, args.seed)
+
+    admin = load_lambda('admin')
+    guard = QueryOnlyTable(table)
+    admin._audit_table = guard
+    token = auth_tokens.issue_token(0, 'admin', 'Bench Admin', 'admin@bench.local')
+
+    scenarios = [
+        ('recientes', {'limit': str(args.limit)}),
+        ('solo FAILED', {'limit': str(args.limit), 'status': 'FAILED'}),
+        ('rango 1 día', {'limit': str(args.limit), 'from': '2026-01-01', 'to': '2026-01-01'}),
+        ('ascendente', {'limit': str(args.limit), 'order': 'asc'}),
+    ]
+    failed = False
+    for label, query in scenarios:
+        queries_before = guard.queries
+        try:
+            items, latencies, problems = page_through(admin, token, query, args.pages)
+        except AssertionError as e:
+            items, latencies, problems = [], [], [str(e)]
+        if query.get('status') and any(item['status'] != query['status'] for item in items):
+            problems.append('el filtro de status dejó pasar otros estados')
+        if query.get('to') and any(item['timestamp'] > query['to'] + 'T23:59:59.999999' for item in items):
+            problems.append('items fuera del rango pedido')
+        print(f"{label:12s} páginas={len(latencies):4d} items={len(items):6d} "
+              f"queries={guard.queries - queries_before:4d} "
+              f"p50={percentile(latencies, 50):7.2f}ms p95={percentile(latencies, 95):7.2f}ms")
+        for problem in problems:
+            print(f"  FALLA: {problem}")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Benchmark de la cache de estado OTP del Lambda de seguridad.
+
+Lanza una ráfaga de intentos (mayoría de códigos incorrectos, algunos
+correctos) contra un mismo locker, con la cache apagada y encendida, y
+compara lecturas a MySQL y latencia. Con la cache, los rechazos dentro del
+TTL no leen MySQL; los accesos concedidos siempre releen la fila.
+
+Requiere una BD MySQL local con el schema aplicado y las variables
+RDS_HOST, RDS_USER, RDS_PASSWORD, RDS_DB_NAME.
+
+Uso:
+    python benchmarks/bench_otp_cache.py --attempts 2000 --valid-every 50
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lambdas import load_lambda, api_event, percentile
+
+import db_utils
+
+LOCKER_CODE = 'BENCH-CACHE'
+VALID_OTP = '123456'
+
+def setup():
+    """Deja un locker ocupado con OTP legacy conocido, válido 10 minutos."""
+    salt = os.urandom(16).hex()
+    otp_hash = hashlib.sha256((VALID_OTP + salt).encode('utf-8')).hexdigest()
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("INSERT IGNORE INTO lockers (code, status, created_at) VALUES (%s, 'available', NOW())",
+                        (LOCKER_CODE,))
+            cur.execute("""
+                UPDATE lockers SET status='occupied', current_otp_hash=%s, otp_salt=%s, otp_secret=NULL,
+                    otp_valid_until=DATE_ADD(NOW(), INTERVAL 10 MINUTE), updated_at=NOW()
+                WHERE code=%s
+            """, (otp_hash, salt, LOCKER_CODE))
+            conn.commit()
+            cur.execute("SELECT id FROM lockers WHERE code=%s", (LOCKER_CODE,))
+            return cur.fetchone()['id']
+    finally:
+        conn.close()
+
+def run(security, locker_id, attempts, valid_every, cache_size):
+    security.locker_cache = security.LockerStateCache(cache_size, security.OTP_CACHE_TTL_SECONDS)
+    reads = [0]
+    original_fetch = security.fetch_locker_state
+
+    def counting_fetch(lid):
+        reads[0] += 1
+        return original_fetch(lid)
+
+    security.fetch_locker_state = counting_fetch
+    latencies = []
+    granted = 0
+    try:
+        for i in range(attempts):
+            otp = VALID_OTP if valid_every and i % valid_every == 0 else f'{i % 1000000:06d}x'
+            event = api_event('POST', f'/security/lockers/{locker_id}/access-attempt', {'otp': otp})
+            t0 = time.perf_counter()
+            response = security.lambda_handler(event, None)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            granted += response['statusCode'] == 200
+    finally:
+        security.fetch_locker_state = original_fetch
+    return reads[0], granted, latencies, security.locker_cache.stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attempts', type=int, default=2000)
+    parser.add_argument('--valid-every', type=int, default=50)
+    args = parser.parse_args()
+
+    security = load_lambda('security')
+    locker_id = setup()
+
+    for label, size in (('sin cache', 0), ('con cache', security.OTP_CACHE_SIZE or 1024)):
+        reads, granted, latencies, stats = run(security, locker_id, args.attempts, args.valid_every, size)
+        print(f"{label:10s} intentos={args.attempts} lecturas_bd={reads} "
+              f"concedidos={granted} "
+              f"p50={percentile(latencies, 50):.2f}ms p95={percentile(latencies, 95):.2f}ms stats={stats}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Benchmark de serialización y compresión de respuestas (db_utils.format_response).
+
+Arma páginas del listado admin (GET /admin/lockers) con la misma forma que
+devuelve PyMySQL (datetime, Decimal, None) y mide por tamaño de página el
+tiempo de CPU de format_response con:
+  - legacy: json.dumps(body, default=str), el camino anterior
+  - stdlib: json con encoder precompilado y separadores compactos
+  - orjson: si está instalado
+cada uno con fechas 'sql' (formato histórico) e 'iso' (JSON_DATETIME_FORMAT),
+y el tamaño del payload sin comprimir y con gzip+base64 (compress_response).
+Verifica además que cada encoder produzca el mismo JSON que su referencia.
+
+No requiere BD.
+
+Uso:
+    python benchmarks/bench_serialization.py --rows 100,500,5000 --repeat 200
+    python benchmarks/bench_serialization.py --json serialization.json
+Sale con código 1 si algún encoder produce un JSON distinto al esperado.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from decimal import Decimal
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('METRICS_ENABLED', '0')
+import _lambdas  # agrega lambdas/common al path
+
+import db_utils
+
+GZIP_EVENT = {'headers': {'Accept-Encoding': 'gzip, deflate, br'}}
+
+def admin_page(n_rows, seed):
+    """Filas de get_all_lockers (DEFAULT_LIST_FIELDS) más columnas de fechas del detalle."""
+    rng = random.Random(seed)
+    base = datetime(2026, 3, 1, 8, 0, 0)
+    rows = []
+    for i in range(n_rows):
+        occupied = rng.random() < 0.6
+        assigned = base + timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+        rows.append({
+            'id': i + 1,
+            'code': f'LK-{i + 1:05d}',
+            'status': 'occupied' if occupied else 'available',
+            'expires_at': assigned + timedelta(days=rng.randint(1, 7)) if occupied else None,
+            'assigned_at': assigned if occupied else None,
+            'updated_at': assigned,
+            'color_hex': f'#{rng.randint(0, 0xFFFFFF):06X}' if occupied else None,
+            'user_name': f'Usuario {i}' if occupied else None,
+            'user_email': f'usuario{i}@ejemplo.com' if occupied else None,
+            'monthly_fee': Decimal('12.50'),
+        })
+    return {'items': rows, 'next_cursor': 'TEstMDAxMDA='}
+
+def legacy_encode(body):
+    return json.dumps(body, default=str)
+
+def cpu_ms(fn, body, repeat):
+    """Mejor tiempo de CPU (ms) por llamada entre 5 rondas de `repeat` llamadas."""
+    best = None
+    for _ in range(5):
+        started = time.process_time()
+        for _ in range(repeat):
+            fn(body)
+        elapsed = (time.process_time() - started) * 1000 / repeat
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def encoders():
+    """{nombre: (encoder, encoder de referencia para validar el resultado)}."""
+    legacy_iso = lambda body: json.dumps(body, default=db_utils._json_default_iso)
+    found = {'legacy': (legacy_encode, legacy_encode)}
+    names = ['stdlib'] + (['orjson'] if db_utils._load_orjson() is not None else [])
+    for datetime_format, reference in (('sql', legacy_encode), ('iso', legacy_iso)):
+        for name in names:
+            found[f'{name}/{datetime_format}'] = (db_utils.make_json_encoder(name, datetime_format), reference)
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='100,500,5000', help='tamaños de página separados por coma')
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    args = parser.parse_args()
+
+    available = encoders()
+    if db_utils._load_orjson() is None:
+        print("Aviso: orjson no está instalado, solo se comparan legacy y stdlib")
+
+    results, failed = [], False
+    for n_rows in [int(n) for n in args.rows.split(',')]:
+        body = admin_page(n_rows, args.seed)
+        repeat = max(1, args.repeat * 100 // max(n_rows, 100))
+        print(f"\n{n_rows} filas ({repeat} repeticiones)")
+        for name, (encode, reference) in available.items():
+            encoded = encode(body)
+            if json.loads(encoded) != json.loads(reference(body)):
+                print(f"  FALLA: {name} produce un JSON distinto al de referencia")
+                failed = True
+            encode_ms = cpu_ms(encode, body, repeat)
+
+            response = {'statusCode': 200, 'headers': {}, 'body': encoded}
+            gzip_ms = cpu_ms(lambda r: db_utils.compress_response(GZIP_EVENT, r), response, repeat)
+            compressed = db_utils.compress_response(GZIP_EVENT, response)
+            row = {
+                'rows': n_rows,
+                'encoder': name,
+                'encode_cpu_ms': round(encode_ms, 3),
+                'gzip_cpu_ms': round(gzip_ms, 3),
+                'payload_bytes': len(encoded.encode('utf-8')),
+                'gzip_base64_bytes': len(compressed['body']),
+            }
+            results.append(row)
+            print(f"  {name:10s} encode={encode_ms:8.3f}ms  gzip={gzip_ms:8.3f}ms  "
+                  f"payload={row['payload_bytes']:>9,d}B  gzip+b64={row['gzip_base64_bytes']:>8,d}B "
+                  f"({row['gzip_base64_bytes'] / row['payload_bytes']:.0%})")
+
+        legacy = next(r for r in results if r['rows'] == n_rows and r['encoder'] == 'legacy')
+        for r in results:
+            if r['rows'] == n_rows and r['encoder'] != 'legacy':
+                print(f"  {r['encoder']:10s} vs legacy: encode x{legacy['encode_cpu_ms'] / max(r['encode_cpu_ms'], 1e-6):.1f}, "
+                      f"bytes por la red {legacy['payload_bytes']:,d} -> {r['gzip_base64_bytes']:,d}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'results': results, 'orjson': db_utils._load_orjson() is not None}, f, indent=2)
+        print(f"\nResultado guardado en {args.json}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
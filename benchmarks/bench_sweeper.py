@@ -0,0 +1,95 @@
+"""
+Benchmark del barrido de lockers expirados.
+
+Genera N lockers sintéticos (prefijo BENCH-SWEEP-) ocupados, con un
+porcentaje ya expirado, y mide el tiempo del Lambda sweeper.
+
+Requiere una BD MySQL local con el schema aplicado y las variables
+RDS_HOST, RDS_USER, RDS_PASSWORD, RDS_DB_NAME.
+
+Uso:
+    python benchmarks/bench_sweeper.py --lockers 100000 --expired-pct 30 --chunk-size 500
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lambdas import load_lambda
+
+import db_utils
+
+CODE_PREFIX = 'BENCH-SWEEP-'
+INSERT_BATCH = 5000
+
+def setup(n_lockers, expired_pct):
+    """(Re)crea los lockers sintéticos: expired_pct% vencidos hace 1h, el resto en 1 día."""
+    n_expired = n_lockers * expired_pct // 100
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM lockers WHERE code LIKE %s", (CODE_PREFIX + '%',))
+            conn.commit()
+            rows = []
+            for i in range(n_lockers):
+                hours = -1 if i < n_expired else 24
+                rows.append((f'{CODE_PREFIX}{i}', hours))
+                if len(rows) == INSERT_BATCH:
+                    insert_lockers(cur, rows)
+                    rows = []
+            if rows:
+                insert_lockers(cur, rows)
+            conn.commit()
+    finally:
+        conn.close()
+    return n_expired
+
+def insert_lockers(cur, rows):
+    cur.executemany("""
+        INSERT INTO lockers (code, status, assigned_at, expires_at, created_at)
+        VALUES (%s, 'occupied', NOW(), DATE_ADD(NOW(), INTERVAL %s HOUR), NOW())
+    """, rows)
+
+def explain_sweep_query():
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                EXPLAIN SELECT id, current_user_id FROM lockers
+                WHERE status = 'occupied' AND expires_at <= NOW()
+                ORDER BY expires_at LIMIT 500
+            """)
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lockers', type=int, default=100000)
+    parser.add_argument('--expired-pct', type=int, default=30)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    n_expired = setup(args.lockers, args.expired_pct)
+    print(f"setup: {args.lockers} lockers ({n_expired} expirados) en {time.perf_counter() - t0:.1f}s")
+
+    for row in explain_sweep_query():
+        print(f"plan: key={row.get('key')} type={row.get('type')} rows={row.get('rows')} extra={row.get('Extra')}")
+
+    sweeper = load_lambda('sweeper')
+    result = sweeper.sweep_expired_lockers(args.chunk_size)
+    rate = result['swept'] / (result['elapsed_ms'] / 1000.0) if result['elapsed_ms'] else 0
+    print(f"barrido: {result} -> {rate:.0f} lockers/s")
+
+    # Segunda pasada sin pendientes: debe resolverse con un solo rango vacío del índice
+    print(f"barrido vacío: {sweeper.sweep_expired_lockers(args.chunk_size)}")
+
+    status = 0 if result['swept'] == n_expired else 1
+    if status:
+        print(f"FALLO: se esperaban {n_expired} liberados")
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Microbenchmark de verificación de tokens de sesión (common/auth_tokens.py).
+
+Mide verificaciones por segundo con la cache de tokens verificados
+(mismo token repetido, el caso típico de un usuario haciendo polling) y
+sin ella (firma HMAC completa en cada llamada). No necesita BD.
+
+Uso:
+    python benchmarks/bench_token_verify.py --iterations 200000 --users 1000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AUTH_TOKEN_SECRET', 'benchmark-secret')
+import _lambdas  # noqa: F401  (agrega lambdas/common al path)
+
+import auth_tokens
+
+def run(tokens, iterations, cache_size):
+    auth_tokens.VERIFIED_CACHE_SIZE = cache_size
+    auth_tokens._verified.clear()
+    n = len(tokens)
+    t0 = time.perf_counter()
+    for i in range(iterations):
+        auth_tokens.verify_token(tokens[i % n])
+    elapsed = time.perf_counter() - t0
+    return iterations / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+
+    tokens = [auth_tokens.issue_token(i, 'admin' if i == 0 else 'user', f'User {i}', f'u{i}@utez.edu.mx')
+              for i in range(args.users)]
+
+    print(f"sin cache : {run(tokens, args.iterations, 0):,.0f} verificaciones/s")
+    print(f"con cache : {run(tokens, args.iterations, max(args.users, 1)):,.0f} verificaciones/s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
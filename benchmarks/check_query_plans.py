@@ -0,0 +1,212 @@
+"""
+Chequeo de planes de ejecución de las queries calientes (common/queries.py).
+
+Corre EXPLAIN sobre cada sentencia del catálogo contra una BD MySQL
+sembrada y verifica, por tabla del plan, el índice usado y un techo de
+filas estimadas. Sale con código 1 si algún plan se degrada (por ejemplo,
+un full scan nuevo), así que sirve como paso de CI.
+
+Los techos asumen volumen del generador sintético del seeder con su mezcla
+por defecto (~60% ocupados, ~5% de ellos vencidos):
+    python lambdas/seeder/synthetic.py --users 20000 --lockers 20000
+
+Requiere RDS_HOST, RDS_USER, RDS_PASSWORD, RDS_DB_NAME.
+
+Uso:
+    python benchmarks/check_query_plans.py [--only ASSIGN_LOCKER,...] [--json plans.json]
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lambdas import load_lambda
+
+import db_utils
+import queries
+
+# Con menos filas el optimizador prefiere full scans y el chequeo no dice nada
+MIN_ROWS = {'lockers': 1000, 'users': 1000}
+# Queries que MySQL resuelve sin leer filas ('Select tables optimized away')
+OPTIMIZED_AWAY = 'optimized_away'
+
+def sample_params(cur):
+    """Valores reales de la BD para que EXPLAIN estime con datos verdaderos."""
+    cur.execute("SELECT id, current_user_id, code FROM lockers WHERE status = 'occupied' LIMIT 1")
+    occupied = cur.fetchone() or {}
+    cur.execute("SELECT id FROM lockers WHERE status = 'available' LIMIT 1")
+    available = cur.fetchone() or {}
+    cur.execute("SELECT email FROM users WHERE id = %s", (occupied.get('current_user_id'),))
+    user = cur.fetchone() or {}
+    cur.execute(queries.FEED_VERSION)
+    version = (cur.fetchone() or {}).get('version', 0)
+    cur.execute("SELECT id FROM lockers ORDER BY id LIMIT 20")
+    ids = [r['id'] for r in cur.fetchall()]
+    cur.execute("SELECT MAX(id) AS last_id FROM access_logs")
+    last_log_id = (cur.fetchone() or {}).get('last_id') or 0
+    return {
+        'user_id': occupied.get('current_user_id'),
+        'locker_id': occupied.get('id'),
+        'available_id': available.get('id'),
+        'code': occupied.get('code', ''),
+        'email': user.get('email', ''),
+        'since': max(version - 100, 0),
+        'ids': ids,
+        'log_watermark': max(last_log_id - 5000, 0),
+    }
+
+def admin_list(fields, where):
+    """Misma construcción que get_all_lockers del Lambda admin."""
+    list_fields = load_lambda('admin').LOCKER_LIST_FIELDS
+    columns = ', '.join(f"{list_fields[f]} AS {f}" for f in fields)
+    return queries.admin_locker_list(columns, any(f.startswith('user_') for f in fields), where)
+
+def plan_checks(p):
+    """
+    (nombre, sql, params, esperado) donde esperado es
+    {tabla_o_alias: (índices aceptados, techo)}; el techo es un número de
+    filas o (tabla, fracción) relativo al tamaño de la tabla.
+    OPTIMIZED_AWAY marca las queries que MySQL resuelve sin leer filas.
+    """
+    by_user = {'lockers': ({'uq_lockers_current_user'}, 1)}
+    by_pk = {'lockers': ({'PRIMARY'}, 1)}
+    ids = p['ids']
+    default_fields = load_lambda('admin').DEFAULT_LIST_FIELDS
+    return [
+        ('LOCKER_ID_BY_USER', queries.LOCKER_ID_BY_USER, (p['user_id'],), by_user),
+        ('LOCKER_OTP_SECRET_BY_USER', queries.LOCKER_OTP_SECRET_BY_USER, (p['user_id'],), by_user),
+        ('MY_LOCKER_BY_USER', queries.MY_LOCKER_BY_USER, (p['user_id'],), by_user),
+        ('LOCKER_STATUS_BY_ID', queries.LOCKER_STATUS_BY_ID, (p['locker_id'],), by_pk),
+        ('LOCKER_OTP_STATE_BY_ID', queries.LOCKER_OTP_STATE_BY_ID, (p['locker_id'],), by_pk),
+        ('locker_otp_state_by_ids', queries.locker_otp_state_by_ids(len(ids)), ids,
+         {'lockers': ({'PRIMARY'}, len(ids))}),
+        ('RELEASE_LOCKER_BY_ID', queries.RELEASE_LOCKER_BY_ID, (p['locker_id'],), by_pk),
+        ('release_lockers_by_ids', queries.release_lockers_by_ids(len(ids)), ids,
+         {'lockers': ({'PRIMARY'}, len(ids))}),
+        ('ROTATE_LOCKER_OTP', queries.ROTATE_LOCKER_OTP, ('0' * 64, '0' * 32, p['locker_id']), by_pk),
+        ('ASSIGN_LOCKER', queries.ASSIGN_LOCKER,
+         (p['user_id'], p['user_id'], 1, None, None, None, '#000000', p['available_id']),
+         {'l': ({'PRIMARY'}, 1), 'mine': ({'uq_lockers_current_user'}, 1)}),
+        ('FEED_VERSION', queries.FEED_VERSION, (), {'locker_feed_version': ({'PRIMARY'}, 1)}),
+        ('AVAILABLE_LOCKERS', queries.AVAILABLE_LOCKERS, (),
+         {'lockers': ({'idx_lockers_status_expires'}, ('lockers', 0.6))}),
+        ('LOCKERS_CHANGED_SINCE', queries.LOCKERS_CHANGED_SINCE, (p['since'],),
+         {'lockers': ({'idx_lockers_availability_version'}, 1000)}),
+        ('admin_locker_list', admin_list(default_fields, []), (101,),
+         {'l': ({'code'}, 1000), 'u': ({'PRIMARY'}, 1)}),
+        # El ETag recorre la misma página (derived table), no la tabla completa
+        ('admin_locker_page_checksum', queries.admin_locker_page_checksum(admin_list(default_fields, []), default_fields),
+         (101,), {'l': ({'code'}, 1000), 'u': ({'PRIMARY'}, 1)}),
+        ('admin_locker_list[cursor]', admin_list(default_fields, ['l.code > %s']), (p['code'], 101),
+         {'l': ({'code'}, ('lockers', 0.6)), 'u': ({'PRIMARY'}, 1)}),
+        ('admin_locker_list[status]', admin_list(['id', 'code', 'status'], ['l.status = %s']), ('occupied', 101),
+         {'l': ({'code', 'idx_lockers_status_expires'}, ('lockers', 0.7))}),
+        ('admin_locker_list[code_prefix]', admin_list(['id', 'code'], ['l.code LIKE %s']), (p['code'][:3] + '%', 101),
+         {'l': ({'code'}, ('lockers', 0.3))}),
+        ('bulk_lockers_by_ids', queries.bulk_lockers_by_ids(len(ids)), ids,
+         {'lockers': ({'PRIMARY'}, len(ids))}),
+        ('BULK_LOCKERS_BY_CODE_PREFIX', queries.BULK_LOCKERS_BY_CODE_PREFIX, (p['code'][:3] + '%', '', 500),
+         {'lockers': ({'code'}, ('lockers', 0.3))}),
+        # Solo las pendientes (pocas) por el prefijo status de idx_locker_requests_status_created
+        ('BULK_PENDING_REQUESTS', queries.BULK_PENDING_REQUESTS, ('change_time', 0, 500),
+         {'r': ({'idx_locker_requests_status_created', 'PRIMARY'}, 50000), 'l': ({'PRIMARY'}, 1)}),
+        ('EXPIRED_LOCKERS_FOR_UPDATE', queries.EXPIRED_LOCKERS_FOR_UPDATE, (500,),
+         {'lockers': ({'idx_lockers_status_expires'}, ('lockers', 0.1))}),
+        ('USER_ID_BY_EMAIL', queries.USER_ID_BY_EMAIL, (p['email'],), {'users': ({'email'}, 1)}),
+        ('USER_LOGIN_BY_EMAIL', queries.USER_LOGIN_BY_EMAIL, (p['email'],), {'users': ({'email'}, 1)}),
+        ('AUDIT_WATERMARK_FOR_UPDATE', queries.AUDIT_WATERMARK_FOR_UPDATE, ('suspicious_activity',),
+         {'audit_watermarks': ({'PRIMARY'}, 1)}),
+        ('MAX_ACCESS_LOG_ID', queries.MAX_ACCESS_LOG_ID, (), OPTIMIZED_AWAY),
+        # Rango desde el watermark: ~5000 logs nuevos, nunca el historial completo
+        ('NEW_FAILED_ACCESS_LOGS', queries.NEW_FAILED_ACCESS_LOGS,
+         (p['log_watermark'], p['log_watermark'] + 10000, 5000),
+         {'access_logs': ({'PRIMARY'}, 10000)}),
+    ]
+
+def ceiling_rows(ceiling, table_rows):
+    if isinstance(ceiling, tuple):
+        table, fraction = ceiling
+        return max(int(table_rows[table] * fraction), 1)
+    return ceiling
+
+def check_plan(plan, expected, table_rows):
+    """Lista de problemas del plan (vacía = OK)."""
+    if expected == OPTIMIZED_AWAY:
+        if all('optimized away' in (row.get('Extra') or '') for row in plan):
+            return []
+        return [f"se esperaba 'Select tables optimized away', plan: {[row.get('Extra') for row in plan]}"]
+
+    problems = []
+    seen = set()
+    for row in plan:
+        table = row.get('table')
+        if table not in expected:
+            if table and not table.startswith('<'):
+                problems.append(f"tabla inesperada en el plan: {table} (type={row.get('type')})")
+            continue
+        seen.add(table)
+        keys, ceiling = expected[table]
+        limit = ceiling_rows(ceiling, table_rows)
+        if row.get('type') == 'ALL':
+            problems.append(f"{table}: full table scan ({row.get('rows')} filas)")
+        elif row.get('key') not in keys:
+            problems.append(f"{table}: usa {row.get('key')!r}, se esperaba {sorted(keys)}")
+        if row.get('rows') is not None and int(row['rows']) > limit:
+            problems.append(f"{table}: {row['rows']} filas estimadas > techo {limit}")
+    missing = set(expected) - seen
+    if missing:
+        problems.append(f"tablas esperadas que no aparecen en el plan: {sorted(missing)}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='nombres separados por coma')
+    parser.add_argument('--json', help='guarda los planes y el resultado en este archivo')
+    parser.add_argument('--no-analyze', action='store_true', help='no correr ANALYZE TABLE antes')
+    args = parser.parse_args()
+
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            table_rows = {}
+            for table in ('lockers', 'users'):
+                if not args.no_analyze:
+                    cur.execute(f"ANALYZE TABLE {table}")
+                    cur.fetchall()
+                cur.execute(f"SELECT COUNT(*) AS n FROM {table}")
+                table_rows[table] = cur.fetchone()['n']
+            small = [t for t, n in MIN_ROWS.items() if table_rows[t] < n]
+            if small:
+                print(f"BD con pocos datos ({table_rows}); sembrar primero con el generador sintético")
+                return 2
+
+            checks = plan_checks(sample_params(cur))
+            if args.only:
+                wanted = set(args.only.split(','))
+                checks = [c for c in checks if c[0] in wanted]
+
+            results = []
+            for name, sql, params, expected in checks:
+                cur.execute('EXPLAIN ' + sql, params)
+                plan = cur.fetchall()
+                problems = check_plan(plan, expected, table_rows)
+                results.append({'name': name, 'ok': not problems, 'problems': problems, 'plan': plan})
+                summary = ', '.join(f"{r.get('table')}:{r.get('type')}/{r.get('key')}/{r.get('rows')}" for r in plan)
+                print(f"{'OK   ' if not problems else 'FALLA'} {name:32s} {summary}")
+                for problem in problems:
+                    print(f"      - {problem}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'table_rows': table_rows, 'results': results}, f, indent=2, default=str)
+
+    failed = [r['name'] for r in results if not r['ok']]
+    print(f"\n{len(results) - len(failed)}/{len(results)} planes OK")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Chequeo del ruteo a la réplica de lectura (db_utils.get_db_connection('read')).
+
+Pensado para dos MySQL locales: el writer (RDS_HOST/RDS_PORT) y el reader
+(RDS_READER_HOST/RDS_READER_PORT), ambos con el schema aplicado. No hace
+falta replicación entre ellos: sin ella el reader nunca ve las escrituras,
+que es el peor caso de retraso de réplica. Verifica que:
+  1. las lecturas de lockers/admin lleguen al reader (por @@server_id o @@port);
+  2. get_my_locker responda 200 justo después de asignar (pin read-your-writes);
+  3. también sin el pin, como si otro contenedor atendiera la lectura
+     (confirmación en el writer antes de un 404);
+  4. con el reader caído las lecturas caigan al writer y sigan respondiendo.
+
+Uso:
+    RDS_HOST=127.0.0.1 RDS_PORT=3306 RDS_READER_HOST=127.0.0.1 RDS_READER_PORT=3307 \\
+        python benchmarks/check_read_routing.py
+Sale con código 1 si alguna verificación falla.
+"""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AUTH_TOKEN_SECRET', 'benchmark-secret')
+os.environ.setdefault('METRICS_ENABLED', '0')
+from _lambdas import load_lambda, api_event
+
+import db_utils
+import auth_tokens
+
+CODE = 'BENCH-RR-1'
+EMAIL = 'read-routing@bench.local'
+# Puerto sin servidor para simular el reader caído
+DEAD_PORT = 1
+
+def server_identity(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT @@server_id AS server_id, @@port AS port")
+        row = cur.fetchone()
+    return (row['server_id'], row['port'])
+
+def setup():
+    """Usuario y locker de prueba solo en el writer; devuelve (user_id, locker_id)."""
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM lockers WHERE code = %s", (CODE,))
+            cur.execute("DELETE FROM users WHERE email = %s", (EMAIL,))
+            cur.execute("""
+                INSERT INTO users (email, name, password_hash, role, created_at)
+                VALUES (%s, 'Read Routing', 'x', 'user', NOW())
+            """, (EMAIL,))
+            user_id = cur.lastrowid
+            cur.execute("INSERT INTO lockers (code, status, created_at) VALUES (%s, 'available', NOW())", (CODE,))
+            locker_id = cur.lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    return user_id, locker_id
+
+def teardown():
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM lockers WHERE code = %s", (CODE,))
+            cur.execute("DELETE FROM users WHERE email = %s", (EMAIL,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def call(module, method, path, token, body=None, query=None):
+    event = api_event(method, path, body=body, query=query)
+    event['headers'] = {'Authorization': f'Bearer {token}'}
+    response = module.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'] or 'null')
+
+def main():
+    if not db_utils.RDS_READER_HOST:
+        print("Falta RDS_READER_HOST (y RDS_READER_PORT si ambos MySQL están en el mismo host)")
+        return 2
+
+    writer_id = server_identity(db_utils.get_db_connection())
+    reader_id = server_identity(db_utils.get_db_connection('read'))
+    print(f"writer server_id/port={writer_id}  reader server_id/port={reader_id}")
+    if writer_id == reader_id:
+        print("El writer y el reader son el mismo servidor: no se puede verificar el ruteo")
+        return 2
+
+    lockers = load_lambda('lockers')
+    admin = load_lambda('admin')
+    user_id, locker_id = setup()
+    user_token = auth_tokens.issue_token(user_id, 'user', 'Read Routing', EMAIL)
+    admin_token = auth_tokens.issue_token(0, 'admin', 'Bench Admin', 'admin@bench.local')
+    problems = []
+
+    def check(label, ok, detail=''):
+        print(f"{'OK   ' if ok else 'FALLA'} {label}{': ' + detail if detail else ''}")
+        if not ok:
+            problems.append(label)
+
+    try:
+        # 1. Lecturas al reader
+        before = dict(db_utils.connection_stats)
+        call(lockers, 'GET', '/lockers/available', user_token)
+        call(admin, 'GET', '/admin/lockers', admin_token, query={'limit': '10'})
+        served = db_utils.connection_stats['reader'] - before['reader']
+        check('available y listado admin leen del reader', served == 2, f'{served} de 2 lecturas')
+
+        # 2. Read-your-writes en el mismo contenedor
+        status, body = call(lockers, 'POST', '/lockers/assign', user_token,
+                            body={'locker_id': locker_id, 'days': 1})
+        check('asignación en el writer', status == 200, str(body))
+        pinned_before = db_utils.connection_stats['pinned_reads']
+        status, body = call(lockers, 'GET', '/lockers/my-locker', user_token)
+        check('my-locker tras asignar (pin)', status == 200 and body.get('id') == locker_id, f'status {status}')
+        check('la lectura fijada fue al writer', db_utils.connection_stats['pinned_reads'] == pinned_before + 1)
+
+        # 3. Sin pin (otro contenedor): el 404 del reader se confirma en el writer
+        db_utils._writer_pins.clear()
+        status, body = call(lockers, 'GET', '/lockers/my-locker', user_token)
+        check('my-locker sin pin (confirmación en el writer)', status == 200, f'status {status}')
+
+        # 4. Reader caído: las lecturas caen al writer
+        db_utils._discard_connection('reader_conn')
+        db_utils.RDS_READER_PORT = DEAD_PORT
+        before = db_utils.connection_stats['reader_fallbacks']
+        status, _ = call(admin, 'GET', '/admin/lockers', admin_token, query={'limit': '10'})
+        status_2, _ = call(lockers, 'GET', '/lockers/available', user_token)
+        fallbacks = db_utils.connection_stats['reader_fallbacks'] - before
+        check('con el reader caído se responde desde el writer', status == 200 and status_2 == 200,
+              f'status {status}/{status_2}, fallbacks={fallbacks}')
+    finally:
+        teardown()
+
+    print(f"stats: {db_utils.get_connection_stats()}")
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Load test offline de los Lambdas (auth, lockers, admin, security).
+
+Invoca cada lambda_handler en proceso con eventos sintéticos de API
+Gateway (v1, v2 o mezclados) según una mezcla de rutas con pesos, con N
+workers concurrentes (cada hilo equivale a un contenedor: conexión y
+métricas por hilo). Reporta por ruta throughput, p50/p95/p99 y queries por
+request, y guarda el resultado en JSON para comparar corridas.
+
+Requiere MySQL local con el schema aplicado (RDS_HOST, RDS_USER,
+RDS_PASSWORD, RDS_DB_NAME). Para la auditoría de security apuntar
+DYNAMODB_ENDPOINT_URL a DynamoDB Local (--create-audit-table crea la tabla).
+
+Uso:
+    python benchmarks/loadtest --workers 16 --duration 30 --output run.json
+    python benchmarks/loadtest --mix "refresh_otp=45,access_attempt=45,assign=5,admin_list=5" \\
+        --requests 20000 --event-version mixed --baseline run.json --threshold 15
+Sale con código 1 si hay regresiones contra --baseline.
+"""
+import os
+import sys
+import json
+import random
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ.setdefault('AUTH_TOKEN_SECRET', 'benchmark-secret')
+# Sin líneas EMF en stdout: las queries se leen de db_utils.current_metrics()
+os.environ.setdefault('METRICS_ENABLED', '0')
+import _lambdas  # agrega lambdas/common al path
+
+import runner
+from scenarios import SCENARIOS, DEFAULT_MIX, parse_mix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f'ruta=peso separados por coma. Rutas: {", ".join(SCENARIOS)}')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=5000, help='total de requests (ignorado con --duration)')
+    parser.add_argument('--duration', type=float, help='segundos de carga en lugar de un total fijo')
+    parser.add_argument('--event-version', choices=('v1', 'v2', 'mixed'), default='v1')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--lockers', type=int, default=300)
+    parser.add_argument('--holders', type=float, default=0.7, help='fracción de usuarios con locker al iniciar')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='archivo JSON con el resultado')
+    parser.add_argument('--baseline', help='JSON de una corrida previa para detectar regresiones')
+    parser.add_argument('--threshold', type=float, default=20.0, help='%% tolerado antes de marcar regresión')
+    parser.add_argument('--create-audit-table', action='store_true',
+                        help='crea SmartLocker_AuditLogs en DYNAMODB_ENDPOINT_URL si no existe')
+    parser.add_argument('--keep-data', action='store_true', help='no liberar los lockers BENCH-LOAD-* al final')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    random.seed(args.seed)
+
+    if args.create_audit_table:
+        if not os.environ.get('DYNAMODB_ENDPOINT_URL'):
+            parser.error('--create-audit-table requiere DYNAMODB_ENDPOINT_URL')
+        _lambdas.ensure_audit_table()
+    elif not os.environ.get('DYNAMODB_ENDPOINT_URL'):
+        print("Aviso: sin DYNAMODB_ENDPOINT_URL la auditoría de security irá a la DynamoDB de la cuenta")
+
+    world = runner.setup_world(args.users, args.lockers, args.holders)
+    print(f"Preparado: {len(world.holders)} usuarios con locker, {len(world.free_users)} libres, "
+          f"{len(world.locker_ids)} lockers")
+    try:
+        result = runner.run_load(world, mix, args.workers,
+                                 total_requests=None if args.duration else args.requests,
+                                 duration=args.duration, event_version=args.event_version)
+    finally:
+        if not args.keep_data:
+            runner.teardown_world()
+
+    result['config'] = {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}
+    result['environment'] = runner.environment_info()
+    runner.print_report(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Resultado guardado en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = runner.compare(result, json.load(f), args.threshold)
+        if regressions:
+            print("REGRESIONES:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"Sin regresiones contra {args.baseline} (umbral {args.threshold}%)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Eventos sintéticos de API Gateway (REST v1 y HTTP API v2) para invocar
+los lambda_handler igual que en producción.
+"""
+import json
+import random
+import time
+import uuid
+from urllib.parse import urlencode
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148',
+    'SmartLockerController/1.0 (bank-firmware)',
+]
+
+def _headers(token=None, extra=None):
+    headers = {
+        'accept': 'application/json',
+        'accept-encoding': 'gzip, deflate, br',
+        'content-type': 'application/json',
+        'user-agent': random.choice(USER_AGENTS),
+    }
+    if token:
+        headers['authorization'] = f'Bearer {token}'
+    if extra:
+        headers.update({k.lower(): v for k, v in extra.items()})
+    return headers
+
+def build_event(method, path, body=None, query=None, token=None, headers=None,
+                version='v1', source_ip=None):
+    """Evento v1 (path/httpMethod) o v2 (rawPath/requestContext.http)."""
+    source_ip = source_ip or f'10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}'
+    request_headers = _headers(token, headers)
+    raw_body = json.dumps(body) if body is not None else None
+    now_ms = int(time.time() * 1000)
+
+    if version == 'v2':
+        return {
+            'version': '2.0',
+            'routeKey': f'{method} {path}',
+            'rawPath': path,
+            'rawQueryString': urlencode(query or {}),
+            'headers': request_headers,
+            'queryStringParameters': query,
+            'requestContext': {
+                'requestId': str(uuid.uuid4()),
+                'timeEpoch': now_ms,
+                'http': {
+                    'method': method,
+                    'path': path,
+                    'protocol': 'HTTP/1.1',
+                    'sourceIp': source_ip,
+                    'userAgent': request_headers['user-agent'],
+                },
+            },
+            'body': raw_body,
+            'isBase64Encoded': False,
+        }
+
+    return {
+        'resource': path,
+        'path': path,
+        'httpMethod': method,
+        'headers': request_headers,
+        'multiValueHeaders': {k: [v] for k, v in request_headers.items()},
+        'queryStringParameters': query,
+        'requestContext': {
+            'requestId': str(uuid.uuid4()),
+            'requestTimeEpoch': now_ms,
+            'httpMethod': method,
+            'identity': {
+                'sourceIp': source_ip,
+                'userAgent': request_headers['user-agent'],
+            },
+        },
+        'body': raw_body,
+        'isBase64Encoded': False,
+    }
@@ -0,0 +1,229 @@
+"""
+Preparación de datos, ejecución concurrente y reporte del load test.
+"""
+import os
+import json
+import time
+import random
+import platform
+import threading
+from collections import defaultdict, Counter
+
+from _lambdas import load_lambda, percentile
+from events import build_event
+from scenarios import World, SCENARIOS
+
+import db_utils
+import auth_tokens
+
+CODE_PREFIX = 'BENCH-LOAD-'
+EMAIL_DOMAIN = '@loadtest.local'
+PASSWORD = 'LoadTest123'
+
+def setup_world(n_users, n_lockers, holders_ratio):
+    """
+    Resetea lockers BENCH-LOAD-*, registra/loguea usuarios por el Lambda de
+    auth (mismo hash y token que producción) y asigna una fracción de ellos
+    para que haya OTPs que refrescar desde el primer request.
+    """
+    auth = load_lambda('auth')
+    lockers = load_lambda('lockers')
+
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"UPDATE lockers SET {db_utils.LOCKER_RELEASE_SET} "
+                f"WHERE code LIKE %s OR current_user_id IN (SELECT id FROM users WHERE email LIKE %s)",
+                (CODE_PREFIX + '%', '%' + EMAIL_DOMAIN)
+            )
+            cur.executemany(
+                "INSERT IGNORE INTO lockers (code, status, created_at) VALUES (%s, 'available', NOW())",
+                [(f'{CODE_PREFIX}{i}',) for i in range(n_lockers)]
+            )
+            conn.commit()
+            cur.execute("SELECT id FROM lockers WHERE code LIKE %s ORDER BY id LIMIT %s",
+                        (CODE_PREFIX + '%', n_lockers))
+            locker_ids = [r['id'] for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+    users = []
+    for i in range(n_users):
+        email = f'load{i}{EMAIL_DOMAIN}'
+        auth.lambda_handler(build_event('POST', '/auth/register',
+                                        {'email': email, 'password': PASSWORD, 'name': f'Load {i}'}), None)
+        response = auth.lambda_handler(build_event('POST', '/auth/login',
+                                                   {'email': email, 'password': PASSWORD}), None)
+        if response['statusCode'] != 200:
+            raise RuntimeError(f"No se pudo loguear {email}: {response['body']}")
+        data = json.loads(response['body'])
+        users.append({'id': data['user']['id'], 'email': email, 'password': PASSWORD, 'token': data['token']})
+
+    # Token admin firmado directo: no hace falta un admin real en la BD de pruebas
+    admin_token = auth_tokens.issue_token(0, 'admin', 'Load Admin', 'admin' + EMAIL_DOMAIN)
+    world = World(users, locker_ids, admin_token)
+
+    free_lockers = list(locker_ids)
+    random.shuffle(free_lockers)
+    for user in users[:int(len(users) * holders_ratio)]:
+        if not free_lockers:
+            break
+        locker_id = free_lockers.pop()
+        response = lockers.lambda_handler(build_event(
+            'POST', '/lockers/assign', {'user_id': user['id'], 'locker_id': locker_id, 'days': 1},
+            token=user['token']), None)
+        if response['statusCode'] == 200:
+            world.add_holder(user, locker_id, json.loads(response['body']).get('initial_otp'))
+    world.free_users = [u for u in users if u['id'] not in world.holders]
+    return world
+
+def teardown_world():
+    conn = db_utils._open_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"UPDATE lockers SET {db_utils.LOCKER_RELEASE_SET} "
+                f"WHERE code LIKE %s OR current_user_id IN (SELECT id FROM users WHERE email LIKE %s)",
+                (CODE_PREFIX + '%', '%' + EMAIL_DOMAIN)
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+class RouteStats:
+    def __init__(self):
+        self.latencies_ms = []
+        self.queries = []
+        self.statuses = Counter()
+        self.errors = 0
+
+def run_load(world, mix, workers, total_requests=None, duration=None, event_version='v1'):
+    """
+    Reparte requests entre `workers` hilos según los pesos del mix.
+    Se detiene al llegar a total_requests o al pasar `duration` segundos.
+    """
+    handlers = {service: load_lambda(service).lambda_handler
+                for service in ('auth', 'lockers', 'admin', 'security')}
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    stats = defaultdict(RouteStats)
+    stats_lock = threading.Lock()
+    issued = [0]
+    skipped = Counter()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_ticket():
+        with stats_lock:
+            if total_requests is not None and issued[0] >= total_requests:
+                return False
+            issued[0] += 1
+            return True
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while next_ticket():
+            if deadline and time.perf_counter() >= deadline:
+                return
+            name = rng.choices(names, weights)[0]
+            version = event_version if event_version != 'mixed' else rng.choice(('v1', 'v2'))
+            built = SCENARIOS[name](world, version)
+            if built is None:
+                with stats_lock:
+                    skipped[name] += 1
+                continue
+            service, event, on_response = built
+
+            t0 = time.perf_counter()
+            try:
+                response = handlers[service](event, None)
+            except Exception:
+                response = {'statusCode': 'exception'}
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            # Las métricas del handler quedan en el thread-local de este hilo
+            queries = db_utils.current_metrics()['queries']
+
+            if on_response:
+                on_response(response)
+            with stats_lock:
+                route = stats[name]
+                route.latencies_ms.append(elapsed_ms)
+                route.queries.append(queries)
+                route.statuses[str(response.get('statusCode'))] += 1
+                if not isinstance(response.get('statusCode'), int) or response['statusCode'] >= 500:
+                    route.errors += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_seconds = time.perf_counter() - t0
+    return summarize(stats, skipped, wall_seconds)
+
+def summarize(stats, skipped, wall_seconds):
+    routes = {}
+    all_latencies = []
+    for name, route in sorted(stats.items()):
+        count = len(route.latencies_ms)
+        all_latencies.extend(route.latencies_ms)
+        routes[name] = {
+            'count': count,
+            'throughput_rps': round(count / wall_seconds, 1) if wall_seconds else 0.0,
+            'p50_ms': round(percentile(route.latencies_ms, 50), 2),
+            'p95_ms': round(percentile(route.latencies_ms, 95), 2),
+            'p99_ms': round(percentile(route.latencies_ms, 99), 2),
+            'queries_per_request': round(sum(route.queries) / count, 2) if count else 0.0,
+            'statuses': dict(route.statuses),
+            'errors': route.errors,
+            'skipped': skipped.get(name, 0),
+        }
+    total = len(all_latencies)
+    return {
+        'wall_seconds': round(wall_seconds, 3),
+        'total_requests': total,
+        'throughput_rps': round(total / wall_seconds, 1) if wall_seconds else 0.0,
+        'p50_ms': round(percentile(all_latencies, 50), 2),
+        'p95_ms': round(percentile(all_latencies, 95), 2),
+        'p99_ms': round(percentile(all_latencies, 99), 2),
+        'routes': routes,
+    }
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'rds_host': os.environ.get('RDS_HOST'),
+        'dynamodb_endpoint': os.environ.get('DYNAMODB_ENDPOINT_URL'),
+        'otp_mode': os.environ.get('OTP_MODE', 'legacy'),
+    }
+
+def print_report(result):
+    print(f"{'ruta':20s} {'n':>7s} {'req/s':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'q/req':>6s}  status")
+    for name, r in result['routes'].items():
+        statuses = ' '.join(f'{k}:{v}' for k, v in sorted(r['statuses'].items()))
+        print(f"{name:20s} {r['count']:7d} {r['throughput_rps']:8.1f} {r['p50_ms']:8.2f} "
+              f"{r['p95_ms']:8.2f} {r['p99_ms']:8.2f} {r['queries_per_request']:6.2f}  {statuses}")
+    print(f"{'TOTAL':20s} {result['total_requests']:7d} {result['throughput_rps']:8.1f} "
+          f"{result['p50_ms']:8.2f} {result['p95_ms']:8.2f} {result['p99_ms']:8.2f}")
+
+def compare(result, baseline, threshold_pct):
+    """
+    Regresiones contra un JSON previo: p95 o queries/request que suben más
+    de threshold_pct, o throughput que baja más de threshold_pct, por ruta.
+    """
+    regressions = []
+    limit = threshold_pct / 100.0
+    for name, current in result['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous or not previous.get('count'):
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + limit):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current['queries_per_request'] > previous['queries_per_request'] * (1 + limit):
+            regressions.append(f"{name}: queries/request {previous['queries_per_request']} -> "
+                               f"{current['queries_per_request']}")
+        if previous['throughput_rps'] and current['throughput_rps'] < previous['throughput_rps'] * (1 - limit):
+            regressions.append(f"{name}: req/s {previous['throughput_rps']} -> {current['throughput_rps']}")
+    return regressions
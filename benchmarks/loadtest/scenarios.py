@@ -0,0 +1,252 @@
+"""
+Catálogo de rutas del load test y el estado compartido entre workers.
+
+Cada escenario recibe el World y la versión de evento y devuelve
+(servicio, evento, callback) o None si en ese momento no aplica (por
+ejemplo, refrescar OTP cuando nadie tiene locker). El callback recibe la
+respuesta del handler y actualiza el World.
+"""
+import base64
+import gzip
+import json
+import random
+import threading
+
+from events import build_event
+
+class World:
+    """Usuarios y lockers del benchmark; protegido con un lock entre hilos."""
+
+    def __init__(self, users, locker_ids, admin_token):
+        self.lock = threading.Lock()
+        self.free_users = list(users)        # [{'id', 'email', 'password', 'token'}]
+        self.holders = {}                    # user_id -> {'user', 'locker_id', 'otp'}
+        self.locker_ids = list(locker_ids)
+        self.admin_token = admin_token
+        self.feed_version = 0
+        self.register_seq = 0
+
+    def pick_free_user(self):
+        with self.lock:
+            if not self.free_users:
+                return None
+            return self.free_users.pop(random.randrange(len(self.free_users)))
+
+    def return_free_user(self, user):
+        with self.lock:
+            self.free_users.append(user)
+
+    def add_holder(self, user, locker_id, otp):
+        with self.lock:
+            self.holders[user['id']] = {'user': user, 'locker_id': locker_id, 'otp': otp}
+
+    def random_holder(self):
+        with self.lock:
+            if not self.holders:
+                return None
+            return self.holders[random.choice(list(self.holders))]
+
+    def random_holders(self, n):
+        with self.lock:
+            keys = random.sample(list(self.holders), min(n, len(self.holders)))
+            return [self.holders[k] for k in keys]
+
+    def release_holder(self, user_id):
+        with self.lock:
+            holder = self.holders.pop(user_id, None)
+            if holder:
+                self.free_users.append(holder['user'])
+
+    def set_otp(self, user_id, otp):
+        with self.lock:
+            if user_id in self.holders:
+                self.holders[user_id]['otp'] = otp
+
+    def next_register_email(self):
+        with self.lock:
+            self.register_seq += 1
+            return f'loadreg{self.register_seq}-{random.randrange(1 << 30)}@bench.local'
+
+def _json(response):
+    """Body JSON de la respuesta; si viene en base64 (gzip) lo decodifica primero."""
+    body = response.get('body') or '{}'
+    try:
+        if response.get('isBase64Encoded'):
+            body = base64.b64decode(body)
+            if (response.get('headers') or {}).get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+        return json.loads(body)
+    except (ValueError, OSError):
+        return {}
+
+def _ok(response):
+    return response.get('statusCode') == 200
+
+# --- AUTH ---
+
+def auth_register(world, version):
+    body = {'email': world.next_register_email(), 'password': 'LoadTest123', 'name': 'Load Test'}
+    return 'auth', build_event('POST', '/auth/register', body, version=version), None
+
+def auth_login(world, version):
+    holder = world.random_holder()
+    user = holder['user'] if holder else None
+    if user is None:
+        with world.lock:
+            user = random.choice(world.free_users) if world.free_users else None
+    if user is None:
+        return None
+    body = {'email': user['email'], 'password': user['password']}
+    return 'auth', build_event('POST', '/auth/login', body, version=version), None
+
+def auth_me(world, version):
+    holder = world.random_holder()
+    if not holder:
+        return None
+    return 'auth', build_event('GET', '/auth/me', token=holder['user']['token'], version=version), None
+
+# --- LOCKERS (usuario) ---
+
+def available(world, version):
+    return 'lockers', build_event('GET', '/lockers/available', version=version), None
+
+def available_delta(world, version):
+    query = {'since': str(world.feed_version)}
+
+    def on_response(response):
+        data = _json(response)
+        if _ok(response) and isinstance(data, dict):
+            world.feed_version = max(world.feed_version, int(data.get('version', 0)))
+    return 'lockers', build_event('GET', '/lockers/available', query=query, version=version), on_response
+
+def assign(world, version):
+    user = world.pick_free_user()
+    if user is None:
+        return None
+    locker_id = random.choice(world.locker_ids)
+    body = {'user_id': user['id'], 'locker_id': locker_id, 'days': 1, 'color': '#FF6B00'}
+
+    def on_response(response):
+        if _ok(response):
+            world.add_holder(user, locker_id, _json(response).get('initial_otp'))
+        else:
+            world.return_free_user(user)
+    event = build_event('POST', '/lockers/assign', body, token=user['token'], version=version)
+    return 'lockers', event, on_response
+
+def my_locker(world, version):
+    holder = world.random_holder()
+    if not holder:
+        return None
+    user = holder['user']
+    event = build_event('GET', '/lockers/my-locker', query={'user_id': str(user['id'])},
+                        token=user['token'], version=version)
+    return 'lockers', event, None
+
+def refresh_otp(world, version):
+    holder = world.random_holder()
+    if not holder:
+        return None
+    user = holder['user']
+
+    def on_response(response):
+        if _ok(response):
+            world.set_otp(user['id'], _json(response).get('otp'))
+    event = build_event('POST', '/lockers/my-locker/otp/refresh', {'user_id': user['id']},
+                        token=user['token'], version=version)
+    return 'lockers', event, on_response
+
+def request_time_change(world, version):
+    holder = world.random_holder()
+    if not holder:
+        return None
+    user = holder['user']
+    event = build_event('POST', '/lockers/my-locker/request-time-change', {'user_id': user['id'], 'days': 2},
+                        token=user['token'], version=version)
+    return 'lockers', event, None
+
+def request_cancel(world, version):
+    holder = world.random_holder()
+    if not holder:
+        return None
+    user = holder['user']
+
+    def on_response(response):
+        if response.get('statusCode') in (200, 404):
+            world.release_holder(user['id'])
+    event = build_event('POST', '/lockers/my-locker/request-cancel', {'user_id': user['id']},
+                        token=user['token'], version=version)
+    return 'lockers', event, on_response
+
+# --- ADMIN ---
+
+def admin_list(world, version):
+    event = build_event('GET', '/admin/lockers', query={'limit': '100'}, token=world.admin_token, version=version)
+    return 'admin', event, None
+
+def force_release(world, version):
+    holder = world.random_holder()
+    if not holder:
+        return None
+
+    def on_response(response):
+        if _ok(response):
+            world.release_holder(holder['user']['id'])
+    event = build_event('DELETE', f"/admin/lockers/{holder['locker_id']}/force-release",
+                        token=world.admin_token, version=version)
+    return 'admin', event, on_response
+
+# --- SECURITY ---
+
+def _attempt_otp(holder, valid_ratio=0.8):
+    if holder.get('otp') and random.random() < valid_ratio:
+        return holder['otp']
+    return f'{random.randint(0, 999999):06d}'
+
+def access_attempt(world, version):
+    holder = world.random_holder()
+    if not holder:
+        return None
+    event = build_event('POST', f"/security/lockers/{holder['locker_id']}/access-attempt",
+                        {'otp': _attempt_otp(holder)}, version=version)
+    return 'security', event, None
+
+def access_batch(world, version, size=10):
+    holders = world.random_holders(size)
+    if not holders:
+        return None
+    body = {'attempts': [{'locker_id': h['locker_id'], 'otp': _attempt_otp(h)} for h in holders]}
+    event = build_event('POST', '/security/lockers/access-attempts/batch', body,
+                        source_ip='10.0.0.10', version=version)
+    return 'security', event, None
+
+SCENARIOS = {
+    'auth_register': auth_register,
+    'auth_login': auth_login,
+    'auth_me': auth_me,
+    'available': available,
+    'available_delta': available_delta,
+    'assign': assign,
+    'my_locker': my_locker,
+    'refresh_otp': refresh_otp,
+    'request_time_change': request_time_change,
+    'request_cancel': request_cancel,
+    'admin_list': admin_list,
+    'force_release': force_release,
+    'access_attempt': access_attempt,
+    'access_batch': access_batch,
+}
+
+# Mezcla por defecto: 90% refresh de OTP + intentos de acceso
+DEFAULT_MIX = ('refresh_otp=45,access_attempt=45,assign=3,request_cancel=2,'
+               'my_locker=2,admin_list=2,available=1')
+
+def parse_mix(text):
+    """'refresh_otp=45,assign=5' -> [('refresh_otp', 45.0), ('assign', 5.0)]"""
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f'Escenario desconocido: {name} (disponibles: {", ".join(SCENARIOS)})')
+        mix.append((name, float(weight or 1)))
+    return mix
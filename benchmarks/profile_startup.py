@@ -0,0 +1,220 @@
+"""
+Perfil de arranque en frío de cada Lambda (import + primera respuesta).
+
+Por cada función de benchmarks/startup_budgets.json lanza procesos nuevos
+(uno por medición, como un contenedor recién creado) con el handler
+cargado igual que en el ZIP: lambdas/<función> y lambdas/common en el path.
+  import      python -X importtime: costo acumulado de importar
+              lambda_function, sin lo que el runtime de Lambda ya trae
+              cargado (--preload), y los módulos más pesados
+  first       import + la primera invocación con los eventos del budget
+              (OPTIONS y un 404: rutas que no deberían tocar RDS ni AWS),
+              y qué módulos pesados quedaron en sys.modules al terminar
+Se toma la mediana de --runs procesos y se compara con el budget de la
+función (import_ms, first_response_ms y forbidden_modules).
+
+No requiere BD ni AWS.
+
+Uso:
+    python benchmarks/profile_startup.py --runs 5
+    python benchmarks/profile_startup.py --only security,lockers --top 15
+    python benchmarks/profile_startup.py --json startup.json
+Sale con código 1 si alguna función excede su budget.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+LAMBDAS_DIR = os.path.join(REPO_ROOT, 'lambdas')
+COMMON_DIR = os.path.join(LAMBDAS_DIR, 'common')
+BUDGETS_PATH = os.path.join(HERE, 'startup_budgets.json')
+
+# Módulos que el bootstrap del runtime de Python de Lambda ya importó
+# antes de cargar el handler: no cuentan para el arranque de la función
+RUNTIME_PRELOAD = 'json,logging,decimal,datetime,threading,socket,urllib.request,http.client'
+HEAVY_MODULES = ('pymysql', 'boto3', 'botocore', 'orjson')
+
+# Variables mínimas para importar los handlers sin configuración real
+CHILD_ENV = {
+    'METRICS_ENABLED': '0',
+    'AUTH_TOKEN_SECRET': 'startup-profile-secret',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AUDIT_BACKGROUND_FLUSH': '0',
+}
+
+def child_env(extra=None):
+    env = dict(os.environ, **CHILD_ENV)
+    env.update(extra or {})
+    env['PYTHONPATH'] = COMMON_DIR
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+# --- import: -X importtime ---
+
+def parse_importtime(stderr):
+    """Líneas de -X importtime -> [(nombre, self_us, cumulative_us, nivel)]."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        stripped = name.lstrip(' ')
+        level = (len(name) - len(stripped) - 1) // 2
+        entries.append((stripped.strip(), int(self_us), int(cumulative_us), level))
+    return entries
+
+def profile_imports(function, preload):
+    """Costo de importar lambda_function con los módulos de preload ya cargados."""
+    code = f"import {preload}\nimport lambda_function" if preload else "import lambda_function"
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                         cwd=os.path.join(LAMBDAS_DIR, function), env=child_env(),
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"{function}: no se pudo importar lambda_function\n{out.stderr[-2000:]}")
+    entries = parse_importtime(out.stderr)
+    # Las entradas se listan al terminar cada import: el subárbol de
+    # lambda_function son las de nivel > 0 justo antes de su entrada de nivel 0
+    end = next(i for i, e in enumerate(entries) if e[0] == 'lambda_function' and e[3] == 0)
+    start = end
+    while start > 0 and entries[start - 1][3] > 0:
+        start -= 1
+    subtree = entries[start:end + 1]
+    return {
+        'import_ms': entries[end][2] / 1000.0,
+        'modules': {name: self_us / 1000.0 for name, self_us, _, _ in subtree},
+        'packages': {name: cumulative_us / 1000.0 for name, _, cumulative_us, level in subtree if level == 1},
+    }
+
+# --- first: import + primera respuesta ---
+
+def child_first_response(preload, events):
+    """Proceso hijo: mide import + invocaciones e informa por stdout."""
+    import time
+    import importlib
+    sys.path[0] = os.getcwd()  # lambdas/<función>, como el directorio del ZIP
+    for name in filter(None, preload.split(',')):
+        importlib.import_module(name)
+    started = time.perf_counter()
+    import lambda_function
+    imported = time.perf_counter()
+    statuses = []
+    for event in events:
+        response = lambda_function.lambda_handler(event, None)
+        statuses.append(response.get('statusCode') if isinstance(response, dict) else None)
+    finished = time.perf_counter()
+    print(json.dumps({
+        'import_ms': (imported - started) * 1000,
+        'first_response_ms': (finished - started) * 1000,
+        'statuses': statuses,
+        'loaded': [m for m in HEAVY_MODULES if m in sys.modules],
+    }))
+    return 0
+
+def profile_first_response(function, preload, events):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', '--preload', preload,
+                          '--events', json.dumps(events)],
+                         cwd=os.path.join(LAMBDAS_DIR, function), env=child_env(),
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"{function}: la primera invocación falló\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+# --- proceso padre ---
+
+def load_budgets(path):
+    with open(path) as f:
+        budgets = json.load(f)
+    defaults = budgets.get('defaults', {})
+    return {name: dict(defaults, **conf) for name, conf in budgets['functions'].items()}
+
+def profile_function(name, budget, args):
+    preload = args.preload
+    imports = [profile_imports(name, preload) for _ in range(args.runs)]
+    result = {
+        'function': name,
+        'import_ms': statistics.median(r['import_ms'] for r in imports),
+        'heaviest': sorted(imports[-1]['modules'].items(), key=lambda kv: -kv[1])[:args.top],
+        'packages': sorted(imports[-1]['packages'].items(), key=lambda kv: -kv[1])[:args.top],
+        'first_response_ms': None,
+        'statuses': [],
+        'loaded': [],
+    }
+    events = budget.get('events') or []
+    if events:
+        firsts = [profile_first_response(name, preload, events) for _ in range(args.runs)]
+        result['first_response_ms'] = statistics.median(r['first_response_ms'] for r in firsts)
+        result['statuses'] = firsts[-1]['statuses']
+        result['loaded'] = sorted({m for r in firsts for m in r['loaded']})
+    else:
+        # Sin eventos seguros (programados): se revisa lo cargado solo por el import
+        result['loaded'] = sorted({m.split('.')[0] for m in imports[-1]['modules']} & set(HEAVY_MODULES))
+    return result
+
+def check_budget(result, budget):
+    problems = []
+    if budget.get('import_ms') is not None and result['import_ms'] > budget['import_ms']:
+        problems.append(f"import {result['import_ms']:.1f}ms > {budget['import_ms']}ms")
+    if (budget.get('first_response_ms') is not None and result['first_response_ms'] is not None
+            and result['first_response_ms'] > budget['first_response_ms']):
+        problems.append(f"primera respuesta {result['first_response_ms']:.1f}ms > {budget['first_response_ms']}ms")
+    forbidden = sorted(set(result['loaded']) & set(budget.get('forbidden_modules', [])))
+    if forbidden:
+        problems.append(f"carga en el arranque: {', '.join(forbidden)}")
+    expected = budget.get('expected_statuses')
+    if expected and result['statuses'] != expected:
+        problems.append(f"respuestas {result['statuses']} (se esperaba {expected})")
+    return problems
+
+def report(result, budget, problems):
+    first = f"{result['first_response_ms']:7.1f}ms" if result['first_response_ms'] is not None else '      -  '
+    print(f"\n{result['function']:13s} import={result['import_ms']:7.1f}ms (budget {budget.get('import_ms')}ms)  "
+          f"primera respuesta={first} (budget {budget.get('first_response_ms')}ms)  "
+          f"{'OK' if not problems else 'FALLA'}")
+    if result['statuses']:
+        print(f"  respuestas: {result['statuses']}  módulos pesados cargados: {result['loaded'] or 'ninguno'}")
+    print("  paquetes: " + ', '.join(f"{name} {ms:.1f}ms" for name, ms in result['packages']))
+    print("  módulos más pesados (self): " + ', '.join(f"{name} {ms:.1f}ms" for name, ms in result['heaviest']))
+    for problem in problems:
+        print(f"  FALLA: {problem}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='procesos por medición (se usa la mediana)')
+    parser.add_argument('--only', help='funciones separadas por coma')
+    parser.add_argument('--top', type=int, default=8, help='módulos a listar por función')
+    parser.add_argument('--budgets', default=BUDGETS_PATH)
+    parser.add_argument('--preload', default=RUNTIME_PRELOAD,
+                        help='módulos que el runtime ya tiene cargados (vacío = ninguno)')
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--events', default='[]', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child_first_response(args.preload, json.loads(args.events))
+
+    budgets = load_budgets(args.budgets)
+    names = args.only.split(',') if args.only else list(budgets)
+    results, failed = [], False
+    for name in names:
+        budget = budgets.get(name, {})
+        result = profile_function(name, budget, args)
+        problems = check_budget(result, budget)
+        report(result, budget, problems)
+        result['problems'] = problems
+        results.append(result)
+        failed |= bool(problems)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'results': results, 'runs': args.runs, 'python': sys.version.split()[0]}, f, indent=2)
+        print(f"\nResultado guardado en {args.json}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,6 @@
+-- Schema completo de referencia. En RDS se aplica con el runner de
+-- migraciones del seeder (lambdas/seeder/migrations, tabla schema_migrations).
+
 -- Crear base de datos (si no existe) y seleccionarla
 CREATE DATABASE IF NOT EXISTS smartlocker_db
   CHARACTER SET utf8mb4
@@ -27,15 +30,29 @@ CREATE TABLE IF NOT EXISTS lockers (
   current_otp_hash CHAR(64) NULL,   -- SHA-256(OTP + salt)
   otp_salt         CHAR(32) NULL,   -- salt en hex
   otp_valid_until  DATETIME NULL,
+  otp_secret       CHAR(40) NULL,   -- secreto TOTP por asignación (OTP_MODE=totp)
   color_hex        CHAR(7) NULL,    -- #RRGGBB (locker personalizado)
+  availability_version BIGINT NOT NULL DEFAULT 0, -- versión del feed /lockers/available
   created_at       DATETIME NOT NULL,
   updated_at       DATETIME NULL,
+  UNIQUE KEY uq_lockers_current_user (current_user_id), -- un locker por usuario (NULL no cuenta)
+  KEY idx_lockers_status_expires (status, expires_at), -- barrido de expirados
+  KEY idx_lockers_updated_at (updated_at),            -- última modificación (soporte)
+  KEY idx_lockers_availability_version (availability_version), -- deltas ?since=
   CONSTRAINT fk_lockers_user
     FOREIGN KEY (current_user_id) REFERENCES users(id)
     ON UPDATE CASCADE
     ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+-- Contador global del feed de disponibilidad (una sola fila)
+CREATE TABLE IF NOT EXISTS locker_feed_version (
+  id      TINYINT PRIMARY KEY,
+  version BIGINT NOT NULL
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO locker_feed_version (id, version) VALUES (1, 0);
+
 -- Tabla de logs de acceso y eventos
 CREATE TABLE IF NOT EXISTS access_logs (
   id          BIGINT AUTO_INCREMENT PRIMARY KEY,
@@ -47,6 +64,7 @@ CREATE TABLE IF NOT EXISTS access_logs (
   source_ip   VARCHAR(45) NULL,
   user_agent  VARCHAR(255) NULL,
   created_at  DATETIME NOT NULL,
+  KEY idx_access_logs_locker_created (locker_id, created_at), -- historial por locker
   CONSTRAINT fk_access_logs_locker
     FOREIGN KEY (locker_id) REFERENCES lockers(id)
     ON UPDATE CASCADE
@@ -68,6 +86,7 @@ CREATE TABLE IF NOT EXISTS locker_requests (
   notes         VARCHAR(255) NULL,      -- motivo o comentario
   created_at    DATETIME NOT NULL,
   resolved_at   DATETIME NULL,
+  KEY idx_locker_requests_status_created (status, created_at), -- pendientes del admin
   CONSTRAINT fk_requests_locker
     FOREIGN KEY (locker_id) REFERENCES lockers(id)
     ON UPDATE CASCADE
@@ -77,3 +96,52 @@ CREATE TABLE IF NOT EXISTS locker_requests (
     ON UPDATE CASCADE
     ON DELETE CASCADE
 ) ENGINE=InnoDB;
+
+-- Estado del detector de actividad sospechosa (LambdaSecurityAuditWorker)
+-- Último access_logs.id procesado por cada consumidor incremental y techo
+-- asentado (safe_id): los ids se ven al COMMIT, no en orden de asignación
+CREATE TABLE IF NOT EXISTS audit_watermarks (
+  name        VARCHAR(64) PRIMARY KEY,
+  last_id     BIGINT NOT NULL DEFAULT 0,
+  safe_id     BIGINT NOT NULL DEFAULT 0,
+  observed_id BIGINT NOT NULL DEFAULT 0,
+  observed_at DATETIME NULL,
+  updated_at  DATETIME NULL
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO audit_watermarks (name, last_id, updated_at) VALUES ('suspicious_activity', 0, NOW());
+
+-- Fallos por locker en buckets de tiempo (ventana deslizante = suma de buckets)
+CREATE TABLE IF NOT EXISTS security_locker_failures (
+  locker_id     INT NOT NULL,
+  bucket_start  DATETIME NOT NULL,
+  failures      INT NOT NULL,
+  PRIMARY KEY (locker_id, bucket_start),
+  KEY idx_security_locker_failures_bucket (bucket_start) -- purga de buckets viejos
+) ENGINE=InnoDB;
+
+-- Fallos por IP y locker: fallos por IP y lockers distintos (enumeración)
+CREATE TABLE IF NOT EXISTS security_ip_failures (
+  source_ip     VARCHAR(45) NOT NULL,
+  bucket_start  DATETIME NOT NULL,
+  locker_id     INT NOT NULL,
+  failures      INT NOT NULL,
+  PRIMARY KEY (source_ip, bucket_start, locker_id),
+  KEY idx_security_ip_failures_bucket (bucket_start)
+) ENGINE=InnoDB;
+
+-- Alertas persistidas: el endpoint solo lee de aquí
+CREATE TABLE IF NOT EXISTS security_alerts (
+  id                BIGINT AUTO_INCREMENT PRIMARY KEY,
+  alert_type        ENUM('locker_burst','ip_burst','enumeration') NOT NULL,
+  locker_id         INT NULL,
+  source_ip         VARCHAR(45) NULL,
+  failures          INT NOT NULL,
+  distinct_lockers  INT NULL,
+  window_start      DATETIME NOT NULL,
+  window_end        DATETIME NOT NULL,
+  detected_at       DATETIME NOT NULL,
+  dedupe_key        VARCHAR(120) NOT NULL,  -- una alerta por tipo/llave/ventana
+  UNIQUE KEY uq_security_alerts_dedupe (dedupe_key),
+  KEY idx_security_alerts_type (alert_type, id)
+) ENGINE=InnoDB;
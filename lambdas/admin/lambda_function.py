@@ -1,11 +1,61 @@
+import os
+import re
 import json
+import time
+import base64
+import hashlib
 import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 import db_utils # Usaremos el helper compartido
+import queries
+import auth_tokens
+from audit_sink import AccessLogSink, USER_AGENT_MAX_LENGTH, audit_timestamp
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Historial de accesos: misma tabla que escribe el Lambda de security
+AUDIT_TABLE_NAME = os.environ.get('AUDIT_TABLE_NAME', 'SmartLocker_AuditLogs')
+LOGS_DEFAULT_LIMIT = 50
+LOGS_MAX_LIMIT = 200
+# Con filtro de status una página de Query puede venir casi vacía; se
+# encadenan como máximo estas páginas por request para acotar la latencia
+LOGS_MAX_QUERY_PAGES = int(os.environ.get('LOGS_MAX_QUERY_PAGES', '5'))
+_audit_table = None
+# Llave de read-your-writes del panel: el listado es compartido entre admins
+ADMIN_PIN_KEY = 'admin'
+
+# Operaciones en lote: filas por transacción (locks cortos) y tope por request.
+# Con un filtro que supera el tope (o si se acaba el tiempo) la respuesta
+# trae next_cursor para seguir; con ids explícitos, unprocessed_ids.
+ADMIN_BULK_CHUNK_SIZE = int(os.environ.get('ADMIN_BULK_CHUNK_SIZE', '500'))
+ADMIN_BULK_MAX_ITEMS = int(os.environ.get('ADMIN_BULK_MAX_ITEMS', '5000'))
+# API Gateway corta a los 29 s desde el inicio del handler, aunque el timeout
+# del Lambda sea mayor: no se empieza un chunk con menos margen que esto
+ADMIN_API_TIMEOUT_MS = int(os.environ.get('ADMIN_API_TIMEOUT_MS', '29000'))
+ADMIN_BULK_MIN_REMAINING_MS = int(os.environ.get('ADMIN_BULK_MIN_REMAINING_MS', '5000'))
+ADMIN_MAX_EXTENSION_DAYS = int(os.environ.get('ADMIN_MAX_EXTENSION_DAYS', '365'))
+# Solicitudes creadas antes de guardar requested_until: los días vienen en la nota
+_LEGACY_REQUEST_DAYS = re.compile(r'por (\d+) días')
+
+# Liberaciones forzadas individuales en access_logs (los lotes escriben en su transacción)
+access_log = AccessLogSink()
+
+# Inicio de la invocación en curso (time.monotonic), para el corte de API Gateway
+_invocation_started = None
+
+@db_utils.instrumented_handler('admin')
 def lambda_handler(event, context):
+    global _invocation_started
+    _invocation_started = time.monotonic()
+    try:
+        return route(event, context)
+    finally:
+        if not access_log.background:
+            access_log.flush()
+
+def route(event, context):
     path = event.get('path', '') or event.get('rawPath', '')
     http_method = event.get('httpMethod', '') or event.get('requestContext', {}).get('http', {}).get('method')
     
@@ -14,39 +64,130 @@ def lambda_handler(event, context):
     if http_method == 'OPTIONS':
         return db_utils.format_response(200, {})
 
+    # Todas las rutas admin exigen rol admin (verificado con el token, sin BD)
+    auth_error = auth_tokens.require_admin(event)
+    if auth_error:
+        return auth_error
+
     # Router de Admin
-    if 'force-release' in path and http_method == 'DELETE':
-        return force_release_locker(path)
+    normalized = path.rstrip('/')
+    if normalized.endswith('/lockers/bulk/force-release') and http_method == 'POST':
+        return bulk_force_release(event, context)
+    elif normalized.endswith('/lockers/bulk/time') and http_method == 'POST':
+        return bulk_change_time(event, context)
+    elif normalized.endswith('/time') and http_method == 'PATCH':
+        return change_locker_time(event, normalized, context)
+    elif normalized.endswith('/requests/resolve') and http_method == 'POST':
+        return bulk_resolve_requests(event, context)
+    elif normalized.endswith('/admin/requests') and http_method == 'GET':
+        return get_requests(event)
+    elif 'force-release' in path and http_method == 'DELETE':
+        return force_release_locker(event, path)
+    elif normalized.endswith('/logs') and http_method == 'GET':
+        return get_locker_logs(event, path)
     elif '/admin/lockers' in path and http_method == 'GET':
         # Importante: verificar que sea la ruta base y no una subruta no manejada
-        return get_all_lockers()
+        return get_all_lockers(event)
     
     return db_utils.format_response(404, {'message': 'Ruta admin no encontrada'})
 
-def get_all_lockers():
-    """Trae TODOS los lockers con datos del usuario si está ocupado"""
-    conn = db_utils.get_db_connection()
+# Columnas que el listado admin puede proyectar (?fields=code,status,...)
+LOCKER_LIST_FIELDS = {
+    'id': 'l.id',
+    'code': 'l.code',
+    'status': 'l.status',
+    'assigned_at': 'l.assigned_at',
+    'expires_at': 'l.expires_at',
+    'color_hex': 'l.color_hex',
+    'user_name': 'u.name',
+    'user_email': 'u.email',
+}
+DEFAULT_LIST_FIELDS = ['id', 'code', 'status', 'expires_at', 'color_hex', 'user_name', 'user_email']
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 500
+
+def encode_cursor(code):
+    return base64.urlsafe_b64encode(code.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+
+def listing_etag(cur, page_sql, args, fields):
+    """
+    ETag de la página a partir de COUNT + checksum calculados en MySQL
+    (queries.admin_locker_page_checksum): un 304 no trae ni serializa filas.
+    Se calcula antes de leer la página: si algo cambia entre medio, el ETag
+    queda viejo y el próximo request recibe 200, nunca un 304 de más.
+    """
+    cur.execute(queries.admin_locker_page_checksum(page_sql, fields), args)
+    row = cur.fetchone()
+    fingerprint = json.dumps([fields, row['n'], str(row['checksum'])])
+    return '"' + hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:32] + '"'
+
+def etag_headers(etag):
+    return {'ETag': etag, 'Access-Control-Expose-Headers': 'ETag'}
+
+def get_all_lockers(event):
+    """
+    Lista lockers (con datos del usuario si está ocupado) paginando por code.
+    Query params: limit, cursor, status, code_prefix, fields.
+    Responde 304 (sin body) si el If-None-Match coincide con el ETag de la página.
+    """
+    params = event.get('queryStringParameters') or {}
+    try:
+        limit = min(max(int(params.get('limit', LIST_DEFAULT_LIMIT)), 1), LIST_MAX_LIMIT)
+        after_code = decode_cursor(params['cursor']) if params.get('cursor') else None
+    except (ValueError, TypeError):
+        return db_utils.format_response(400, {'message': 'limit o cursor inválido'})
+
+    fields = [f.strip() for f in params['fields'].split(',')] if params.get('fields') else DEFAULT_LIST_FIELDS
+    unknown = [f for f in fields if f not in LOCKER_LIST_FIELDS]
+    if unknown:
+        return db_utils.format_response(400, {'message': f'Campos no permitidos: {", ".join(unknown)}'})
+    if 'code' not in fields:
+        fields = fields + ['code']  # Necesario para el cursor
+
+    # Réplica de lectura salvo que un admin de este contenedor acabe de escribir
+    conn = db_utils.get_db_connection('read', pin_key=ADMIN_PIN_KEY)
     try:
         with conn.cursor() as cur:
-            # JOIN para traer nombre y email del usuario
-            sql = """
-                SELECT 
-                    l.id, l.code, l.status, l.expires_at, l.color_hex,
-                    u.name as user_name, u.email as user_email
-                FROM lockers l
-                LEFT JOIN users u ON l.current_user_id = u.id
-                ORDER BY l.code ASC
-            """
-            cur.execute(sql)
+            where, args = [], []
+            if params.get('status'):
+                where.append("l.status = %s")
+                args.append(params['status'])
+            if params.get('code_prefix'):
+                prefix = params['code_prefix'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                where.append("l.code LIKE %s")
+                args.append(prefix + '%')
+            if after_code is not None:
+                # Keyset: seguimos después del último code entregado
+                where.append("l.code > %s")
+                args.append(after_code)
+
+            columns = ', '.join(f"{LOCKER_LIST_FIELDS[f]} AS {f}" for f in fields)
+            # El JOIN solo si se pidieron datos del usuario
+            sql = queries.admin_locker_list(columns, any(f.startswith('user_') for f in fields), where)
+            # Pedimos uno extra para saber si hay otra página (entra también en el ETag)
+            args.append(limit + 1)
+            etag = listing_etag(cur, sql, args, fields)
+            if db_utils.get_header(event, 'If-None-Match') == etag:
+                return db_utils.format_response(304, None, etag_headers(etag))
+            cur.execute(sql, args)
             lockers = cur.fetchall()
-        return db_utils.format_response(200, lockers)
+
+        next_cursor = None
+        if len(lockers) > limit:
+            lockers = lockers[:limit]
+            next_cursor = encode_cursor(lockers[-1]['code'])
+
+        return db_utils.format_response(200, {'items': lockers, 'next_cursor': next_cursor}, etag_headers(etag))
     except Exception as e:
         logger.error(str(e))
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        conn.close()
+        db_utils.release_db_connection(conn)
 
-def force_release_locker(path):
+def force_release_locker(event, path):
     """
     Extrae el ID de la URL y fuerza la liberación.
     Ruta esperada: /admin/lockers/{id}/force-release
@@ -67,21 +208,17 @@ def force_release_locker(path):
 
         conn = db_utils.get_db_connection()
         with conn.cursor() as cur:
+            # Dueño actual para el log (bloquea la fila hasta el commit)
+            cur.execute(queries.bulk_lockers_by_ids(1), (locker_id,))
+            locker = cur.fetchone()
             # Resetear el locker a disponible
-            sql = """
-                UPDATE lockers 
-                SET status='available', 
-                    current_user_id=NULL, 
-                    assigned_at=NULL, 
-                    expires_at=NULL,
-                    current_otp_hash=NULL,
-                    otp_salt=NULL,
-                    otp_valid_until=NULL,
-                    color_hex=NULL
-                WHERE id=%s
-            """
-            cur.execute(sql, (locker_id,))
+            cur.execute(queries.RELEASE_LOCKER_BY_ID, (locker_id,))
+            db_utils.bump_availability_version(cur, [locker_id])
             conn.commit()
+        db_utils.pin_to_writer(ADMIN_PIN_KEY)
+        if locker and locker['status'] == 'occupied':
+            access_log.record_event(locker_id, 'owner_removed', 'SUCCESS', 'Liberación forzada por admin',
+                                    user_id=locker['current_user_id'], event=event)
             
         return db_utils.format_response(200, {'message': f'Locker {locker_id} liberado forzosamente'})
 
@@ -89,4 +226,523 @@ def force_release_locker(path):
         logger.error(str(e))
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        if 'conn' in locals(): conn.close()
\ No newline at end of file
+        if 'conn' in locals(): db_utils.release_db_connection(conn)
+
+# --- OPERACIONES EN LOTE ---
+
+def has_time_left(context):
+    """
+    Si hay margen para otro chunk: lo que quede primero entre el corte de
+    API Gateway (ADMIN_API_TIMEOUT_MS desde el inicio del handler) y el
+    timeout del Lambda.
+    """
+    remaining = float('inf')
+    if _invocation_started is not None:
+        remaining = ADMIN_API_TIMEOUT_MS - (time.monotonic() - _invocation_started) * 1000
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        remaining = min(remaining, context.get_remaining_time_in_millis())
+    return remaining > ADMIN_BULK_MIN_REMAINING_MS
+
+class BulkSelection:
+    """
+    Qué filas toca una operación en lote: ids explícitos o un filtro
+    paginado por keyset. next_chunk lee (y bloquea con FOR UPDATE) un chunk
+    dentro de la transacción del llamador.
+    """
+
+    def __init__(self, ids=None, by_ids=None, page_sql=None, page_args=(), key='id', after=None):
+        self.ids = list(ids) if ids is not None else None
+        self.by_ids = by_ids
+        self.page_sql = page_sql
+        self.page_args = list(page_args)
+        self.key = key
+        self.after = after
+        self.done = False
+        self.taken = 0
+        # ids del chunk en curso (con filtro, los que trajo el SELECT) y
+        # cursor previo al chunk, para informarlo y reintentarlo si falla
+        self.requested = []
+        self.chunk_after = after
+
+    def next_chunk(self, cur):
+        """(filas, ids pedidos) del siguiente chunk, o None si no queda nada."""
+        self.requested = []
+        self.chunk_after = self.after
+        if self.done:
+            return None
+        if self.ids is not None:
+            chunk = self.ids[:ADMIN_BULK_CHUNK_SIZE]
+            del self.ids[:len(chunk)]
+            self.done = not self.ids
+            if not chunk:
+                return None
+            self.requested = chunk
+            cur.execute(self.by_ids(len(chunk)), chunk)
+            return cur.fetchall(), chunk
+
+        limit = min(ADMIN_BULK_CHUNK_SIZE, ADMIN_BULK_MAX_ITEMS - self.taken)
+        if limit <= 0:
+            return None  # tope del request: se sigue con next_cursor
+        cur.execute(self.page_sql, self.page_args + [self.after, limit])
+        rows = cur.fetchall()
+        self.taken += len(rows)
+        if rows:
+            self.after = rows[-1][self.key]
+        self.done = len(rows) < limit
+        self.requested = [row['id'] for row in rows]
+        return rows, self.requested
+
+    def rewind(self):
+        """Vuelve el cursor del filtro a antes del chunk en curso (que se revirtió)."""
+        if self.ids is None:
+            self.taken -= len(self.requested)
+            self.after = self.chunk_after
+            self.done = False
+
+    def continuation(self):
+        """Cómo seguir si quedó trabajo: ids sin procesar o cursor del filtro."""
+        if self.done:
+            return {}
+        if self.ids is not None:
+            return {'unprocessed_ids': self.ids}
+        return {'next_cursor': encode_cursor(str(self.after))}
+
+def parse_bulk_ids(value):
+    """Lista de ids enteros sin repetidos (en orden), o ValueError."""
+    if not isinstance(value, list) or not value:
+        raise ValueError('Se espera una lista de ids no vacía')
+    if len(value) > ADMIN_BULK_MAX_ITEMS:
+        raise ValueError(f'Máximo {ADMIN_BULK_MAX_ITEMS} ids por request')
+    ids = []
+    for item in value:
+        if isinstance(item, bool) or not str(item).isdigit():
+            raise ValueError(f'ID inválido: {item!r}')
+        ids.append(int(item))
+    return list(dict.fromkeys(ids))
+
+def locker_selection(body):
+    """BulkSelection de lockers: {"locker_ids": [...]} o {"code_prefix": "A-", "cursor": ...}."""
+    if body.get('locker_ids') is not None:
+        return BulkSelection(ids=parse_bulk_ids(body['locker_ids']), by_ids=queries.bulk_lockers_by_ids)
+    prefix = body.get('code_prefix')
+    if not isinstance(prefix, str) or not prefix:
+        raise ValueError('Falta locker_ids o code_prefix')
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    after = decode_cursor(body['cursor']) if body.get('cursor') else ''
+    return BulkSelection(page_sql=queries.BULK_LOCKERS_BY_CODE_PREFIX, page_args=[escaped + '%'],
+                         key='code', after=after)
+
+def run_bulk(selection, apply_chunk, context):
+    """
+    Aplica apply_chunk(cur, filas, ids) -> [resultado por item] chunk a chunk,
+    una transacción por chunk. Si un chunk falla se revierte solo ese y sus
+    items salen con result 'error'. Con ids explícitos los demás chunks
+    siguen; con filtro (y si falla la lectura del chunk) se corta ahí y se
+    responde lo ya hecho con error y unprocessed_ids / next_cursor, que con
+    filtro apunta antes del chunk revertido para reintentarlo.
+    """
+    items = []
+    error = None
+    conn = db_utils.get_db_connection()
+    try:
+        while has_time_left(context):
+            with conn.cursor() as cur:
+                rows = None
+                try:
+                    chunk = selection.next_chunk(cur)
+                    if chunk is None:
+                        conn.commit()
+                        break
+                    rows, requested = chunk
+                    chunk_items = apply_chunk(cur, rows, requested)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    requested = selection.requested
+                    logger.error(f"Chunk revertido ({len(requested)} ids pedidos): {str(e)}")
+                    chunk_items = [{'id': item_id, 'result': 'error', 'error': str(e)} for item_id in requested]
+                    if rows is None or selection.ids is None:
+                        selection.rewind()
+                        items.extend(chunk_items)
+                        error = str(e)
+                        break
+            items.extend(chunk_items)
+            if selection.done:
+                break
+    finally:
+        db_utils.release_db_connection(conn)
+    db_utils.pin_to_writer(ADMIN_PIN_KEY)
+
+    response = {
+        'processed': len(items),
+        'summary': dict(Counter(item['result'] for item in items)),
+        'items': items,
+    }
+    if error:
+        response['error'] = error
+    response.update(selection.continuation())
+    return response
+
+def log_rows(event, event_type, changes):
+    """Filas para queries.INSERT_ACCESS_LOG desde [(locker_id, user_id, reason)], con la IP y el User-Agent del admin."""
+    source_ip = db_utils.get_source_ip(event)
+    user_agent = (db_utils.get_header(event, 'User-Agent') or '')[:USER_AGENT_MAX_LENGTH] or None
+    return [(locker_id, user_id, event_type, 'success', reason, source_ip, user_agent)
+            for locker_id, user_id, reason in changes]
+
+def bulk_force_release(event, context):
+    """
+    POST /admin/lockers/bulk/force-release
+    Body: {"locker_ids": [1, 2, ...]} o {"code_prefix": "A-"[, "cursor": ...]}.
+    Libera los ocupados (mismas columnas que force-release) con un
+    'owner_removed' por locker en access_logs; el resto se informa por item.
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+        selection = locker_selection(body)
+    except (ValueError, TypeError) as e:
+        return db_utils.format_response(400, {'message': str(e)})
+
+    def apply_chunk(cur, rows, requested):
+        found = {row['id']: row for row in rows}
+        occupied = [row for row in rows if row['status'] == 'occupied']
+        if occupied:
+            ids = [row['id'] for row in occupied]
+            cur.execute(queries.release_lockers_by_ids(len(ids)), ids)
+            db_utils.bump_availability_version(cur, ids)
+            cur.executemany(queries.INSERT_ACCESS_LOG, log_rows(event, 'owner_removed', [
+                (row['id'], row['current_user_id'], 'Liberación forzada por admin (lote)') for row in occupied]))
+        items = []
+        for locker_id in requested:
+            row = found.get(locker_id)
+            if row is None:
+                items.append({'id': locker_id, 'result': 'not_found'})
+            elif row['status'] == 'occupied':
+                items.append({'id': locker_id, 'code': row['code'], 'result': 'released',
+                              'user_id': row['current_user_id']})
+            else:
+                items.append({'id': locker_id, 'code': row['code'], 'result': 'not_occupied', 'status': row['status']})
+        return items
+
+    try:
+        return db_utils.format_response(200, run_bulk(selection, apply_chunk, context))
+    except Exception as e:
+        logger.error(str(e))
+        return db_utils.format_response(500, {'error': str(e)})
+
+def parse_time_change(body):
+    """(days, expires_at) del body: extender N días o fijar la expiración."""
+    if body.get('expires_at') is not None:
+        expires_at = datetime.fromisoformat(str(body['expires_at']))
+        if expires_at.tzinfo is not None:
+            # La BD guarda DATETIME en UTC sin zona
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return None, expires_at
+    days = int(body.get('days', 0))
+    if not 1 <= days <= ADMIN_MAX_EXTENSION_DAYS:
+        raise ValueError(f'days debe estar entre 1 y {ADMIN_MAX_EXTENSION_DAYS} (o enviar expires_at)')
+    return days, None
+
+def time_change_chunk(event, days, expires_at, reason):
+    """apply_chunk que extiende (o fija) la expiración de los lockers ocupados."""
+    def apply_chunk(cur, rows, requested):
+        found = {row['id']: row for row in rows}
+        now = datetime.now()
+        changes = {}
+        for row in rows:
+            if row['status'] == 'occupied':
+                changes[row['id']] = expires_at or max(row['expires_at'] or now, now) + timedelta(days=days)
+        if changes:
+            cur.executemany(queries.SET_LOCKER_EXPIRATION, [(until, locker_id) for locker_id, until in changes.items()])
+            cur.executemany(queries.INSERT_ACCESS_LOG, log_rows(event, 'time_changed', [
+                (locker_id, found[locker_id]['current_user_id'], reason) for locker_id in changes]))
+        items = []
+        for locker_id in requested:
+            row = found.get(locker_id)
+            if row is None:
+                items.append({'id': locker_id, 'result': 'not_found'})
+            elif locker_id in changes:
+                items.append({'id': locker_id, 'code': row['code'], 'result': 'updated',
+                              'previous_expires_at': row['expires_at'], 'expires_at': changes[locker_id]})
+            else:
+                items.append({'id': locker_id, 'code': row['code'], 'result': 'not_occupied', 'status': row['status']})
+        return items
+    return apply_chunk
+
+def bulk_change_time(event, context):
+    """
+    POST /admin/lockers/bulk/time
+    Body: selección como bulk/force-release más {"days": N} (extiende desde
+    la expiración actual, o desde ahora si ya venció) o {"expires_at": "ISO"}.
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+        selection = locker_selection(body)
+        days, expires_at = parse_time_change(body)
+    except (ValueError, TypeError) as e:
+        return db_utils.format_response(400, {'message': str(e)})
+
+    reason = f'Expiración fijada por admin: {expires_at}' if expires_at else f'Extensión de {days} días por admin'
+    try:
+        return db_utils.format_response(200, run_bulk(selection, time_change_chunk(event, days, expires_at, reason), context))
+    except Exception as e:
+        logger.error(str(e))
+        return db_utils.format_response(500, {'error': str(e)})
+
+def change_locker_time(event, path_key, context):
+    """
+    PATCH /admin/lockers/{lockerId}/time
+    Body: {"days": N} o {"expires_at": "ISO"}. Es el lote de un solo locker.
+    """
+    parts = path_key.split('/')
+    locker_id = parts[-2] if len(parts) >= 2 else ''
+    if not locker_id.isdigit():
+        return db_utils.format_response(400, {'message': 'ID de locker inválido'})
+    try:
+        body = json.loads(event.get('body') or '{}')
+        days, expires_at = parse_time_change(body)
+    except (ValueError, TypeError) as e:
+        return db_utils.format_response(400, {'message': str(e)})
+
+    reason = f'Expiración fijada por admin: {expires_at}' if expires_at else f'Extensión de {days} días por admin'
+    selection = BulkSelection(ids=[int(locker_id)], by_ids=queries.bulk_lockers_by_ids)
+    try:
+        result = run_bulk(selection, time_change_chunk(event, days, expires_at, reason), context)
+    except Exception as e:
+        logger.error(str(e))
+        return db_utils.format_response(500, {'error': str(e)})
+    if not result['items']:
+        # Sin resultado por item: el chunk no llegó a leerse (o no quedó tiempo)
+        return db_utils.format_response(409, {'message': result.get('error', 'No se pudo procesar el locker')})
+    item = result['items'][0]
+    status_code = {'updated': 200, 'not_found': 404, 'not_occupied': 409}.get(item['result'], 500)
+    return db_utils.format_response(status_code, item)
+
+def requested_until(request):
+    """Nueva expiración pedida; las solicitudes viejas solo traen los días en la nota."""
+    if request['requested_until'] is not None:
+        return request['requested_until']
+    match = _LEGACY_REQUEST_DAYS.search(request['notes'] or '')
+    if not match or request['expires_at'] is None:
+        return None
+    return request['expires_at'] + timedelta(days=int(match.group(1)))
+
+def bulk_resolve_requests(event, context):
+    """
+    POST /admin/requests/resolve
+    Body: {"action": "approve"|"reject", "request_ids": [...]} o
+    {"action": ..., "all_pending": true[, "cursor": ...]} (todas las change_time pendientes).
+    Aprobar extiende el locker a requested_until y registra un 'time_changed'
+    por solicitud. Nunca acorta: con varias aprobadas del mismo locker queda
+    la fecha más lejana (o la expiración actual si ya era mayor).
+    Si el locker ya no es del solicitante la solicitud se rechaza (result 'stale').
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+        action = body.get('action')
+        if action not in ('approve', 'reject'):
+            raise ValueError('action debe ser approve o reject')
+        if body.get('request_ids') is not None:
+            selection = BulkSelection(ids=parse_bulk_ids(body['request_ids']), by_ids=queries.bulk_requests_by_ids)
+        elif body.get('all_pending') is True:
+            after = int(decode_cursor(body['cursor'])) if body.get('cursor') else 0
+            selection = BulkSelection(page_sql=queries.BULK_PENDING_REQUESTS, page_args=['change_time'], after=after)
+        else:
+            raise ValueError('Falta request_ids o all_pending')
+    except (ValueError, TypeError) as e:
+        return db_utils.format_response(400, {'message': str(e)})
+
+    def apply_chunk(cur, rows, requested):
+        found = {row['id']: row for row in rows}
+        results, approved, rejected, extensions = {}, [], [], {}
+        for row in rows:
+            if row['status'] != 'pending':
+                results[row['id']] = {'result': 'already_resolved', 'status': row['status']}
+            elif action == 'reject':
+                rejected.append(row['id'])
+                results[row['id']] = {'result': 'rejected'}
+            elif row['request_type'] != 'change_time':
+                results[row['id']] = {'result': 'unsupported_type', 'request_type': row['request_type']}
+            elif row['locker_status'] != 'occupied' or row['current_user_id'] != row['user_id']:
+                rejected.append(row['id'])
+                results[row['id']] = {'result': 'stale'}
+            elif requested_until(row) is None:
+                results[row['id']] = {'result': 'missing_requested_until'}
+            else:
+                until = requested_until(row)
+                approved.append(row)
+                # La fila del locker está bloqueada: su expires_at ya incluye chunks anteriores
+                current = extensions.get(row['locker_id'], row['expires_at'])
+                extensions[row['locker_id']] = max(until, current) if current else until
+                results[row['id']] = {'result': 'approved', 'previous_expires_at': row['expires_at'],
+                                      'requested_until': until}
+
+        for row in approved:
+            results[row['id']]['expires_at'] = extensions[row['locker_id']]
+        if extensions:
+            cur.executemany(queries.SET_LOCKER_EXPIRATION,
+                            [(until, locker_id) for locker_id, until in extensions.items()])
+            cur.executemany(queries.INSERT_ACCESS_LOG, log_rows(event, 'time_changed', [
+                (row['locker_id'], row['user_id'], f'Solicitud {row["id"]} aprobada por admin') for row in approved]))
+        for status, ids in (('approved', [row['id'] for row in approved]), ('rejected', rejected)):
+            if ids:
+                cur.execute(queries.resolve_requests(len(ids)), [status] + ids)
+
+        items = []
+        for request_id in requested:
+            row = found.get(request_id)
+            if row is None:
+                items.append({'id': request_id, 'result': 'not_found'})
+            else:
+                items.append(dict({'id': request_id, 'locker_id': row['locker_id']}, **results[request_id]))
+        return items
+
+    try:
+        return db_utils.format_response(200, run_bulk(selection, apply_chunk, context))
+    except Exception as e:
+        logger.error(str(e))
+        return db_utils.format_response(500, {'error': str(e)})
+
+def get_requests(event):
+    """
+    GET /admin/requests
+    Query params: status (default pending), type (change_time|cancel), limit, cursor.
+    Paginado por id para recorrer la cola de pendientes.
+    """
+    params = event.get('queryStringParameters') or {}
+    try:
+        limit = min(max(int(params.get('limit', LIST_DEFAULT_LIMIT)), 1), LIST_MAX_LIMIT)
+        after_id = int(decode_cursor(params['cursor'])) if params.get('cursor') else None
+    except (ValueError, TypeError):
+        return db_utils.format_response(400, {'message': 'limit o cursor inválido'})
+
+    where, args = ["r.status = %s"], [params.get('status') or 'pending']
+    if params.get('type'):
+        where.append("r.request_type = %s")
+        args.append(params['type'])
+    if after_id is not None:
+        where.append("r.id > %s")
+        args.append(after_id)
+
+    conn = db_utils.get_db_connection('read', pin_key=ADMIN_PIN_KEY)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(queries.admin_request_list(where), args + [limit + 1])
+            requests = cur.fetchall()
+
+        next_cursor = None
+        if len(requests) > limit:
+            requests = requests[:limit]
+            next_cursor = encode_cursor(str(requests[-1]['id']))
+        return db_utils.format_response(200, {'items': requests, 'next_cursor': next_cursor})
+    except Exception as e:
+        logger.error(str(e))
+        return db_utils.format_response(500, {'error': str(e)})
+    finally:
+        db_utils.release_db_connection(conn)
+
+def get_audit_table():
+    """Tabla de auditoría; boto3 se importa y construye una vez por contenedor."""
+    global _audit_table
+    if _audit_table is None:
+        import boto3
+        dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL') or None)
+        _audit_table = dynamodb.Table(AUDIT_TABLE_NAME)
+    return _audit_table
+
+def parse_log_bound(value, end_of_day=False):
+    """
+    ISO (fecha o fecha-hora) -> string comparable con el sort key 'timestamp'.
+    El límite superior termina en '~' (mayor que '#'): incluye los sufijos
+    de audit_sort_key del último microsegundo.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        return value + 'T23:59:59.999999~'
+    bound = parsed.isoformat(timespec='microseconds')
+    return bound + '~' if end_of_day else bound
+
+def log_item_view(item):
+    """
+    Solo lo que muestra la UI; count viene como Decimal de DynamoDB.
+    id es el sort key completo (único), timestamp solo su parte ISO.
+    """
+    view = {'id': item['timestamp'], 'timestamp': audit_timestamp(item['timestamp']),
+            'status': item.get('status'), 'reason': item.get('reason')}
+    if 'count' in item:
+        view['count'] = int(item['count'])
+    return view
+
+def get_locker_logs(event, path):
+    """
+    GET /admin/lockers/{lockerId}/logs
+    Query params: from, to (ISO), status (ej. FAILED,THROTTLED), limit, cursor, order (desc|asc).
+    Siempre un Query sobre la partición del locker (nunca Scan), más reciente primero.
+    """
+    parts = path.rstrip('/').split('/')
+    locker_id = parts[-2] if len(parts) >= 2 else ''
+    if not locker_id.isdigit():
+        return db_utils.format_response(400, {'message': 'ID de locker inválido'})
+
+    params = event.get('queryStringParameters') or {}
+    try:
+        limit = min(max(int(params.get('limit', LOGS_DEFAULT_LIMIT)), 1), LOGS_MAX_LIMIT)
+        start = parse_log_bound(params.get('from'))
+        end = parse_log_bound(params.get('to'), end_of_day=True)
+        after = decode_cursor(params['cursor']) if params.get('cursor') else None
+    except (ValueError, TypeError):
+        return db_utils.format_response(400, {'message': 'limit, from, to o cursor inválido'})
+    statuses = [s.strip().upper() for s in params['status'].split(',') if s.strip()] if params.get('status') else []
+
+    from boto3.dynamodb.conditions import Key, Attr
+    key_condition = Key('locker_id').eq(locker_id)
+    if start and end:
+        key_condition &= Key('timestamp').between(start, end)
+    elif start:
+        key_condition &= Key('timestamp').gte(start)
+    elif end:
+        key_condition &= Key('timestamp').lte(end)
+
+    query = {
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': params.get('order') == 'asc',
+        # timestamp/status/count son palabras reservadas en DynamoDB
+        'ProjectionExpression': '#ts, #st, reason, #ct',
+        'ExpressionAttributeNames': {'#ts': 'timestamp', '#st': 'status', '#ct': 'count'},
+        'Limit': limit,
+    }
+    if statuses:
+        query['FilterExpression'] = Attr('status').is_in(statuses)
+    if after:
+        # El cursor solo trae el sort key: la partición sale siempre de la URL
+        query['ExclusiveStartKey'] = {'locker_id': locker_id, 'timestamp': after}
+
+    try:
+        table = get_audit_table()
+        items, last_key, pages = [], None, 0
+        while pages < LOGS_MAX_QUERY_PAGES:
+            page = table.query(**query)
+            pages += 1
+            items.extend(page.get('Items', []))
+            last_key = page.get('LastEvaluatedKey')
+            if len(items) >= limit or not last_key:
+                break
+            query['ExclusiveStartKey'] = last_key
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1]['timestamp'])
+        elif last_key:
+            next_cursor = encode_cursor(last_key['timestamp'])
+
+        return db_utils.format_response(200, {
+            'locker_id': int(locker_id),
+            'items': [log_item_view(item) for item in items],
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        logger.error(f"Error consultando logs del locker {locker_id}: {str(e)}")
+        return db_utils.format_response(500, {'error': str(e)})
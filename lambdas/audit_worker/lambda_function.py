@@ -0,0 +1,315 @@
+import os
+import time
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+import db_utils # Helper compartido
+import queries
+import auth_tokens
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+WATERMARK_NAME = 'suspicious_activity'
+# Ventana deslizante = suma de buckets de BUCKET_SECONDS dentro de WINDOW_SECONDS
+SUSPICIOUS_WINDOW_SECONDS = int(os.environ.get('SUSPICIOUS_WINDOW_SECONDS', '300'))
+SUSPICIOUS_BUCKET_SECONDS = int(os.environ.get('SUSPICIOUS_BUCKET_SECONDS', '60'))
+# Umbrales por ventana
+LOCKER_FAILURE_THRESHOLD = int(os.environ.get('LOCKER_FAILURE_THRESHOLD', '10'))
+IP_FAILURE_THRESHOLD = int(os.environ.get('IP_FAILURE_THRESHOLD', '30'))
+ENUMERATION_LOCKER_THRESHOLD = int(os.environ.get('ENUMERATION_LOCKER_THRESHOLD', '5'))
+# Logs por transacción y tope por corrida (lo que falte se procesa en la siguiente)
+AUDIT_CHUNK_SIZE = int(os.environ.get('AUDIT_CHUNK_SIZE', '5000'))
+AUDIT_MAX_ROWS_PER_RUN = int(os.environ.get('AUDIT_MAX_ROWS_PER_RUN', '200000'))
+AUDIT_MIN_REMAINING_MS = int(os.environ.get('AUDIT_MIN_REMAINING_MS', '5000'))
+# Segundos tras observar MAX(access_logs.id) para darlo por asentado: tiene que
+# superar la transacción más larga que inserta en access_logs
+AUDIT_SETTLE_SECONDS = int(os.environ.get('AUDIT_SETTLE_SECONDS', '60'))
+PURGE_BATCH_SIZE = 10000
+ALERTS_DEFAULT_LIMIT = 50
+ALERTS_MAX_LIMIT = 200
+
+@db_utils.instrumented_handler('audit_worker')
+def lambda_handler(event, context):
+    """
+    LambdaSecurityAuditWorker.
+    - Programado (EventBridge) o invocación directa: procesa los access_logs
+      nuevos desde el watermark y registra alertas.
+    - GET /security/audit/suspicious-events: lista las alertas (admin).
+    """
+    event = event or {}
+    path = event.get('path', '') or event.get('rawPath', '')
+    http_method = event.get('httpMethod', '') or event.get('requestContext', {}).get('http', {}).get('method')
+
+    if not http_method:
+        try:
+            result = detect_suspicious_activity(context)
+            logger.info(f"Detección terminada: {result}")
+            return db_utils.format_response(200, result)
+        except Exception as e:
+            logger.error(f"Error en detección de actividad sospechosa: {str(e)}")
+            return db_utils.format_response(500, {'error': str(e)})
+
+    logger.info(f"Audit Request: {http_method} {path}")
+    if http_method == 'OPTIONS':
+        return db_utils.format_response(200, {})
+    if 'suspicious-events' in path and http_method == 'GET':
+        auth_error = auth_tokens.require_admin(event)
+        if auth_error:
+            return auth_error
+        return get_suspicious_events(event)
+
+    return db_utils.format_response(404, {'message': 'Ruta de auditoría no encontrada'})
+
+# --- DETECCIÓN INCREMENTAL ---
+
+def has_time_left(context):
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return True
+    return context.get_remaining_time_in_millis() > AUDIT_MIN_REMAINING_MS
+
+def bucket_of(ts):
+    epoch = int(ts.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % SUSPICIOUS_BUCKET_SECONDS)
+
+def window_index(bucket):
+    """Período fijo de la ventana: una alerta por tipo/llave/período."""
+    return int(bucket.timestamp()) // SUSPICIOUS_WINDOW_SECONDS
+
+def window_buckets(bucket):
+    """(inicio, fin) de la ventana deslizante que termina en `bucket`."""
+    return bucket - timedelta(seconds=SUSPICIOUS_WINDOW_SECONDS - SUSPICIOUS_BUCKET_SECONDS), bucket
+
+def bucket_range(touched):
+    """Rango de buckets a leer para evaluar todas las ventanas que terminan en `touched`."""
+    return window_buckets(min(touched))[0], max(touched)
+
+def locker_alerts(cur, locker_counts, detected_at):
+    """Ráfagas de fallos por locker en los buckets tocados por este chunk."""
+    touched = defaultdict(set)
+    for locker_id, bucket in locker_counts:
+        touched[locker_id].add(bucket)
+    if not touched:
+        return []
+    start, end = bucket_range([b for buckets in touched.values() for b in buckets])
+    locker_ids = list(touched)
+    cur.execute(queries.locker_failure_buckets(len(locker_ids)), locker_ids + [start, end])
+    stored = defaultdict(dict)
+    for row in cur.fetchall():
+        stored[row['locker_id']][row['bucket_start']] = row['failures']
+
+    alerts = []
+    for locker_id, buckets in touched.items():
+        for bucket in sorted(buckets):
+            w_start, w_end = window_buckets(bucket)
+            failures = sum(n for b, n in stored[locker_id].items() if w_start <= b <= w_end)
+            if failures >= LOCKER_FAILURE_THRESHOLD:
+                alerts.append(('locker_burst', locker_id, None, failures, None, w_start,
+                               w_end + timedelta(seconds=SUSPICIOUS_BUCKET_SECONDS), detected_at,
+                               f'locker_burst:{locker_id}:{window_index(bucket)}'))
+    return alerts
+
+def ip_alerts(cur, ip_counts, detected_at):
+    """Ráfagas por IP y enumeración (muchos lockers distintos desde una IP)."""
+    touched = defaultdict(set)
+    for source_ip, bucket, _ in ip_counts:
+        touched[source_ip].add(bucket)
+    if not touched:
+        return []
+    start, end = bucket_range([b for buckets in touched.values() for b in buckets])
+    ips = list(touched)
+    cur.execute(queries.ip_failure_buckets(len(ips)), ips + [start, end])
+    stored = defaultdict(list)
+    for row in cur.fetchall():
+        stored[row['source_ip']].append((row['bucket_start'], row['locker_id'], row['failures']))
+
+    alerts = []
+    for source_ip, buckets in touched.items():
+        for bucket in sorted(buckets):
+            w_start, w_end = window_buckets(bucket)
+            in_window = [(locker_id, n) for b, locker_id, n in stored[source_ip] if w_start <= b <= w_end]
+            failures = sum(n for _, n in in_window)
+            lockers = len({locker_id for locker_id, _ in in_window})
+            w_close = w_end + timedelta(seconds=SUSPICIOUS_BUCKET_SECONDS)
+            if failures >= IP_FAILURE_THRESHOLD:
+                alerts.append(('ip_burst', None, source_ip, failures, lockers, w_start, w_close, detected_at,
+                               f'ip_burst:{source_ip}:{window_index(bucket)}'))
+            if lockers >= ENUMERATION_LOCKER_THRESHOLD:
+                alerts.append(('enumeration', None, source_ip, failures, lockers, w_start, w_close, detected_at,
+                               f'enumeration:{source_ip}:{window_index(bucket)}'))
+    return alerts
+
+def process_chunk(cur, rows):
+    """Suma los fallos del chunk a los buckets y evalúa solo las ventanas afectadas."""
+    locker_counts = Counter()
+    ip_counts = Counter()
+    for row in rows:
+        bucket = bucket_of(row['created_at'])
+        locker_counts[(row['locker_id'], bucket)] += 1
+        if row['source_ip']:
+            ip_counts[(row['source_ip'], bucket, row['locker_id'])] += 1
+
+    if locker_counts:
+        cur.executemany(queries.UPSERT_LOCKER_FAILURES,
+                        [(locker_id, bucket, n) for (locker_id, bucket), n in locker_counts.items()])
+    if ip_counts:
+        cur.executemany(queries.UPSERT_IP_FAILURES,
+                        [(ip, bucket, locker_id, n) for (ip, bucket, locker_id), n in ip_counts.items()])
+
+    detected_at = datetime.now().replace(microsecond=0)
+    alerts = locker_alerts(cur, locker_counts, detected_at) + ip_alerts(cur, ip_counts, detected_at)
+    if not alerts:
+        return 0
+    # INSERT IGNORE: una ventana que sigue abierta en el próximo chunk no duplica la alerta
+    cur.executemany(queries.INSERT_SECURITY_ALERT, alerts)
+    return cur.rowcount
+
+def purge_old_buckets(conn, newest_bucket):
+    """Borra en lotes los buckets que ya no entran en ninguna ventana."""
+    cutoff = newest_bucket - timedelta(seconds=2 * SUSPICIOUS_WINDOW_SECONDS)
+    purged = 0
+    with conn.cursor() as cur:
+        for sql in (queries.PURGE_LOCKER_FAILURES, queries.PURGE_IP_FAILURES):
+            cur.execute(sql, (cutoff, PURGE_BATCH_SIZE))
+            purged += cur.rowcount
+    conn.commit()
+    return purged
+
+def settled_ceiling(conn):
+    """
+    Id hasta el que access_logs ya no puede recibir filas nuevas.
+
+    El id se asigna en el INSERT pero la fila se ve en el COMMIT, así que un
+    id menor puede aparecer después de que el watermark pasó por encima. Se
+    guarda el MAX(id) visible y recién cuando lleva AUDIT_SETTLE_SECONDS pasa
+    a ser el techo (safe_id): toda transacción con un id menor ya había
+    empezado al observarlo y para entonces terminó.
+    """
+    with conn.cursor() as cur:
+        cur.execute(queries.AUDIT_WATERMARK_FOR_UPDATE, (WATERMARK_NAME,))
+        row = cur.fetchone()
+        if not row:
+            conn.commit()
+            return 0
+        safe_id = row['safe_id']
+        age = row['observed_age']
+        if age is None or age >= AUDIT_SETTLE_SECONDS:
+            if age is not None:
+                safe_id = max(safe_id, row['observed_id'])
+            cur.execute(queries.MAX_ACCESS_LOG_ID)
+            observed_id = cur.fetchone()['max_id']
+            cur.execute(queries.UPDATE_AUDIT_OBSERVATION, (safe_id, observed_id, WATERMARK_NAME))
+    conn.commit()
+    return safe_id
+
+def detect_suspicious_activity(context=None):
+    """
+    Procesa los access_logs fallidos con watermark < id <= techo asentado en
+    chunks. Cada chunk actualiza buckets, alertas y watermark en la misma
+    transacción, así que un reintento nunca cuenta dos veces el mismo log, y
+    el techo evita saltear ids cuyo commit llega tarde.
+    """
+    started = time.perf_counter()
+    processed = 0
+    alerts = 0
+    chunks = 0
+    newest_bucket = None
+    watermark = None
+    ceiling = None
+    conn = db_utils.get_db_connection()
+    try:
+        ceiling = settled_ceiling(conn)
+        while processed < AUDIT_MAX_ROWS_PER_RUN and has_time_left(context):
+            with conn.cursor() as cur:
+                # El lock sobre la fila del watermark serializa corridas concurrentes
+                cur.execute(queries.AUDIT_WATERMARK_FOR_UPDATE, (WATERMARK_NAME,))
+                row = cur.fetchone()
+                watermark = row['last_id'] if row else 0
+                if watermark >= ceiling:
+                    conn.commit()
+                    break
+                limit = min(AUDIT_CHUNK_SIZE, AUDIT_MAX_ROWS_PER_RUN - processed)
+                cur.execute(queries.NEW_FAILED_ACCESS_LOGS, (watermark, ceiling, limit))
+                rows = cur.fetchall()
+                if not rows:
+                    # Sin fallos hasta el techo: el watermark igual avanza hasta él
+                    cur.execute(queries.UPDATE_AUDIT_WATERMARK, (ceiling, WATERMARK_NAME))
+                    watermark = ceiling
+                    conn.commit()
+                    break
+
+                alerts += process_chunk(cur, rows)
+                # Chunk incompleto = no quedan fallos hasta el techo
+                watermark = rows[-1]['id'] if len(rows) == limit else ceiling
+                cur.execute(queries.UPDATE_AUDIT_WATERMARK, (watermark, WATERMARK_NAME))
+                conn.commit()
+
+            processed += len(rows)
+            chunks += 1
+            last_bucket = bucket_of(rows[-1]['created_at'])
+            newest_bucket = max(newest_bucket, last_bucket) if newest_bucket else last_bucket
+            if len(rows) < AUDIT_CHUNK_SIZE:
+                break
+
+        purged = purge_old_buckets(conn, newest_bucket) if newest_bucket else 0
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db_utils.release_db_connection(conn)
+
+    return {
+        'processed': processed,
+        'chunks': chunks,
+        'alerts': alerts,
+        'watermark': watermark,
+        'settled_id': ceiling,
+        'purged_buckets': purged,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+# --- CONSULTA DE ALERTAS ---
+
+def get_suspicious_events(event):
+    """
+    GET /security/audit/suspicious-events
+    Query params: type, locker_id, since (ISO), limit, cursor (id de la última alerta vista).
+    """
+    params = event.get('queryStringParameters') or {}
+    try:
+        limit = min(max(int(params.get('limit', ALERTS_DEFAULT_LIMIT)), 1), ALERTS_MAX_LIMIT)
+        before_id = int(params['cursor']) if params.get('cursor') else None
+        since = datetime.fromisoformat(params['since']) if params.get('since') else None
+        locker_id = int(params['locker_id']) if params.get('locker_id') else None
+    except (ValueError, TypeError):
+        return db_utils.format_response(400, {'message': 'limit, cursor, since o locker_id inválido'})
+
+    where, args = [], []
+    if params.get('type'):
+        where.append("alert_type = %s")
+        args.append(params['type'])
+    if locker_id is not None:
+        where.append("locker_id = %s")
+        args.append(locker_id)
+    if since is not None:
+        where.append("detected_at >= %s")
+        args.append(since)
+    if before_id is not None:
+        where.append("id < %s")
+        args.append(before_id)
+
+    conn = db_utils.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(queries.security_alerts_page(where), args + [limit + 1])
+            items = cur.fetchall()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = str(items[-1]['id'])
+        return db_utils.format_response(200, {'items': items, 'next_cursor': next_cursor})
+    except Exception as e:
+        logger.error(str(e))
+        return db_utils.format_response(500, {'error': str(e)})
+    finally:
+        db_utils.release_db_connection(conn)
@@ -4,13 +4,21 @@ import os
 import logging
 # Importamos la utilidad que acabamos de crear (estará en la misma carpeta en el ZIP)
 import db_utils 
+import queries
+import auth_tokens
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Sin llave de firma el login no puede emitir tokens: se avisa en el cold start
+# y login/me responden un error de configuración explícito en vez de un 500 genérico.
+if not auth_tokens.token_secret_configured():
+    logger.error(auth_tokens.CONFIG_ERROR_MESSAGE)
+
+@db_utils.instrumented_handler('auth')
 def lambda_handler(event, context):
     """
-    Router principal para /auth/register y /auth/login
+    Router principal para /auth/register, /auth/login y /auth/me
     """
     # Detectar path y método desde API Gateway
     path = event.get('path', '') or event.get('rawPath', '')
@@ -25,6 +33,8 @@ def lambda_handler(event, context):
         return register(event)
     elif 'login' in path and http_method == 'POST':
         return login(event)
+    elif path.endswith('/auth/me') and http_method == 'GET':
+        return get_me(event)
     else:
         return db_utils.format_response(404, {'message': 'Ruta no encontrada'})
 
@@ -56,7 +66,7 @@ def register(event):
         conn = db_utils.get_db_connection()
         with conn.cursor() as cur:
             # Verificar duplicados
-            cur.execute("SELECT id FROM users WHERE email = %s", (email,))
+            cur.execute(queries.USER_ID_BY_EMAIL, (email,))
             if cur.fetchone():
                 return db_utils.format_response(409, {'message': 'El usuario ya existe'})
 
@@ -71,9 +81,11 @@ def register(event):
         logger.error(e)
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        if 'conn' in locals(): conn.close()
+        if 'conn' in locals(): db_utils.release_db_connection(conn)
 
 def login(event):
+    if not auth_tokens.token_secret_configured():
+        return auth_tokens.config_error_response()
     try:
         body = json.loads(event.get('body', '{}'))
         email = body.get('email')
@@ -81,7 +93,7 @@ def login(event):
 
         conn = db_utils.get_db_connection()
         with conn.cursor() as cur:
-            cur.execute("SELECT id, name, role, password_hash FROM users WHERE email = %s", (email,))
+            cur.execute(queries.USER_LOGIN_BY_EMAIL, (email,))
             user = cur.fetchone()
 
             if user and verify_password(user['password_hash'], password):
@@ -94,12 +106,37 @@ def login(event):
                         'email': email,
                         'role': user['role']
                     },
-                    'token': f"mock-jwt-{user['id']}-{os.urandom(4).hex()}" # Placeholder para JWT real
+                    # JWT HS256 con id, rol y expiración: las demás Lambdas lo verifican sin BD
+                    'token': auth_tokens.issue_token(user['id'], user['role'], user['name'], email)
                 })
             else:
                 return db_utils.format_response(401, {'message': 'Credenciales inválidas'})
+    except auth_tokens.TokenConfigError as e:
+        logger.error(str(e))
+        return auth_tokens.config_error_response()
     except Exception as e:
         logger.error(e)
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        if 'conn' in locals(): conn.close()
\ No newline at end of file
+        if 'conn' in locals(): db_utils.release_db_connection(conn)
+
+def get_me(event):
+    """Perfil del usuario autenticado, directo de los claims del token (sin BD)"""
+    try:
+        claims = auth_tokens.authenticate(event)
+    except auth_tokens.InvalidToken as e:
+        return db_utils.format_response(401, {'message': f'Token inválido: {str(e)}'})
+    except auth_tokens.TokenConfigError as e:
+        logger.error(str(e))
+        return auth_tokens.config_error_response()
+    if claims is None:
+        return db_utils.format_response(401, {'message': 'Falta token de sesión'})
+    return db_utils.format_response(200, {
+        'user': {
+            'id': int(claims['sub']),
+            'name': claims.get('name'),
+            'email': claims.get('email'),
+            'role': claims.get('role')
+        },
+        'expires_at': claims['exp']
+    })
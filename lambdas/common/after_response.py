@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Trabajo después de responder, dentro de la misma invocación. Lambda entrega
+# la respuesta apenas el runtime la publica, pero no congela el contenedor
+# hasta que cada extensión registrada pide el siguiente evento: una extensión
+# interna (un hilo de este mismo proceso) corre ahí los flush. La duración
+# facturada incluye ese tramo (métrica PostRuntimeExtensionsDuration); la
+# latencia que ve el cliente no.
+# AFTER_RESPONSE_ENABLED=0, o fuera de Lambda (sin AWS_LAMBDA_RUNTIME_API),
+# los callbacks corren en línea al terminar el handler.
+AFTER_RESPONSE_ENABLED = os.environ.get('AFTER_RESPONSE_ENABLED', '1') == '1'
+EXTENSIONS_API_VERSION = '2020-01-01'
+
+class AfterResponse:
+    """
+    Extensión interna de Lambda que corre callbacks al terminar cada
+    invocación. start() registra la extensión (solo durante el init, es
+    decir al importar el módulo del handler); done() se llama en el finally
+    del handler.
+    """
+
+    def __init__(self, name, enabled=AFTER_RESPONSE_ENABLED, runtime_api=None):
+        self.name = name
+        self.enabled = enabled
+        self.runtime_api = runtime_api or os.environ.get('AWS_LAMBDA_RUNTIME_API')
+        self.active = False
+        self._callbacks = []
+        self._done = threading.Event()
+        self._extension_id = None
+        self._thread = None
+        self.stats = {'invocations': 0, 'inline': 0, 'errors': 0}
+
+    def add(self, callback):
+        self._callbacks.append(callback)
+
+    def start(self):
+        """Registra la extensión y arranca su hilo; False = se corre en línea."""
+        if not self.enabled or not self.runtime_api or self.active:
+            return self.active
+        try:
+            headers, _ = self._call('POST', 'register', {'events': ['INVOKE']},
+                                    {'Lambda-Extension-Name': self.name})
+            self._extension_id = headers['Lambda-Extension-Identifier']
+        except Exception as e:
+            logger.error(f"No se pudo registrar la extensión {self.name}, flush en línea: {str(e)}")
+            return False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self.active = True
+        return True
+
+    def done(self):
+        """Fin del handler: con la extensión activa solo avisa; si no, corre los callbacks ya."""
+        if self.active:
+            self._done.set()
+        else:
+            self.stats['inline'] += 1
+            self._run_callbacks()
+
+    def _call(self, method, path, body=None, headers=None):
+        """Extensions API: (headers, body JSON) de /extension/<path>."""
+        import urllib.request  # Solo dentro de Lambda: no pesa en el arranque fuera de ella
+        url = f"http://{self.runtime_api}/{EXTENSIONS_API_VERSION}/extension/{path}"
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+        # Sin timeout: event/next bloquea hasta la próxima invocación
+        with urllib.request.urlopen(request) as response:
+            return response.headers, json.loads(response.read() or b'{}')
+
+    def _next_event(self):
+        _, event = self._call('GET', 'event/next', headers={'Lambda-Extension-Identifier': self._extension_id})
+        return event
+
+    def _run(self):
+        while True:
+            try:
+                event = self._next_event()
+            except Exception as e:
+                # Sin Extensions API no hay a quién avisar: lo que siga se corre en línea
+                logger.error(f"Extensión {self.name} detenida: {str(e)}")
+                self.active = False
+                return
+            if event.get('eventType') != 'INVOKE':
+                continue
+            # Si el handler nunca llega al finally (timeout) no esperamos más que la invocación
+            deadline_ms = event.get('deadlineMs')
+            self.wait_and_run(max(deadline_ms / 1000.0 - time.time(), 0) if deadline_ms else None)
+
+    def wait_and_run(self, timeout=None):
+        """Espera el done() de la invocación en curso y corre los callbacks."""
+        self._done.wait(timeout)
+        self._done.clear()
+        self.stats['invocations'] += 1
+        self._run_callbacks()
+
+    def _run_callbacks(self):
+        for callback in self._callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error en callback post-respuesta de {self.name}: {str(e)}")
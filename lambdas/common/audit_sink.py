@@ -0,0 +1,283 @@
+import os
+import time
+import logging
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+import db_utils
+import queries
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+def audit_sort_key(when=None):
+    """
+    Sort key 'timestamp' de la tabla de auditoría: ISO con microsegundos +
+    sufijo aleatorio, así dos intentos del mismo locker en el mismo instante
+    (lotes, contenedores concurrentes) no se pisan. El prefijo ISO mantiene
+    el orden y los rangos por fecha.
+    """
+    when = when or datetime.now()
+    return f"{when.isoformat(timespec='microseconds')}#{uuid.uuid4().hex[:12]}"
+
+def audit_window_key(window_seconds, label, now=None):
+    """
+    Sort key compartido por todos los conteos de una ventana de
+    window_seconds (ej. '2026-10-18T12:00:10.000000#throttled'): los
+    contenedores que cuentan lo mismo suman sobre el mismo item.
+    """
+    now = time.time() if now is None else now
+    start = datetime.fromtimestamp(now - now % window_seconds)
+    return f"{start.isoformat(timespec='microseconds')}#{label}"
+
+def audit_timestamp(sort_key):
+    """Parte ISO del sort key (los items viejos no tienen sufijo)."""
+    return sort_key.split('#', 1)[0]
+
+class AuditSink:
+    """
+    Buffer de auditoría hacia DynamoDB fuera del camino crítico.
+    record() solo encola; flush() al final de la invocación (o, con
+    background=True, un hilo en segundo plano) escribe en lotes con
+    batch_writer. En segundo plano lo pendiente queda congelado con el
+    contenedor cuando el handler responde: solo para quien acepta perderlo.
+    El buffer es acotado: si se llena se descartan los items más viejos.
+    record_count() acumula contadores que flush() suma con UpdateItem ADD
+    sobre un item por llave, así que el agregado cruza invocaciones y
+    contenedores sin depender de lo que quede en memoria.
+    """
+    worker_name = 'audit-sink'
+
+    def __init__(self, table_name, max_buffer=1000, max_retries=3,
+                 background=False, dynamodb_resource=None):
+        self.table_name = table_name
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self.background = background
+        self._resource = dynamodb_resource
+        self._table = None
+        self._buffer = deque()
+        # (locker_id, timestamp) -> [incremento, atributos, intentos]
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self.stats = {'recorded': 0, 'written': 0, 'batches': 0, 'retried': 0, 'dropped': 0,
+                      'counted': 0, 'counter_updates': 0}
+
+    def _get_table(self):
+        """Construye el recurso/tabla una sola vez por contenedor."""
+        if self._table is None:
+            if self._resource is None:
+                import boto3
+                # DYNAMODB_ENDPOINT_URL permite apuntar a DynamoDB Local en pruebas
+                self._resource = boto3.resource(
+                    'dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+                )
+            self._table = self._resource.Table(self.table_name)
+        return self._table
+
+    def record(self, item):
+        """Encola un item de auditoría sin hacer I/O."""
+        self._enqueue([(item, 0)])
+        self.stats['recorded'] += 1
+        if self.background:
+            self._ensure_worker()
+            self._wake.set()
+
+    def record_many(self, items):
+        """Encola varios items de auditoría de una sola vez."""
+        self._enqueue([(item, 0) for item in items])
+        self.stats['recorded'] += len(items)
+        if self.background:
+            self._ensure_worker()
+            self._wake.set()
+
+    def record_count(self, locker_id, sort_key, increment=1, **attributes):
+        """Suma increment al contador del item (locker_id, sort_key) sin hacer I/O."""
+        with self._lock:
+            entry = self._counters.get((locker_id, sort_key))
+            if entry is None:
+                if len(self._counters) >= self.max_buffer:
+                    self.stats['dropped'] += 1
+                    return
+                entry = self._counters[(locker_id, sort_key)] = [0, attributes, 0]
+            entry[0] += increment
+            entry[1].update(attributes)
+        self.stats['counted'] += increment
+        if self.background:
+            self._ensure_worker()
+            self._wake.set()
+
+    def _enqueue(self, entries):
+        with self._lock:
+            for entry in entries:
+                if len(self._buffer) >= self.max_buffer:
+                    self._buffer.popleft()
+                    self.stats['dropped'] += 1
+                self._buffer.append(entry)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer) + len(self._counters)
+
+    def _write_batch(self, items):
+        """
+        Escribe el lote con batch_writer, que reenvía los UnprocessedItems.
+        Las subclases cambian el destino sobrescribiendo este método.
+        """
+        table = self._get_table()
+        # Llaves únicas por audit_sort_key: nada que deduplicar en el lote
+        with table.batch_writer() as writer:
+            for item in items:
+                writer.put_item(Item=item)
+
+    def _add_counter(self, locker_id, sort_key, increment, attributes):
+        """UpdateItem ADD: atómico en DynamoDB, crea el item si no existe."""
+        names = {'#ct': 'count'}
+        values = {':n': increment}
+        sets = []
+        for i, (name, value) in enumerate(sorted(attributes.items())):
+            names[f'#a{i}'] = name
+            values[f':a{i}'] = value
+            sets.append(f'#a{i} = :a{i}')
+        self._get_table().update_item(
+            Key={'locker_id': locker_id, 'timestamp': sort_key},
+            UpdateExpression='ADD #ct :n' + (' SET ' + ', '.join(sets) if sets else ''),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    def flush_counters(self):
+        """
+        Un UpdateItem por contador pendiente. Si uno falla se re-encola (se
+        suma a lo que llegue mientras tanto) hasta max_retries.
+        """
+        with self._lock:
+            counters = self._counters
+            self._counters = {}
+        written = 0
+        for (locker_id, sort_key), (increment, attributes, attempts) in counters.items():
+            try:
+                self._add_counter(locker_id, sort_key, increment, attributes)
+                self.stats['counter_updates'] += 1
+                written += 1
+            except Exception as e:
+                logger.error(f"Error sumando contador de auditoría {locker_id}/{sort_key}: {str(e)}")
+                if attempts + 1 >= self.max_retries:
+                    self.stats['dropped'] += 1
+                    continue
+                self.stats['retried'] += 1
+                with self._lock:
+                    entry = self._counters.setdefault((locker_id, sort_key), [0, {}, 0])
+                    entry[0] += increment
+                    entry[1].update(attributes)
+                    entry[2] = max(entry[2], attempts + 1)
+        return written
+
+    def flush(self):
+        """
+        Escribe todo lo pendiente en un lote (_write_batch) y luego los
+        contadores. Si el lote falla por completo, los items se re-encolan
+        hasta max_retries.
+        """
+        with self._flush_lock:
+            if self._counters:
+                self.flush_counters()
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+            if not batch:
+                return 0
+
+            try:
+                self._write_batch([item for item, _ in batch])
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+                return len(batch)
+            except Exception as e:
+                logger.error(f"Error escribiendo lote de auditoría en {self.table_name}: {str(e)}")
+                retry = [(item, attempts + 1) for item, attempts in batch if attempts + 1 < self.max_retries]
+                self.stats['dropped'] += len(batch) - len(retry)
+                self.stats['retried'] += len(retry)
+                with self._lock:
+                    # Los reintentos van al frente para conservar el orden
+                    self._buffer.extendleft(reversed(retry))
+                    while len(self._buffer) > self.max_buffer:
+                        self._buffer.popleft()
+                        self.stats['dropped'] += 1
+                return 0
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name=self.worker_name, daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self.flush()
+            if self.pending():
+                # Quedaron reintentos: pequeño backoff antes del siguiente lote
+                time.sleep(0.2)
+                self._wake.set()
+
+# access_logs en MySQL (AccessLogSink). Por defecto el lote se escribe al
+# final de cada invocación con la conexión del handler: el detector del
+# audit_worker no puede depender de filas congeladas en un contenedor.
+# ACCESS_LOG_BACKGROUND_FLUSH=1 (opt-in) usa un hilo con su propia conexión.
+ACCESS_LOG_ENABLED = os.environ.get('ACCESS_LOG_ENABLED', '1') == '1'
+ACCESS_LOG_BACKGROUND_FLUSH = os.environ.get('ACCESS_LOG_BACKGROUND_FLUSH', '0') == '1'
+ACCESS_LOG_MAX_BUFFER = int(os.environ.get('ACCESS_LOG_MAX_BUFFER', '5000'))
+
+# Estados de DynamoDB -> ENUM de access_logs.status
+ACCESS_LOG_STATUSES = {'SUCCESS': 'success', 'FAILED': 'failed', 'EXPIRED': 'expired', 'INVALID_OTP': 'invalid_otp'}
+USER_AGENT_MAX_LENGTH = 255
+
+class AccessLogSink(AuditSink):
+    """
+    Write-behind hacia la tabla MySQL access_logs con el mismo buffer que
+    AuditSink: record() solo encola y el lote se escribe con un INSERT
+    multi-fila (executemany) y un commit, fuera de la transacción del
+    request, cuando el handler ya armó la respuesta. En segundo plano el
+    hilo usa su propia conexión (db_utils es por hilo). INSERT IGNORE
+    descarta las filas de lockers inexistentes (FK) sin perder el resto
+    del lote.
+    """
+    worker_name = 'access-log-sink'
+
+    def __init__(self, max_buffer=ACCESS_LOG_MAX_BUFFER, max_retries=3,
+                 background=ACCESS_LOG_BACKGROUND_FLUSH, enabled=ACCESS_LOG_ENABLED):
+        super().__init__('access_logs', max_buffer=max_buffer, max_retries=max_retries, background=background)
+        self.enabled = enabled
+
+    def record_event(self, locker_id, event_type, status, reason=None, user_id=None, event=None):
+        """
+        Encola un evento (access_attempt, otp_rotation, owner_removed,
+        time_changed) con la IP y el User-Agent del request de API Gateway.
+        """
+        if not self.enabled:
+            return
+        self.record(self.build_row(locker_id, event_type, status, reason, user_id, event))
+
+    def build_row(self, locker_id, event_type, status, reason=None, user_id=None, event=None):
+        """Fila para queries.INSERT_ACCESS_LOG_ROWS (sin I/O)."""
+        user_agent = db_utils.get_header(event, 'User-Agent') if event else None
+        return (
+            int(locker_id), user_id, event_type, ACCESS_LOG_STATUSES.get(status, status),
+            reason, db_utils.get_source_ip(event) if event else None,
+            user_agent[:USER_AGENT_MAX_LENGTH] if user_agent else None,
+            datetime.now(),
+        )
+
+    def _write_batch(self, rows):
+        conn = db_utils.get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.executemany(queries.INSERT_ACCESS_LOG_ROWS, rows)
+            conn.commit()
+        finally:
+            db_utils.release_db_connection(conn)
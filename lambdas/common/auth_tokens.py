@@ -0,0 +1,188 @@
+import os
+import json
+import hmac
+import time
+import base64
+import hashlib
+import logging
+from collections import OrderedDict
+import db_utils
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Tokens de sesión firmados (JWT HS256) verificables sin tocar la BD.
+TOKEN_TTL_SECONDS = int(os.environ.get('AUTH_TOKEN_TTL_SECONDS', '43200'))  # 12 horas
+VERIFIED_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '1024'))
+# Las rutas de usuario exigen token por defecto: el user_id del body/query
+# solo se acepta con AUTH_REQUIRED=0, opt-in explícito para pruebas locales.
+# Las rutas admin exigen token siempre (require_admin no depende de este flag).
+AUTH_REQUIRED = os.environ.get('AUTH_REQUIRED', '1') != '0'
+# Llave de firma: AUTH_TOKEN_SECRET directo o AUTH_TOKEN_SECRET_ID, un secreto
+# de Secrets Manager ({"secret": "..."}) leído y cacheado por db_utils igual
+# que el de RDS (admite 'file:///ruta.json' en local). Una de las dos es
+# obligatoria: sin llave no se emiten ni verifican tokens.
+AUTH_TOKEN_SECRET_ID = os.environ.get('AUTH_TOKEN_SECRET_ID', '')
+
+_HEADER = base64.urlsafe_b64encode(
+    json.dumps({'alg': 'HS256', 'typ': 'JWT'}, separators=(',', ':')).encode('utf-8')
+).rstrip(b'=').decode('ascii')
+
+# HMAC con la llave ya procesada: copy() evita repetir el key schedule por token
+_signer = None
+_signer_secret = None
+# Tokens ya verificados en este contenedor: token -> claims
+_verified = OrderedDict()
+
+class InvalidToken(Exception):
+    pass
+
+class TokenConfigError(RuntimeError):
+    """No hay llave de firma configurada (o no se pudo leer el secreto)."""
+    pass
+
+CONFIG_ERROR_MESSAGE = 'Autenticación no configurada: falta AUTH_TOKEN_SECRET o AUTH_TOKEN_SECRET_ID'
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def token_secret_configured():
+    """True si hay de dónde sacar la llave (no baja el secreto)."""
+    return bool(os.environ.get('AUTH_TOKEN_SECRET') or AUTH_TOKEN_SECRET_ID)
+
+def _token_secret():
+    secret = os.environ.get('AUTH_TOKEN_SECRET')
+    if not secret and AUTH_TOKEN_SECRET_ID:
+        try:
+            secret = db_utils.get_secret(AUTH_TOKEN_SECRET_ID).get('secret')
+        except Exception as e:
+            raise TokenConfigError(f'No se pudo leer {AUTH_TOKEN_SECRET_ID}: {str(e)}')
+    if not secret:
+        raise TokenConfigError(CONFIG_ERROR_MESSAGE)
+    return secret
+
+def config_error_response():
+    return db_utils.format_response(500, {'message': CONFIG_ERROR_MESSAGE})
+
+def _get_signer():
+    global _signer, _signer_secret
+    secret = _token_secret()
+    if _signer is None or secret != _signer_secret:
+        _signer = hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+        _signer_secret = secret
+        _verified.clear()
+    return _signer
+
+def _sign(signing_input):
+    mac = _get_signer().copy()
+    mac.update(signing_input.encode('ascii'))
+    return _b64encode(mac.digest())
+
+def issue_token(user_id, role, name=None, email=None, ttl_seconds=None):
+    """Firma un token con id, rol y expiración (más nombre/email para /auth/me)."""
+    now = int(time.time())
+    claims = {
+        'sub': str(user_id),
+        'role': role,
+        'name': name,
+        'email': email,
+        'iat': now,
+        'exp': now + (ttl_seconds or TOKEN_TTL_SECONDS),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    signing_input = f'{_HEADER}.{payload}'
+    return f'{signing_input}.{_sign(signing_input)}'
+
+def verify_token(token):
+    """Devuelve los claims si la firma y la expiración son válidas; si no, InvalidToken."""
+    if not token:
+        raise InvalidToken('Token ausente')
+    now = time.time()
+
+    claims = _verified.get(token)
+    if claims is not None:
+        if claims['exp'] <= now:
+            del _verified[token]
+            raise InvalidToken('Token expirado')
+        _verified.move_to_end(token)
+        return claims
+
+    try:
+        header, payload, signature = token.split('.')
+    except ValueError:
+        raise InvalidToken('Formato de token inválido')
+    if header != _HEADER:
+        raise InvalidToken('Algoritmo no soportado')
+    if not hmac.compare_digest(_sign(f'{header}.{payload}'), signature):
+        raise InvalidToken('Firma inválida')
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        raise InvalidToken('Payload inválido')
+    if not isinstance(claims.get('exp'), (int, float)) or claims['exp'] <= now:
+        raise InvalidToken('Token expirado')
+
+    if VERIFIED_CACHE_SIZE > 0:
+        _verified[token] = claims
+        while len(_verified) > VERIFIED_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return claims
+
+def bearer_token(event):
+    """Extrae el token del header Authorization: Bearer <token>."""
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'authorization'), None)
+    if value and value.startswith('Bearer '):
+        return value[len('Bearer '):].strip()
+    return None
+
+def authenticate(event):
+    """Claims del request; None si no trae token. Token inválido -> InvalidToken."""
+    token = bearer_token(event)
+    if not token:
+        return None
+    return verify_token(token)
+
+def resolve_user_id(event, claimed_user_id=None):
+    """
+    user_id efectivo del request y respuesta de error (o None).
+    Con token válido manda el token; sin token se responde 401, salvo con
+    AUTH_REQUIRED=0 (solo pruebas locales), donde se acepta el user_id del
+    body/query.
+    """
+    try:
+        claims = authenticate(event)
+    except InvalidToken as e:
+        return None, db_utils.format_response(401, {'message': f'Token inválido: {str(e)}'})
+    except TokenConfigError as e:
+        logger.error(str(e))
+        return None, config_error_response()
+    if claims is None:
+        if AUTH_REQUIRED:
+            return None, db_utils.format_response(401, {'message': 'Falta token de sesión'})
+        return claimed_user_id, None
+    if claimed_user_id and str(claimed_user_id) != claims['sub']:
+        return None, db_utils.format_response(403, {'message': 'El user_id no coincide con la sesión'})
+    return claims['sub'], None
+
+def require_admin(event):
+    """
+    Respuesta de error si el request no es de un admin (None si puede pasar).
+    Sin token se rechaza aunque AUTH_REQUIRED esté apagado: el modo sin
+    sesión es solo para las rutas de usuario en pruebas locales.
+    """
+    try:
+        claims = authenticate(event)
+    except InvalidToken as e:
+        return db_utils.format_response(401, {'message': f'Token inválido: {str(e)}'})
+    except TokenConfigError as e:
+        logger.error(str(e))
+        return config_error_response()
+    if claims is None:
+        return db_utils.format_response(401, {'message': 'Falta token de sesión'})
+    if claims.get('role') != 'admin':
+        return db_utils.format_response(403, {'message': 'Se requiere rol admin'})
+    return None
@@ -0,0 +1,50 @@
+"""
+Cursores PyMySQL instrumentados. db_utils los importa al abrir la primera
+conexión (junto con pymysql) para no cargarlos en el arranque del handler.
+"""
+import time
+import pymysql
+from db_utils import _record_query
+
+class InstrumentedDictCursor(pymysql.cursors.DictCursor):
+    """DictCursor que registra latencia y filas de cada sentencia."""
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            _record_query(query, (time.perf_counter() - started) * 1000, self.rowcount)
+
+class InstrumentedSSDictCursor(pymysql.cursors.SSDictCursor):
+    """
+    SSDictCursor (sin buffer, las filas se leen del socket a demanda).
+    Sin buffer no hay rowcount al ejecutar: la sentencia se registra al
+    cerrar el cursor con las filas leídas y el tiempo total de lectura.
+    """
+    _pending = None
+    _rows_read = 0
+
+    def execute(self, query, args=None):
+        self._record_pending()
+        self._pending = (query, time.perf_counter())
+        self._rows_read = 0
+        return super().execute(query, args)
+
+    def read_next(self):
+        row = super().read_next()
+        if row is not None:
+            self._rows_read += 1
+        return row
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._record_pending()
+
+    def _record_pending(self):
+        if self._pending is not None:
+            query, started = self._pending
+            self._pending = None
+            _record_query(query, (time.perf_counter() - started) * 1000, self._rows_read)
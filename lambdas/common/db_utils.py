@@ -1,41 +1,594 @@
 import os
-import pymysql
+import re
+import gzip
+import time
+import base64
+import functools
+import threading
 import json
 import logging
 
+# pymysql, boto3 y orjson se importan recién cuando se usan: un OPTIONS o un
+# 404 no pagan su carga en el arranque en frío (ver benchmarks/profile_startup.py)
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def get_db_connection():
+# --- CONEXIÓN REUTILIZABLE POR CONTENEDOR ---
+# Lambda reutiliza el contenedor entre invocaciones, así que guardamos la
+# conexión a nivel de módulo y evitamos el handshake TCP+TLS+auth a RDS
+# en cada request. Es por hilo: en Lambda hay un solo hilo por contenedor,
+# y en benchmarks con varios hilos cada uno simula su propio contenedor.
+_local = threading.local()
+
+# Si la conexión lleva más de este tiempo sin usarse la descartamos sin
+# intentar ping (RDS/MySQL la habrá cerrado por wait_timeout).
+MAX_IDLE_SECONDS = int(os.environ.get('RDS_MAX_IDLE_SECONDS', '300'))
+
+# --- CONFIGURACIÓN Y SECRETOS ---
+# RDS_SECRET_ID: secreto de Secrets Manager con las credenciales (formato de
+# RDS: username, password y opcionalmente host, port, dbname). Con
+# 'file:///ruta/secreto.json' se lee un JSON local, el sustituto para
+# desarrollo. Sin RDS_SECRET_ID se usan las variables RDS_* como siempre.
+RDS_SECRET_ID = os.environ.get('RDS_SECRET_ID', '')
+SECRETSMANAGER_ENDPOINT_URL = os.environ.get('SECRETSMANAGER_ENDPOINT_URL', '')
+SECRET_TTL_SECONDS = float(os.environ.get('SECRET_TTL_SECONDS', '300'))
+# En este tramo final del TTL se renueva en segundo plano sin bloquear el request
+SECRET_REFRESH_AHEAD_SECONDS = float(os.environ.get('SECRET_REFRESH_AHEAD_SECONDS', '60'))
+ER_ACCESS_DENIED = 1045
+
+secret_stats = {
+    'fetches': 0,              # Bajadas del secreto (en línea o en segundo plano)
+    'background_refreshes': 0, # Renovaciones antes de vencer, sin bloquear
+    'auth_refreshes': 0,       # Relecturas por acceso denegado (rotación)
+    'fetch_errors': 0,
+}
+# secret_id -> {'value': dict, 'expires_at': monotonic, 'refreshing': bool}
+_secrets = {}
+_secrets_lock = threading.Lock()
+_secrets_client = None
+
+def _fetch_secret(secret_id):
+    """Baja el secreto (dict) de Secrets Manager o del archivo local."""
+    global _secrets_client
+    if secret_id.startswith('file://'):
+        with open(secret_id[len('file://'):], encoding='utf-8') as f:
+            return json.load(f)
+    if _secrets_client is None:
+        import boto3
+        _secrets_client = boto3.client('secretsmanager', endpoint_url=SECRETSMANAGER_ENDPOINT_URL or None)
+    return json.loads(_secrets_client.get_secret_value(SecretId=secret_id)['SecretString'])
+
+def _load_secret(secret_id):
+    started = time.perf_counter()
+    value = _fetch_secret(secret_id)
+    with _secrets_lock:
+        secret_stats['fetches'] += 1
+        _secrets[secret_id] = {'value': value, 'expires_at': time.monotonic() + SECRET_TTL_SECONDS,
+                               'refreshing': False}
+    logger.info(f"Secreto {secret_id} cargado en {(time.perf_counter() - started) * 1000:.1f}ms")
+    return value
+
+def _refresh_secret_in_background(secret_id):
+    try:
+        _load_secret(secret_id)
+        secret_stats['background_refreshes'] += 1
+    except Exception as e:
+        secret_stats['fetch_errors'] += 1
+        logger.warning(f"No se pudo renovar el secreto {secret_id} en segundo plano. Detalle: {str(e)}")
+        with _secrets_lock:
+            if secret_id in _secrets:
+                _secrets[secret_id]['refreshing'] = False
+
+def get_secret(secret_id, force_refresh=False):
+    """
+    Secreto cacheado por contenedor: se baja una vez y se reutiliza durante
+    SECRET_TTL_SECONDS. Cerca del vencimiento se renueva en un hilo (el
+    request sigue con el valor vigente); vencido o con force_refresh se
+    baja en línea. Si la bajada falla y hay un valor anterior, se usa ese.
+    """
+    entry = _secrets.get(secret_id)
+    if entry is not None and not force_refresh:
+        remaining = entry['expires_at'] - time.monotonic()
+        if remaining > 0:
+            if remaining <= SECRET_REFRESH_AHEAD_SECONDS:
+                with _secrets_lock:
+                    start = not entry['refreshing']
+                    entry['refreshing'] = True
+                if start:
+                    threading.Thread(target=_refresh_secret_in_background, args=(secret_id,), daemon=True).start()
+            return entry['value']
+    try:
+        return _load_secret(secret_id)
+    except Exception as e:
+        secret_stats['fetch_errors'] += 1
+        if entry is None:
+            raise
+        logger.warning(f"No se pudo bajar el secreto {secret_id}, se usa el valor anterior. Detalle: {str(e)}")
+        return entry['value']
+
+# Llave de la config -> llave en el secreto (mismo formato que los secretos de RDS)
+_SECRET_FIELDS = (('host', 'host'), ('port', 'port'), ('user', 'username'), ('password', 'password'), ('db', 'dbname'))
+
+def get_db_config(force_refresh=False):
+    """host, port, user, password y db: RDS_* pisadas por lo que traiga RDS_SECRET_ID."""
+    config = {
+        'host': os.environ.get('RDS_HOST'),
+        'port': RDS_PORT,
+        'user': os.environ.get('RDS_USER'),
+        'password': os.environ.get('RDS_PASSWORD'),
+        'db': os.environ.get('RDS_DB_NAME'),
+    }
+    if RDS_SECRET_ID:
+        secret = get_secret(RDS_SECRET_ID, force_refresh=force_refresh)
+        for key, secret_key in _SECRET_FIELDS:
+            if secret.get(secret_key) not in (None, ''):
+                config[key] = secret[secret_key]
+        config['port'] = int(config['port'])
+    missing = [key for key in ('host', 'user', 'password', 'db') if not config[key]]
+    if missing:
+        raise RuntimeError(f"Configuración de RDS incompleta ({', '.join(missing)}): "
+                           "definir RDS_SECRET_ID o las variables RDS_*")
+    return config
+
+# --- RÉPLICA DE LECTURA ---
+# Con RDS_READER_HOST, get_db_connection('read') usa el endpoint reader; sin
+# él (o si el reader no responde) todo va al writer como siempre.
+RDS_READER_HOST = os.environ.get('RDS_READER_HOST', '')
+RDS_PORT = int(os.environ.get('RDS_PORT', '3306'))
+RDS_READER_PORT = int(os.environ.get('RDS_READER_PORT', str(RDS_PORT)))
+# Tras un fallo del reader no se reintenta durante este tiempo
+READER_RETRY_SECONDS = float(os.environ.get('READER_RETRY_SECONDS', '30'))
+# Lecturas de una llave (ej. un usuario) van al writer este tiempo después de que escribió
+READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', '10'))
+MAX_PINS = 10000
+
+# Contadores para medir la tasa de reuso del contenedor
+connection_stats = {
+    'new': 0,          # Conexiones abiertas desde cero
+    'reused': 0,       # Conexiones reutilizadas (ping OK)
+    'reconnects': 0,   # Conexiones descartadas por idle o ping fallido
+    'reader': 0,       # Lecturas servidas por el reader
+    'reader_fallbacks': 0,  # Lecturas que fueron al writer por reader caído
+    'pinned_reads': 0,      # Lecturas que fueron al writer por read-your-writes
+}
+
+# llave -> time.monotonic() hasta el que sus lecturas van al writer
+_writer_pins = {}
+_pins_lock = threading.Lock()
+
+# --- INSTRUMENTACIÓN POR INVOCACIÓN ---
+# Cada handler decorado con instrumented_handler() emite al final una línea
+# JSON en formato CloudWatch EMF con queries, latencias y filas por ruta.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'SmartLocker')
+# Umbral del log de queries lentas en ms (0 = apagado)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '0'))
+# Máximo de sentencias detalladas por línea de métricas
+METRICS_MAX_STATEMENTS = 20
+
+def _new_metrics():
+    return {'queries': 0, 'query_ms': 0.0, 'rows': 0, 'connect_ms': 0.0, 'statements': []}
+
+def current_metrics():
+    """Métricas acumuladas de la invocación en curso (por hilo)."""
+    metrics = getattr(_local, 'metrics', None)
+    if metrics is None:
+        metrics = _local.metrics = _new_metrics()
+    return metrics
+
+def _record_query(sql, elapsed_ms, rows):
+    metrics = current_metrics()
+    metrics['queries'] += 1
+    metrics['query_ms'] += elapsed_ms
+    metrics['rows'] += max(rows or 0, 0)
+    statement = ' '.join(str(sql).split())[:200]
+    if len(metrics['statements']) < METRICS_MAX_STATEMENTS:
+        metrics['statements'].append({'sql': statement, 'ms': round(elapsed_ms, 2), 'rows': rows})
+    if SLOW_QUERY_MS and elapsed_ms >= SLOW_QUERY_MS:
+        logger.warning(json.dumps({'slow_query': statement, 'ms': round(elapsed_ms, 2), 'rows': rows}))
+
+def __getattr__(name):
+    # Las clases de cursor viven en db_cursors, que importa pymysql: se
+    # cargan al abrir la primera conexión y no en el import del handler
+    if name in ('InstrumentedDictCursor', 'InstrumentedSSDictCursor'):
+        import db_cursors
+        return getattr(db_cursors, name)
+    raise AttributeError(f"module 'db_utils' has no attribute {name!r}")
+
+def _connect(config, host, port):
+    import pymysql
+    from db_cursors import InstrumentedDictCursor
+    return pymysql.connect(
+        host=host or config['host'],
+        port=port or config['port'],
+        user=config['user'],
+        passwd=config['password'],
+        db=config['db'],
+        cursorclass=InstrumentedDictCursor,
+        connect_timeout=5
+    )
+
+def _open_connection(host=None, port=None):
+    """Abre una conexión nueva a RDS con la config cacheada (get_db_config)."""
+    import pymysql
+    started = time.perf_counter()
+    config = get_db_config()
+    try:
+        conn = _connect(config, host, port)
+    except pymysql.err.OperationalError as e:
+        if e.args[0] != ER_ACCESS_DENIED or not RDS_SECRET_ID:
+            raise
+        # Contraseña rotada: el secreto cacheado quedó viejo, se relee una vez
+        logger.warning("Acceso denegado a RDS, se relee el secreto y se reintenta")
+        secret_stats['auth_refreshes'] += 1
+        conn = _connect(get_db_config(force_refresh=True), host, port)
+    current_metrics()['connect_ms'] += (time.perf_counter() - started) * 1000
+    return conn
+
+def _open_reader():
+    return _open_connection(RDS_READER_HOST, RDS_READER_PORT)
+
+def _discard_connection(slot='conn'):
+    """Cierra (sin fallar) y olvida la conexión cacheada."""
+    conn = getattr(_local, slot, None)
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    setattr(_local, slot, None)
+
+def _cached_connection(slot, opener):
+    """Conexión del slot ('conn' writer, 'reader_conn' reader), con ping y reconexión."""
+    last_used_slot = slot + '_last_used'
+    if getattr(_local, slot, None) is not None:
+        idle = time.monotonic() - getattr(_local, last_used_slot)
+        if idle > MAX_IDLE_SECONDS:
+            logger.info(f"Conexión inactiva {idle:.0f}s, reconectando")
+            connection_stats['reconnects'] += 1
+            _discard_connection(slot)
+        else:
+            try:
+                getattr(_local, slot).ping(reconnect=False)
+                # Estado limpio: sin transacción abierta de una invocación previa
+                getattr(_local, slot).rollback()
+                connection_stats['reused'] += 1
+            except Exception as e:
+                logger.warning(f"Ping a RDS falló, reconectando. Detalle: {str(e)}")
+                connection_stats['reconnects'] += 1
+                _discard_connection(slot)
+
+    if getattr(_local, slot, None) is None:
+        setattr(_local, slot, opener())
+        connection_stats['new'] += 1
+
+    setattr(_local, last_used_slot, time.monotonic())
+    return getattr(_local, slot)
+
+def pin_to_writer(key, seconds=None):
+    """
+    Read-your-writes: durante `seconds` las lecturas con pin_key=key van al
+    writer, para que quien acaba de escribir no lea una réplica atrasada.
+    El pin vive en el contenedor; las lecturas que no toleran un faltante
+    deben además confirmar en el writer (ver lockers.get_my_locker).
+    """
+    if not RDS_READER_HOST or key is None:
+        return
+    with _pins_lock:
+        if len(_writer_pins) >= MAX_PINS:
+            now = time.monotonic()
+            for stale in [k for k, until in _writer_pins.items() if until <= now]:
+                del _writer_pins[stale]
+            if len(_writer_pins) >= MAX_PINS:
+                _writer_pins.clear()
+        _writer_pins[key] = time.monotonic() + (READ_YOUR_WRITES_SECONDS if seconds is None else seconds)
+
+def is_pinned_to_writer(key):
+    if key is None:
+        return False
+    until = _writer_pins.get(key)
+    return until is not None and until > time.monotonic()
+
+def get_db_connection(intent='write', pin_key=None):
     """
-    Crea una conexión a la base de datos usando variables de entorno.
+    Devuelve la conexión del contenedor, reutilizándola si sigue viva.
+    Hace ping antes de usarla y reconecta si expiró o falló.
+    intent='read' usa el reader (RDS_READER_HOST) salvo que pin_key esté
+    fijada al writer o el reader no responda; en ese caso cae al writer.
+    Los handlers NO deben cerrarla: usar release_db_connection().
     """
+    if intent == 'read' and RDS_READER_HOST:
+        if is_pinned_to_writer(pin_key):
+            connection_stats['pinned_reads'] += 1
+        elif time.monotonic() >= getattr(_local, 'reader_down_until', 0.0):
+            try:
+                conn = _cached_connection('reader_conn', _open_reader)
+                connection_stats['reader'] += 1
+                return conn
+            except Exception as e:
+                logger.warning(f"Reader no disponible, se usa el writer por {READER_RETRY_SECONDS:.0f}s. "
+                               f"Detalle: {str(e)}")
+                _discard_connection('reader_conn')
+                _local.reader_down_until = time.monotonic() + READER_RETRY_SECONDS
+                connection_stats['reader_fallbacks'] += 1
+        else:
+            connection_stats['reader_fallbacks'] += 1
     try:
-        # Nota: Aquí usaremos 'smartlocker_db' directamente
-        conn = pymysql.connect(
-            host=os.environ['RDS_HOST'],
-            user=os.environ['RDS_USER'],
-            passwd=os.environ['RDS_PASSWORD'],
-            db=os.environ['RDS_DB_NAME'],
-            cursorclass=pymysql.cursors.DictCursor,
-            connect_timeout=5
-        )
-        return conn
+        return _cached_connection('conn', _open_connection)
     except Exception as e:
         logger.error(f"ERROR: No se pudo conectar a RDS. Detalle: {str(e)}")
         raise e
 
-def format_response(status_code, body):
+def is_reader_connection(conn):
+    return conn is not None and conn is getattr(_local, 'reader_conn', None)
+
+def release_db_connection(conn):
+    """
+    Devuelve la conexión al contenedor al terminar el request.
+    Deshace cualquier transacción sin commit; si la conexión quedó rota
+    se descarta para que el siguiente request abra una nueva.
+    """
+    if conn is None:
+        return
+    slot = next((name for name in ('conn', 'reader_conn') if conn is getattr(_local, name, None)), None)
+    try:
+        conn.rollback()
+        if slot:
+            setattr(_local, slot + '_last_used', time.monotonic())
+    except Exception as e:
+        logger.warning(f"Conexión descartada al liberar. Detalle: {str(e)}")
+        if slot:
+            _discard_connection(slot)
+        else:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+def get_connection_stats():
+    """Contadores de reuso de conexión y tasa de acierto del contenedor."""
+    total = connection_stats['new'] + connection_stats['reused']
+    hit_rate = connection_stats['reused'] / total if total else 0.0
+    return dict(connection_stats, hit_rate=round(hit_rate, 4))
+
+# Columnas que se resetean al liberar un locker (cancelación, liberación forzada, expiración)
+LOCKER_RELEASE_SET = """
+    status='available', current_user_id=NULL, assigned_at=NULL, expires_at=NULL,
+    current_otp_hash=NULL, otp_salt=NULL, otp_valid_until=NULL, otp_secret=NULL, color_hex=NULL,
+    updated_at=NOW()
+"""
+
+def bump_availability_version(cur, locker_ids):
+    """
+    Marca los lockers con una nueva versión del feed de disponibilidad.
+    Debe ir en la misma transacción que el cambio: el lock sobre el contador
+    hace que las versiones se confirmen en orden.
+    """
+    if not locker_ids:
+        return
+    cur.execute("UPDATE locker_feed_version SET version = LAST_INSERT_ID(version + 1) WHERE id = 1")
+    placeholders = ', '.join(['%s'] * len(locker_ids))
+    cur.execute(
+        f"UPDATE lockers SET availability_version = LAST_INSERT_ID() WHERE id IN ({placeholders})",
+        list(locker_ids)
+    )
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+def _route_name(event):
+    """'METHOD /ruta/{id}': ids numéricos normalizados para agrupar por ruta."""
+    path = event.get('path', '') or event.get('rawPath', '') or event.get('source', 'direct')
+    method = event.get('httpMethod', '') or (event.get('requestContext') or {}).get('http', {}).get('method') or 'INVOKE'
+    return f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+def emit_metrics(service, route, status_code, duration_ms):
+    """Imprime una línea EMF; CloudWatch la convierte en métricas por Service/Route."""
+    metrics = current_metrics()
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Service', 'Route']],
+                'Metrics': [
+                    {'Name': 'QueryCount', 'Unit': 'Count'},
+                    {'Name': 'QueryTimeMs', 'Unit': 'Milliseconds'},
+                    {'Name': 'RowsReturned', 'Unit': 'Count'},
+                    {'Name': 'ConnectTimeMs', 'Unit': 'Milliseconds'},
+                    {'Name': 'DurationMs', 'Unit': 'Milliseconds'},
+                ]
+            }]
+        },
+        'Service': service,
+        'Route': route,
+        'StatusCode': status_code,
+        'QueryCount': metrics['queries'],
+        'QueryTimeMs': round(metrics['query_ms'], 2),
+        'RowsReturned': metrics['rows'],
+        'ConnectTimeMs': round(metrics['connect_ms'], 2),
+        'DurationMs': round(duration_ms, 2),
+        'Statements': metrics['statements'],
+    }
+    print(json.dumps(record, default=str))
+
+def instrumented_handler(service):
+    """
+    Decorador para lambda_handler: reinicia las métricas al entrar y emite
+    la línea EMF al salir (también si el handler lanza excepción).
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            _local.metrics = _new_metrics()
+            started = time.perf_counter()
+            response = None
+            try:
+                response = handler(decode_request_body(event), context)
+                if RESPONSE_GZIP_ENABLED:
+                    response = compress_response(event, response)
+                return response
+            finally:
+                if METRICS_ENABLED:
+                    try:
+                        status_code = response.get('statusCode') if isinstance(response, dict) else None
+                        emit_metrics(service, _route_name(event or {}), status_code,
+                                     (time.perf_counter() - started) * 1000)
+                    except Exception as e:
+                        logger.error(f"Error emitiendo métricas: {str(e)}")
+        return wrapper
+    return decorator
+
+def get_header(event, name):
+    """Header del request sin importar mayúsculas (API Gateway v1 y v2)."""
+    headers = event.get('headers') or {}
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+def decode_request_body(event):
+    """
+    Evento con el body como texto. Con binaryMediaTypes configurado API
+    Gateway entrega el body del request en base64 (isBase64Encoded); los
+    handlers siempre hacen json.loads sobre texto.
+    """
+    if not isinstance(event, dict) or not event.get('isBase64Encoded') or not isinstance(event.get('body'), str):
+        return event
+    try:
+        body = base64.b64decode(event['body']).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return event
+    return dict(event, body=body, isBase64Encoded=False)
+
+def get_source_ip(event):
+    """IP de origen en eventos v1 (identity) y v2 (http)"""
+    ctx = event.get('requestContext') or {}
+    return (ctx.get('identity') or {}).get('sourceIp') or (ctx.get('http') or {}).get('sourceIp')
+
+# --- SERIALIZACIÓN Y COMPRESIÓN DE RESPUESTAS ---
+# JSON_ENCODER: 'auto' (orjson si está instalado), 'orjson' o 'stdlib'
+JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+# Formato de fechas: 'sql' ("2025-01-31 18:00:00", el histórico de la API) o
+# 'iso' ("2025-01-31T18:00:00"), que orjson serializa en C sin pasar por Python
+JSON_DATETIME_FORMAT = os.environ.get('JSON_DATETIME_FORMAT', 'sql')
+# gzip + base64 cuando el cliente manda Accept-Encoding: gzip y el body lo amerita.
+# Apagado por defecto: en API REST solo funciona con binaryMediaTypes configurado
+RESPONSE_GZIP_ENABLED = os.environ.get('RESPONSE_GZIP_ENABLED', '0') == '1'
+RESPONSE_GZIP_MIN_BYTES = int(os.environ.get('RESPONSE_GZIP_MIN_BYTES', '1024'))
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '5'))
+
+def _json_default_sql(value):
+    # datetime, date, timedelta y Decimal de PyMySQL: mismo texto que str()
+    return str(value)
+
+def _json_default_iso(value):
+    isoformat = getattr(value, 'isoformat', None)
+    return isoformat() if isoformat is not None else str(value)
+
+_JSON_DEFAULTS = {'sql': _json_default_sql, 'iso': _json_default_iso}
+_orjson = False  # False = todavía no se intentó importar
+
+def _load_orjson():
+    """orjson (opcional) o None si no está instalado."""
+    global _orjson
+    if _orjson is False:
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+        _orjson = orjson
+    return _orjson
+
+def make_json_encoder(name='auto', datetime_format='sql'):
+    """
+    Función body -> str. orjson si se pide y está instalado; si orjson
+    rechaza el body (llaves no str, enteros de más de 64 bits) se usa json.
+    """
+    if datetime_format not in _JSON_DEFAULTS:
+        raise ValueError(f"Formato de fechas inválido: {datetime_format}")
+    stdlib_encoder = json.JSONEncoder(default=_JSON_DEFAULTS[datetime_format], separators=(',', ':'))
+    orjson = _load_orjson() if name in ('auto', 'orjson') else None
+    if orjson is None:
+        if name == 'orjson':
+            logger.warning("JSON_ENCODER=orjson pero orjson no está instalado, se usa json estándar")
+        return stdlib_encoder.encode
+
+    # En 'sql' las fechas pasan por str(); en 'iso' orjson las escribe en C
+    option = orjson.OPT_PASSTHROUGH_DATETIME if datetime_format == 'sql' else 0
+
+    def encode(body):
+        try:
+            return orjson.dumps(body, default=str, option=option).decode('utf-8')
+        except TypeError:
+            return stdlib_encoder.encode(body)
+    return encode
+
+# Se construye en el primer encode_json (ahí se importa orjson)
+_encode_body = None
+
+def use_json_encoder(name, datetime_format='sql'):
+    """Reemplaza el encoder que usa format_response en este contenedor."""
+    global _encode_body
+    _encode_body = make_json_encoder(name, datetime_format)
+
+def encode_json(body):
+    global _encode_body
+    if not body and isinstance(body, (dict, list)):
+        return '{}' if isinstance(body, dict) else '[]'  # OPTIONS y listas vacías, sin cargar el encoder
+    if _encode_body is None:
+        _encode_body = make_json_encoder(JSON_ENCODER, JSON_DATETIME_FORMAT)
+    return _encode_body(body)
+
+def accepts_gzip(event):
+    """True si Accept-Encoding incluye gzip (o *) sin q=0."""
+    header = get_header(event or {}, 'Accept-Encoding') or ''
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        if coding.strip().lower() not in ('gzip', '*'):
+            continue
+        params = params.replace(' ', '')
+        return not (params.startswith('q=') and params[2:] in ('0', '0.0', '0.00', '0.000'))
+    return False
+
+def compress_response(event, response):
+    """
+    Comprime el body con gzip y lo devuelve en base64 (isBase64Encoded) si el
+    cliente lo acepta y el body supera RESPONSE_GZIP_MIN_BYTES. En API REST
+    (v1) requiere que binaryMediaTypes incluya el Accept del cliente para
+    que API Gateway lo decodifique.
+    """
+    if not isinstance(response, dict) or response.get('isBase64Encoded'):
+        return response
+    body = response.get('body')
+    if not isinstance(body, str) or len(body) < RESPONSE_GZIP_MIN_BYTES or not accepts_gzip(event):
+        return response
+    raw = body.encode('utf-8')
+    encoded = base64.b64encode(gzip.compress(raw, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0)).decode('ascii')
+    if len(encoded) >= len(raw):
+        return response
+    headers = dict(response.get('headers') or {})
+    headers['Content-Encoding'] = 'gzip'
+    headers['Vary'] = 'Accept-Encoding'
+    return dict(response, headers=headers, body=encoded, isBase64Encoded=True)
+
+def format_response(status_code, body, headers=None):
     """
     Genera la respuesta estándar para API Gateway con CORS habilitado.
+    headers agrega/reemplaza headers (ej. ETag); body None = respuesta vacía (304).
+    La compresión la aplica instrumented_handler, que conoce el request.
     """
+    response_headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',  # Importante para React local
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization,If-None-Match',
+        'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,PATCH,DELETE'
+    }
+    if headers:
+        response_headers.update(headers)
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',  # Importante para React local
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-        },
-        'body': json.dumps(body, default=str)
-    }
\ No newline at end of file
+        'headers': response_headers,
+        'body': encode_json(body) if body is not None else ''
+    }
@@ -0,0 +1,252 @@
+"""
+Catálogo de las sentencias SQL calientes de los Lambdas.
+
+Cada sentencia tiene nombre y vive aquí en lugar de ir escrita dentro del
+handler: benchmarks/check_query_plans.py corre EXPLAIN sobre todas contra
+una BD sembrada y falla si alguna deja de usar su índice. Una query nueva
+en un camino caliente se agrega aquí y a ese chequeo.
+"""
+from db_utils import LOCKER_RELEASE_SET
+
+# --- lockers por usuario (uq_lockers_current_user) ---
+LOCKER_ID_BY_USER = "SELECT id FROM lockers WHERE current_user_id = %s"
+LOCKER_OTP_SECRET_BY_USER = "SELECT id, otp_secret FROM lockers WHERE current_user_id = %s"
+MY_LOCKER_BY_USER = "SELECT id, code, status, expires_at, color_hex FROM lockers WHERE current_user_id = %s"
+
+# --- lockers por id (PRIMARY) ---
+LOCKER_STATUS_BY_ID = "SELECT status FROM lockers WHERE id = %s"
+RELEASE_LOCKER_BY_ID = f"UPDATE lockers SET {LOCKER_RELEASE_SET} WHERE id = %s"
+ROTATE_LOCKER_OTP = """
+    UPDATE lockers
+    SET current_otp_hash=%s, otp_salt=%s, otp_valid_until=DATE_ADD(NOW(), INTERVAL 15 SECOND), updated_at=NOW()
+    WHERE id = %s
+"""
+
+# Estado OTP que usa security (incluye lo necesario para el TTL de su cache).
+# otp_secret se lee en cualquier OTP_MODE: decide si la fila es TOTP o legacy.
+LOCKER_OTP_COLUMNS = "id, current_otp_hash, otp_salt, otp_valid_until, otp_secret, expires_at, status, updated_at"
+LOCKER_OTP_STATE_BY_ID = f"SELECT {LOCKER_OTP_COLUMNS} FROM lockers WHERE id = %s"
+# Versión del estado OTP: lo que cambia con una rotación, asignación o cambio
+# de tiempo (updated_at solo tiene precisión de segundos, el hash y el secreto no)
+LOCKER_OTP_VERSION_COLUMNS = ('status', 'updated_at', 'current_otp_hash', 'otp_secret', 'expires_at')
+
+def locker_otp_state_by_ids(count):
+    """SELECT del estado OTP para `count` ids (un solo IN sobre PRIMARY)."""
+    return f"SELECT {LOCKER_OTP_COLUMNS} FROM lockers WHERE id IN ({', '.join(['%s'] * count)})"
+
+def release_lockers_by_ids(count):
+    return f"UPDATE lockers SET {LOCKER_RELEASE_SET} WHERE id IN ({', '.join(['%s'] * count)})"
+
+# Asignación atómica: l.status='available' evita que dos usuarios tomen el
+# mismo locker y el LEFT JOIN con "mine" exige que el usuario no tenga otro
+# (respaldado por el índice UNIQUE en current_user_id).
+# Parámetros: user_id (join), user_id, days, hash, salt, secret, color, locker_id
+ASSIGN_LOCKER = """
+    UPDATE lockers l
+    LEFT JOIN lockers mine ON mine.current_user_id = %s
+    SET l.status='occupied',
+        l.current_user_id=%s,
+        l.assigned_at=NOW(),
+        l.expires_at=DATE_ADD(NOW(), INTERVAL %s DAY),
+        l.current_otp_hash=%s,
+        l.otp_salt=%s,
+        l.otp_valid_until=DATE_ADD(NOW(), INTERVAL 15 MINUTE),
+        l.otp_secret=%s,
+        l.color_hex=%s,
+        l.updated_at=NOW()
+    WHERE l.id=%s AND l.status='available' AND mine.id IS NULL
+"""
+
+# --- feed de disponibilidad ---
+FEED_VERSION = "SELECT version FROM locker_feed_version WHERE id = 1"
+AVAILABLE_LOCKERS = "SELECT id, code, status FROM lockers WHERE status = 'available'"
+LOCKERS_CHANGED_SINCE = "SELECT id, code, status FROM lockers WHERE availability_version > %s"
+
+# --- listado admin ---
+def admin_locker_list(columns, join_users, where):
+    """Página del listado admin en orden de code (keyset); el último %s es el LIMIT."""
+    join = "LEFT JOIN users u ON l.current_user_id = u.id" if join_users else ""
+    return f"""
+        SELECT {columns}
+        FROM lockers l
+        {join}
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY l.code ASC
+        LIMIT %s
+    """
+
+def admin_locker_page_checksum(page_sql, aliases):
+    """
+    COUNT y checksum de la misma página (mismos parámetros que page_sql),
+    sin traer las filas: BIT_XOR de 64 bits del MD5 de cada fila proyectada.
+    Cubre cambios en el mismo segundo, filas borradas y datos del JOIN.
+    """
+    row = f"JSON_ARRAY({', '.join('p.' + alias for alias in aliases)})"
+    return f"""
+        SELECT COUNT(*) AS n, BIT_XOR(CAST(CONV(LEFT(MD5({row}), 16), 16, 10) AS UNSIGNED)) AS checksum
+        FROM ({page_sql}) p
+    """
+
+# --- barrido de expirados (idx_lockers_status_expires) ---
+EXPIRED_LOCKERS_FOR_UPDATE = """
+    SELECT id, current_user_id FROM lockers
+    WHERE status = 'occupied' AND expires_at <= NOW()
+    ORDER BY expires_at
+    LIMIT %s
+    FOR UPDATE
+"""
+# Un 'owner_removed' por locker liberado; executemany lo vuelve un INSERT multi-fila
+INSERT_SWEPT_ACCESS_LOG = """
+    INSERT INTO access_logs (locker_id, user_id, event_type, status, reason, created_at)
+    VALUES (%s, %s, 'owner_removed', 'expired', 'Asignación expirada (barrido automático)', NOW())
+"""
+
+# --- solicitudes ---
+# requested_until se calcula sobre la expiración vigente al pedir, así la
+# aprobación no depende de interpretar las notas. Parámetros: days, notes, locker_id
+INSERT_TIME_CHANGE_REQUEST = """
+    INSERT INTO locker_requests (locker_id, user_id, request_type, status, requested_until, notes, created_at)
+    SELECT id, current_user_id, 'change_time', 'pending', DATE_ADD(COALESCE(expires_at, NOW()), INTERVAL %s DAY), %s, NOW()
+    FROM lockers WHERE id = %s
+"""
+
+# --- operaciones admin en lote (un chunk por transacción, filas bloqueadas) ---
+BULK_LOCKER_COLUMNS = "id, code, status, current_user_id, expires_at"
+
+def bulk_lockers_by_ids(count):
+    return f"SELECT {BULK_LOCKER_COLUMNS} FROM lockers WHERE id IN ({', '.join(['%s'] * count)}) ORDER BY id FOR UPDATE"
+
+# Keyset por code (UNIQUE) dentro del prefijo. Parámetros: prefijo LIKE, último code, limit
+BULK_LOCKERS_BY_CODE_PREFIX = f"""
+    SELECT {BULK_LOCKER_COLUMNS} FROM lockers
+    WHERE code LIKE %s AND code > %s
+    ORDER BY code
+    LIMIT %s
+    FOR UPDATE
+"""
+SET_LOCKER_EXPIRATION = "UPDATE lockers SET expires_at = %s, updated_at = NOW() WHERE id = %s"
+# executemany de PyMySQL lo reescribe como un INSERT multi-fila
+INSERT_ACCESS_LOG = """
+    INSERT INTO access_logs (locker_id, user_id, event_type, status, reason, source_ip, user_agent, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+"""
+
+# Write-behind de audit_sink.AccessLogSink: created_at es el momento del
+# evento, no el del flush. IGNORE descarta filas con FK inválida (locker
+# inexistente) sin perder el resto del INSERT multi-fila.
+INSERT_ACCESS_LOG_ROWS = """
+    INSERT IGNORE INTO access_logs (locker_id, user_id, event_type, status, reason, source_ip, user_agent, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Solicitud + estado actual de su locker (FOR UPDATE bloquea ambas filas)
+BULK_REQUEST_COLUMNS = """
+    r.id, r.locker_id, r.user_id, r.request_type, r.status, r.requested_until, r.notes,
+    l.status AS locker_status, l.current_user_id, l.expires_at
+"""
+
+def bulk_requests_by_ids(count):
+    return f"""
+        SELECT {BULK_REQUEST_COLUMNS}
+        FROM locker_requests r JOIN lockers l ON l.id = r.locker_id
+        WHERE r.id IN ({', '.join(['%s'] * count)})
+        ORDER BY r.id
+        FOR UPDATE
+    """
+
+# Pendientes de un tipo, keyset por id. Parámetros: request_type, último id, limit
+BULK_PENDING_REQUESTS = f"""
+    SELECT {BULK_REQUEST_COLUMNS}
+    FROM locker_requests r JOIN lockers l ON l.id = r.locker_id
+    WHERE r.status = 'pending' AND r.request_type = %s AND r.id > %s
+    ORDER BY r.id
+    LIMIT %s
+    FOR UPDATE
+"""
+
+def resolve_requests(count):
+    """Parámetros: nuevo status y luego los `count` ids (solo se tocan las pendientes)."""
+    return f"""
+        UPDATE locker_requests SET status = %s, resolved_at = NOW()
+        WHERE id IN ({', '.join(['%s'] * count)}) AND status = 'pending'
+    """
+
+def admin_request_list(where):
+    """Página de solicitudes para el panel en orden de id (keyset); el último %s es el LIMIT."""
+    return f"""
+        SELECT r.id, r.locker_id, l.code, r.user_id, u.email AS user_email, r.request_type,
+               r.status, r.requested_until, r.notes, r.created_at, r.resolved_at
+        FROM locker_requests r
+        JOIN lockers l ON l.id = r.locker_id
+        JOIN users u ON u.id = r.user_id
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY r.id
+        LIMIT %s
+    """
+
+# --- usuarios (UNIQUE email) ---
+USER_ID_BY_EMAIL = "SELECT id FROM users WHERE email = %s"
+USER_LOGIN_BY_EMAIL = "SELECT id, name, role, password_hash FROM users WHERE email = %s"
+
+# --- detector de actividad sospechosa (audit_worker) ---
+AUDIT_WATERMARK_FOR_UPDATE = """
+    SELECT last_id, safe_id, observed_id, TIMESTAMPDIFF(SECOND, observed_at, NOW()) AS observed_age
+    FROM audit_watermarks WHERE name = %s FOR UPDATE
+"""
+UPDATE_AUDIT_WATERMARK = "UPDATE audit_watermarks SET last_id = %s, updated_at = NOW() WHERE name = %s"
+# Lectura consistente aparte (no subconsulta en el UPDATE: tomaría locks sobre access_logs)
+MAX_ACCESS_LOG_ID = "SELECT COALESCE(MAX(id), 0) AS max_id FROM access_logs"
+UPDATE_AUDIT_OBSERVATION = """
+    UPDATE audit_watermarks SET safe_id = %s, observed_id = %s, observed_at = NOW()
+    WHERE name = %s
+"""
+# Rango sobre PRIMARY entre el watermark y el techo asentado: el costo depende
+# de los logs nuevos, no del historial
+NEW_FAILED_ACCESS_LOGS = """
+    SELECT id, locker_id, source_ip, status, created_at FROM access_logs
+    WHERE id > %s AND id <= %s AND event_type = 'access_attempt' AND status IN ('failed', 'invalid_otp', 'expired')
+    ORDER BY id
+    LIMIT %s
+"""
+UPSERT_LOCKER_FAILURES = """
+    INSERT INTO security_locker_failures (locker_id, bucket_start, failures)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE failures = failures + VALUES(failures)
+"""
+UPSERT_IP_FAILURES = """
+    INSERT INTO security_ip_failures (source_ip, bucket_start, locker_id, failures)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE failures = failures + VALUES(failures)
+"""
+
+def locker_failure_buckets(count):
+    """Buckets de `count` lockers en un rango de tiempo (prefijo de la PK)."""
+    return f"""
+        SELECT locker_id, bucket_start, failures FROM security_locker_failures
+        WHERE locker_id IN ({', '.join(['%s'] * count)}) AND bucket_start BETWEEN %s AND %s
+    """
+
+def ip_failure_buckets(count):
+    return f"""
+        SELECT source_ip, bucket_start, locker_id, failures FROM security_ip_failures
+        WHERE source_ip IN ({', '.join(['%s'] * count)}) AND bucket_start BETWEEN %s AND %s
+    """
+
+INSERT_SECURITY_ALERT = """
+    INSERT IGNORE INTO security_alerts (alert_type, locker_id, source_ip, failures, distinct_lockers,
+                                        window_start, window_end, detected_at, dedupe_key)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+PURGE_LOCKER_FAILURES = "DELETE FROM security_locker_failures WHERE bucket_start < %s LIMIT %s"
+PURGE_IP_FAILURES = "DELETE FROM security_ip_failures WHERE bucket_start < %s LIMIT %s"
+
+def security_alerts_page(where):
+    """Alertas más recientes primero (keyset sobre id); el último %s es el LIMIT."""
+    return f"""
+        SELECT id, alert_type, locker_id, source_ip, failures, distinct_lockers,
+               window_start, window_end, detected_at
+        FROM security_alerts
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY id DESC
+        LIMIT %s
+    """
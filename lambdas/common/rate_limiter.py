@@ -0,0 +1,100 @@
+import os
+import time
+import logging
+from decimal import Decimal
+from collections import OrderedDict
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+class MemoryBucketStore:
+    """Estado de los buckets en memoria del contenedor (LRU acotada)."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._data = OrderedDict()
+
+    def load(self, key):
+        state = self._data.get(key)
+        if state is not None:
+            self._data.move_to_end(key)
+        return state
+
+    def save(self, key, state):
+        self._data[key] = state
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+
+class DynamoBucketStore:
+    """
+    Backend compartido entre contenedores (tabla con llave 'bucket_key').
+    No es atómico entre contenedores: el límite es aproximado, suficiente
+    para frenar fuerza bruta repartida entre varias instancias.
+    """
+
+    def __init__(self, table_name, ttl_seconds=3600, dynamodb_resource=None):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        self._resource = dynamodb_resource
+        self._table = None
+
+    def _get_table(self):
+        if self._table is None:
+            if self._resource is None:
+                import boto3
+                self._resource = boto3.resource(
+                    'dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+                )
+            self._table = self._resource.Table(self.table_name)
+        return self._table
+
+    def load(self, key):
+        item = self._get_table().get_item(Key={'bucket_key': key}).get('Item')
+        if not item:
+            return None
+        return float(item['tokens']), float(item['updated'])
+
+    def save(self, key, state):
+        tokens, updated = state
+        self._get_table().put_item(Item={
+            'bucket_key': key,
+            'tokens': Decimal(str(round(tokens, 4))),
+            'updated': Decimal(str(round(updated, 4))),
+            'expires_at': int(time.time() + self.ttl_seconds),  # TTL de DynamoDB
+        })
+
+class FailureLimiter:
+    """
+    Token bucket de intentos FALLIDOS por llave (locker, IP...).
+    Cada fallo consume un token; los tokens se recargan a capacity/window_seconds.
+    Con el bucket vacío, allow() rechaza antes de tocar BD o auditoría.
+    """
+
+    def __init__(self, capacity, window_seconds, store=None):
+        self.capacity = float(capacity)
+        self.refill_per_second = self.capacity / float(window_seconds)
+        self.store = store or MemoryBucketStore()
+
+    def _current(self, key, now):
+        state = self.store.load(key)
+        if state is None:
+            return self.capacity
+        tokens, updated = state
+        return min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+
+    def retry_after(self, key, now=None):
+        """Segundos hasta que la llave vuelva a tener un token (0 si ya puede)."""
+        now = time.time() if now is None else now
+        tokens = self._current(key, now)
+        if tokens >= 1:
+            return 0
+        return (1 - tokens) / self.refill_per_second
+
+    def allow(self, key, now=None):
+        return self.retry_after(key, now) == 0
+
+    def record_failure(self, key, now=None):
+        now = time.time() if now is None else now
+        tokens = self._current(key, now)
+        self.store.save(key, (max(0.0, tokens - 1), now))
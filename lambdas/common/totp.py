@@ -0,0 +1,39 @@
+import os
+import time
+import hmac
+import struct
+import hashlib
+
+# OTP derivado del tiempo (estilo RFC 6238) para no escribir en RDS en cada refresco.
+# El paso coincide con el refresco de 15s del Dashboard.
+STEP_SECONDS = int(os.environ.get('OTP_STEP_SECONDS', '15'))
+DIGITS = 6
+
+def generate_secret():
+    """Secreto por asignación: 20 bytes en hex (cabe en CHAR(40))."""
+    return os.urandom(20).hex()
+
+def current_step(at=None):
+    return int((time.time() if at is None else at) // STEP_SECONDS)
+
+def code_for_step(secret, step):
+    """HOTP (RFC 4226) con HMAC-SHA1 sobre el contador de pasos."""
+    digest = hmac.new(bytes.fromhex(secret), struct.pack('>Q', step), hashlib.sha1).digest()
+    offset = digest[-1] & 0x0F
+    value = struct.unpack('>I', digest[offset:offset + 4])[0] & 0x7FFFFFFF
+    return str(value % (10 ** DIGITS)).zfill(DIGITS)
+
+def current_code(secret, at=None):
+    """Código vigente y segundos que le quedan."""
+    now = time.time() if at is None else at
+    step = current_step(now)
+    return code_for_step(secret, step), STEP_SECONDS - int(now % STEP_SECONDS)
+
+def verify(secret, code, skew=1, at=None):
+    """Acepta el paso actual y +/- skew pasos para tolerar desfase de reloj."""
+    if not secret or not code:
+        return False
+    step = current_step(at)
+    code = str(code)
+    return any(hmac.compare_digest(code_for_step(secret, step + delta), code)
+               for delta in range(-skew, skew + 1))
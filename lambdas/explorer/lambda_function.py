@@ -1,38 +1,221 @@
+import os
+import re
 import json
 import logging
+import tempfile
 import db_utils # Usaremos el helper compartido
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Lecturas: cursor sin buffer, en chunks y con topes para no agotar la memoria
+EXPLORER_CHUNK_SIZE = int(os.environ.get('EXPLORER_CHUNK_SIZE', '500'))
+EXPLORER_MAX_ROWS = int(os.environ.get('EXPLORER_MAX_ROWS', '1000'))
+EXPLORER_HARD_MAX_ROWS = int(os.environ.get('EXPLORER_HARD_MAX_ROWS', '10000'))
+# Respuesta de Lambda: máximo 6 MB
+EXPLORER_MAX_BYTES = int(os.environ.get('EXPLORER_MAX_BYTES', str(4 * 1024 * 1024)))
+EXPLORER_MAX_EXECUTION_MS = int(os.environ.get('EXPLORER_MAX_EXECUTION_MS', '30000'))
+# Export NDJSON: archivos locales solo bajo EXPLORER_EXPORT_DIR; s3:// usa S3_ENDPOINT_URL si existe (MinIO/LocalStack)
+EXPLORER_EXPORT_DIR = os.path.realpath(os.environ.get('EXPLORER_EXPORT_DIR', tempfile.gettempdir()))
+EXPLORER_EXPORT_MAX_BYTES = int(os.environ.get('EXPLORER_EXPORT_MAX_BYTES', str(512 * 1024 * 1024)))
+# UPDATE/INSERT/DELETE/DDL solo si el despliegue lo habilita
+EXPLORER_ALLOW_WRITES = os.environ.get('EXPLORER_ALLOW_WRITES', '0') == '1'
+
+READ_STATEMENTS = ('SELECT', 'WITH', 'SHOW', 'DESCRIBE', 'DESC', 'EXPLAIN')
+# Sentencias que se pueden envolver en una tabla derivada para paginar en el servidor
+WRAPPABLE_STATEMENTS = ('SELECT', 'WITH')
+_LEADING_COMMENTS = re.compile(r'^(\s+|--[^\n]*(\n|$)|#[^\n]*(\n|$)|/\*.*?\*/)*', re.S)
+ER_DUP_FIELDNAME = 1060
+ER_PARSE_ERROR = 1064
+
+@db_utils.instrumented_handler('explorer')
 def lambda_handler(event, context):
     """
     Ejecuta SQL arbitrario para depuración.
     Evento esperado: { "sql": "SELECT * FROM lockers" }
+    Lecturas (opcionales): "offset", "max_rows", "max_bytes",
+    "export": "s3://bucket/key.ndjson" | "/tmp/resultado.ndjson".
+    Responde { columns, rows, row_count, truncated, next_offset, bytes[, export] }.
     """
-    sql_query = event.get('sql')
-    
+    sql_query = (event.get('sql') or '').strip().rstrip(';').strip()
+
     if not sql_query:
         return db_utils.format_response(400, {'message': 'Falta el campo "sql" en el evento'})
 
+    statement = statement_type(sql_query)
+    if statement not in READ_STATEMENTS and not EXPLORER_ALLOW_WRITES:
+        return db_utils.format_response(403, {
+            'message': f'Sentencia {statement or "desconocida"} rechazada: el explorer es de solo lectura '
+                       '(EXPLORER_ALLOW_WRITES=1 para habilitar escrituras)'
+        })
+
+    try:
+        offset = max(int(event.get('offset', 0)), 0)
+        max_rows = min(max(int(event.get('max_rows', EXPLORER_MAX_ROWS)), 1), EXPLORER_HARD_MAX_ROWS)
+        max_bytes = min(max(int(event.get('max_bytes', EXPLORER_MAX_BYTES)), 1), EXPLORER_MAX_BYTES)
+    except (TypeError, ValueError):
+        return db_utils.format_response(400, {'message': 'offset, max_rows o max_bytes inválido'})
+
     logger.info(f"Ejecutando SQL: {sql_query}")
 
     conn = db_utils.get_db_connection()
     try:
+        if statement in READ_STATEMENTS:
+            result = run_read(conn, sql_query, statement, offset, max_rows, max_bytes, event.get('export'))
+            return db_utils.format_response(200, result)
+
         with conn.cursor() as cur:
             cur.execute(sql_query)
-            # Si es SELECT, devolvemos datos
-            if sql_query.strip().upper().startswith("SELECT"):
-                result = cur.fetchall()
-                # Convertir fechas a string para que JSON no falle (lo hace db_utils, pero por si acaso)
-                return db_utils.format_response(200, result)
-            else:
-                # Si es UPDATE/INSERT/DELETE, confirmamos cambios
-                conn.commit()
-                return db_utils.format_response(200, {'message': 'Comando ejecutado', 'rows_affected': cur.rowcount})
-                
+            # Si es UPDATE/INSERT/DELETE, confirmamos cambios
+            conn.commit()
+            return db_utils.format_response(200, {'message': 'Comando ejecutado', 'rows_affected': cur.rowcount})
+
+    except ValueError as e:
+        return db_utils.format_response(400, {'message': str(e)})
     except Exception as e:
         logger.error(str(e))
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        conn.close()
\ No newline at end of file
+        db_utils.release_db_connection(conn)
+
+def statement_type(sql_query):
+    """Primera palabra de la sentencia (ignorando comentarios iniciales), en mayúsculas."""
+    match = re.match(r'[A-Za-z]+', _LEADING_COMMENTS.sub('', sql_query, count=1))
+    return match.group(0).upper() if match else ''
+
+def run_read(conn, sql_query, statement, offset, max_rows, max_bytes, export):
+    """
+    Lectura en streaming dentro de una transacción READ ONLY (el servidor
+    rechaza un WITH ... DELETE aunque empiece como lectura).
+    Sin export, los SELECT se envuelven en una tabla derivada con LIMIT para
+    que el servidor salte el offset y corte en max_rows + 1. Con export se
+    lee el resultado completo desde offset hacia el archivo NDJSON.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SET SESSION MAX_EXECUTION_TIME = %s", (EXPLORER_MAX_EXECUTION_MS,))
+        cur.execute("START TRANSACTION READ ONLY")
+
+    import pymysql  # ya cargado por db_utils al conectar
+    sink = ExportSink(export) if export else None
+    try:
+        if sink is None and statement in WRAPPABLE_STATEMENTS:
+            # Con args PyMySQL aplica % a todo el texto: los % del usuario (LIKE, DATE_FORMAT) van escapados
+            wrapped = f"SELECT * FROM ({sql_query.replace('%', '%%')}) AS explorer_q LIMIT %s, %s"
+            try:
+                return stream_rows(conn, wrapped, (offset, max_rows + 1), 0, offset, max_rows, max_bytes, None)
+            except pymysql.err.MySQLError as e:
+                # Columnas repetidas (SELECT * con JOIN) o SQL que no admite subconsulta
+                if e.args[0] not in (ER_DUP_FIELDNAME, ER_PARSE_ERROR):
+                    raise
+                logger.info(f"No se pudo paginar en el servidor ({e.args[0]}), se salta el offset en el cliente")
+        result = stream_rows(conn, sql_query, None, offset, offset, max_rows, max_bytes, sink)
+        if sink is not None:
+            result['export'] = sink.finish()
+        return result
+    finally:
+        if sink is not None:
+            sink.discard()
+
+def stream_rows(conn, sql, args, skip, offset, max_rows, max_bytes, sink):
+    """
+    Lee con un cursor sin buffer en chunks de EXPLORER_CHUNK_SIZE. Solo se
+    guardan en memoria las filas de la respuesta; el resto va al export o
+    se descarta.
+    """
+    rows, size = [], 2
+    truncated = False
+    skipped = 0
+    cur = conn.cursor(db_utils.InstrumentedSSDictCursor)
+    try:
+        cur.execute(sql, args)
+        columns = [d[0] for d in cur.description or ()]
+        while True:
+            chunk = cur.fetchmany(EXPLORER_CHUNK_SIZE)
+            if not chunk:
+                break
+            for row in chunk:
+                if skipped < skip:
+                    skipped += 1
+                    continue
+                encoded = json.dumps(row, default=str)
+                if sink is not None:
+                    sink.write(encoded)
+                if truncated:
+                    continue
+                if len(rows) >= max_rows or size + len(encoded) + 1 > max_bytes:
+                    truncated = True
+                    if sink is None:
+                        break
+                    continue
+                rows.append(row)
+                size += len(encoded) + 1
+            if truncated and sink is None:
+                break
+    finally:
+        # Cerrar un cursor sin buffer drena lo que quede en el socket; con la
+        # paginación en el servidor es como mucho una fila
+        cur.close()
+
+    return {
+        'columns': columns,
+        'rows': rows,
+        'row_count': len(rows),
+        'truncated': truncated,
+        'next_offset': offset + len(rows) if truncated else None,
+        'bytes': size,
+    }
+
+class ExportSink:
+    """
+    Escribe el resultado como NDJSON. Destinos: ruta local bajo
+    EXPLORER_EXPORT_DIR o s3://bucket/key (se escribe en /tmp y se sube al
+    terminar, así la memoria no depende del tamaño del resultado).
+    """
+
+    def __init__(self, uri):
+        if not isinstance(uri, str) or not uri:
+            raise ValueError('export debe ser una ruta local o s3://bucket/key')
+        self.uri = uri
+        self.rows = 0
+        self.bytes = 0
+        self.truncated = False
+        if uri.startswith('s3://'):
+            bucket, _, key = uri[len('s3://'):].partition('/')
+            if not bucket or not key:
+                raise ValueError('export s3 debe tener la forma s3://bucket/key')
+            self.bucket, self.key = bucket, key
+            fd, self.path = tempfile.mkstemp(suffix='.ndjson')
+            self.file = os.fdopen(fd, 'w', encoding='utf-8')
+        else:
+            path = os.path.realpath(uri[len('file://'):] if uri.startswith('file://') else uri)
+            if os.path.commonpath([path, EXPLORER_EXPORT_DIR]) != EXPLORER_EXPORT_DIR:
+                raise ValueError(f'export local solo dentro de {EXPLORER_EXPORT_DIR}')
+            self.bucket = self.key = None
+            self.path = path
+            self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, encoded):
+        if self.truncated:
+            return
+        if self.bytes + len(encoded) + 1 > EXPLORER_EXPORT_MAX_BYTES:
+            self.truncated = True
+            return
+        self.file.write(encoded)
+        self.file.write('\n')
+        self.rows += 1
+        self.bytes += len(encoded) + 1
+
+    def finish(self):
+        self.file.close()
+        if self.bucket:
+            import boto3
+            s3 = boto3.client('s3', endpoint_url=os.environ.get('S3_ENDPOINT_URL') or None)
+            s3.upload_file(self.path, self.bucket, self.key, ExtraArgs={'ContentType': 'application/x-ndjson'})
+        return {'uri': self.uri, 'rows': self.rows, 'bytes': self.bytes, 'truncated': self.truncated}
+
+    def discard(self):
+        """Cierra el archivo y borra el temporal de s3 (el export local se conserva)."""
+        if not self.file.closed:
+            self.file.close()
+        if self.bucket and os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,15 +1,42 @@
 import json
 import os
 import logging
+import time
 import random
 import hashlib
 from datetime import datetime, timedelta
 import db_utils
+import queries
+import totp
+import auth_tokens
+from audit_sink import AccessLogSink
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# 'totp': código derivado del tiempo con un secreto por asignación (refresh sin escrituras)
+# 'legacy': hash+salt rotado en BD en cada refresh
+# Ambos modos leen y escriben lockers.otp_secret (NULL en legacy): en BDs
+# viejas la columna la agrega la migración 0004 del seeder.
+OTP_MODE = os.environ.get('OTP_MODE', 'legacy')
+
+# Snapshot de lockers disponibles por contenedor. Dentro de este TTL ni
+# siquiera se consulta la versión; después basta un SELECT por PK.
+AVAILABLE_VERSION_TTL_SECONDS = float(os.environ.get('AVAILABLE_VERSION_TTL_SECONDS', '2'))
+_available_snapshot = {'version': None, 'lockers': None, 'checked_at': 0.0}
+
+# Rotaciones de OTP y cancelaciones en access_logs, fuera de la transacción del request
+access_log = AccessLogSink()
+
+@db_utils.instrumented_handler('lockers')
 def lambda_handler(event, context):
+    try:
+        return route(event)
+    finally:
+        if not access_log.background:
+            access_log.flush()
+
+def route(event):
     path = event.get('path', '') or event.get('rawPath', '')
     http_method = event.get('httpMethod', '') or event.get('requestContext', {}).get('http', {}).get('method')
     
@@ -20,7 +47,7 @@ def lambda_handler(event, context):
 
     # 1. Ver Lockers Disponibles
     if 'available' in path and http_method == 'GET':
-        return get_available_lockers()
+        return get_available_lockers(event)
     
     # 2. Asignar Locker
     elif 'assign' in path and http_method == 'POST':
@@ -50,64 +77,73 @@ def generate_otp():
     otp_hash = hashlib.sha256((otp + salt).encode('utf-8')).hexdigest()
     return otp, salt, otp_hash
 
+def generate_initial_otp():
+    """Devuelve (otp, salt, hash, secreto) según OTP_MODE; lo que no aplica va en None"""
+    if OTP_MODE == 'totp':
+        secret = totp.generate_secret()
+        otp, _ = totp.current_code(secret)
+        return otp, None, None, secret
+    otp, salt, otp_hash = generate_otp()
+    return otp, salt, otp_hash, None
+
 # --- LOGICA DE NEGOCIO ---
 
 def request_cancel(event):
     """Libera el locker del usuario inmediatamente"""
     try:
         body = json.loads(event.get('body', '{}'))
-        user_id = body.get('user_id')
+        user_id, auth_error = auth_tokens.resolve_user_id(event, body.get('user_id'))
+        if auth_error: return auth_error
         if not user_id: return db_utils.format_response(400, {'message': 'Falta user_id'})
 
         conn = db_utils.get_db_connection()
         with conn.cursor() as cur:
             # Verificar si tiene locker
-            cur.execute("SELECT id FROM lockers WHERE current_user_id = %s", (user_id,))
+            cur.execute(queries.LOCKER_ID_BY_USER, (user_id,))
             locker = cur.fetchone()
             if not locker:
                 return db_utils.format_response(404, {'message': 'No tienes locker para cancelar'})
 
             # Liberar locker (Reset completo)
-            sql = """
-                UPDATE lockers 
-                SET status='available', current_user_id=NULL, assigned_at=NULL, expires_at=NULL, 
-                    current_otp_hash=NULL, otp_salt=NULL, otp_valid_until=NULL, color_hex=NULL
-                WHERE id=%s
-            """
-            cur.execute(sql, (locker['id'],))
+            cur.execute(queries.RELEASE_LOCKER_BY_ID, (locker['id'],))
+            db_utils.bump_availability_version(cur, [locker['id']])
             conn.commit()
+        db_utils.pin_to_writer(f'user:{user_id}')
+        access_log.record_event(locker['id'], 'owner_removed', 'SUCCESS', 'Cancelado por el usuario',
+                                user_id=user_id, event=event)
 
         return db_utils.format_response(200, {'message': 'Locker liberado exitosamente'})
     except Exception as e:
         logger.error(str(e))
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        if 'conn' in locals(): conn.close()
+        if 'conn' in locals(): db_utils.release_db_connection(conn)
 
 def request_time_change(event):
     """Crea una solicitud en locker_requests"""
     try:
         body = json.loads(event.get('body', '{}'))
-        user_id = body.get('user_id')
-        days = body.get('days', 1)
+        user_id, auth_error = auth_tokens.resolve_user_id(event, body.get('user_id'))
+        if auth_error: return auth_error
+        try:
+            days = int(body.get('days', 1))
+        except (TypeError, ValueError):
+            return db_utils.format_response(400, {'message': 'days inválido'})
         
         if not user_id: return db_utils.format_response(400, {'message': 'Falta user_id'})
+        if days < 1: return db_utils.format_response(400, {'message': 'days debe ser al menos 1'})
 
         conn = db_utils.get_db_connection()
         with conn.cursor() as cur:
             # Obtener el locker ID
-            cur.execute("SELECT id FROM lockers WHERE current_user_id = %s", (user_id,))
+            cur.execute(queries.LOCKER_ID_BY_USER, (user_id,))
             locker = cur.fetchone()
             if not locker:
                 return db_utils.format_response(404, {'message': 'No tienes locker'})
 
             # Insertar solicitud
-            sql = """
-                INSERT INTO locker_requests (locker_id, user_id, request_type, status, notes, created_at)
-                VALUES (%s, %s, 'change_time', 'pending', %s, NOW())
-            """
             note = f"Solicitud de extensión por {days} días adicionales"
-            cur.execute(sql, (locker['id'], user_id, note))
+            cur.execute(queries.INSERT_TIME_CHANGE_REQUEST, (days, note, locker['id']))
             conn.commit()
 
         return db_utils.format_response(200, {'message': 'Solicitud enviada al administrador'})
@@ -115,37 +151,95 @@ def request_time_change(event):
         logger.error(str(e))
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        if 'conn' in locals(): conn.close()
+        if 'conn' in locals(): db_utils.release_db_connection(conn)
 
 def refresh_otp(event):
     try:
         body = json.loads(event.get('body', '{}'))
-        user_id = body.get('user_id')
+        user_id, auth_error = auth_tokens.resolve_user_id(event, body.get('user_id'))
+        if auth_error: return auth_error
         if not user_id: return db_utils.format_response(400, {'message': 'Falta user_id'})
-        otp_plain, salt, otp_hash = generate_otp()
         conn = db_utils.get_db_connection()
         with conn.cursor() as cur:
-            cur.execute("SELECT id FROM lockers WHERE current_user_id = %s", (user_id,))
+            cur.execute(queries.LOCKER_OTP_SECRET_BY_USER, (user_id,))
             locker = cur.fetchone()
             if not locker: return db_utils.format_response(404, {'message': 'No tienes locker'})
-            sql = "UPDATE lockers SET current_otp_hash=%s, otp_salt=%s, otp_valid_until=DATE_ADD(NOW(), INTERVAL 15 SECOND) WHERE id=%s"
-            cur.execute(sql, (otp_hash, salt, locker['id']))
+            if locker['otp_secret']:
+                # Modo TOTP: el código se deriva del paso de tiempo, sin escribir en BD
+                otp_plain, expires_in = totp.current_code(locker['otp_secret'])
+                return db_utils.format_response(200, {'otp': otp_plain, 'expires_in': expires_in})
+            otp_plain, salt, otp_hash = generate_otp()
+            cur.execute(queries.ROTATE_LOCKER_OTP, (otp_hash, salt, locker['id']))
             conn.commit()
+        access_log.record_event(locker['id'], 'otp_rotation', 'SUCCESS', user_id=user_id, event=event)
         return db_utils.format_response(200, {'otp': otp_plain})
     except Exception as e:
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        if 'conn' in locals(): conn.close()
+        if 'conn' in locals(): db_utils.release_db_connection(conn)
+
+def available_response(version, lockers, since):
+    """Sin since: la lista de siempre (versión en header). Con since: formato delta."""
+    headers = {'X-Locker-Version': str(version), 'Access-Control-Expose-Headers': 'X-Locker-Version'}
+    if since is None:
+        return db_utils.format_response(200, lockers, headers)
+    return db_utils.format_response(200, {
+        'version': version, 'full': True, 'available': lockers, 'unavailable': []
+    }, headers)
+
+def get_available_lockers(event):
+    """
+    GET /lockers/available[?since=<version>]
+    Con since devuelve solo los lockers cuya disponibilidad cambió desde esa
+    versión; sin cambios de versión se sirve el snapshot sin escanear lockers.
+    """
+    params = event.get('queryStringParameters', {}) or {}
+    try:
+        since = int(params['since']) if params.get('since') not in (None, '') else None
+    except ValueError:
+        return db_utils.format_response(400, {'message': 'since inválido'})
 
-def get_available_lockers():
-    conn = db_utils.get_db_connection()
+    snapshot = _available_snapshot
+    now = time.monotonic()
+    if snapshot['lockers'] is not None and now - snapshot['checked_at'] < AVAILABLE_VERSION_TTL_SECONDS:
+        if since is None:
+            return available_response(snapshot['version'], snapshot['lockers'], since)
+        if since == snapshot['version']:
+            return db_utils.format_response(200, {
+                'version': since, 'full': False, 'available': [], 'unavailable': []
+            })
+
+    conn = None
     try:
+        # Solo lectura: réplica si hay (un retraso de la réplica solo atrasa el feed)
+        conn = db_utils.get_db_connection('read')
         with conn.cursor() as cur:
-            cur.execute("SELECT id, code, status FROM lockers WHERE status = 'available'")
-            lockers = cur.fetchall()
-        return db_utils.format_response(200, lockers)
+            cur.execute(queries.FEED_VERSION)
+            row = cur.fetchone()
+            version = row['version'] if row else 0
+
+            # Delta: solo lo que cambió (índice sobre availability_version)
+            if since is not None and since <= version:
+                changed = []
+                if since < version:
+                    cur.execute(queries.LOCKERS_CHANGED_SINCE, (since,))
+                    changed = cur.fetchall()
+                return db_utils.format_response(200, {
+                    'version': version,
+                    'full': False,
+                    'available': [l for l in changed if l['status'] == 'available'],
+                    'unavailable': [l['id'] for l in changed if l['status'] != 'available']
+                })
+
+            # Lista completa (o since desconocido): snapshot si la versión no se movió
+            if snapshot['version'] != version or snapshot['lockers'] is None:
+                cur.execute(queries.AVAILABLE_LOCKERS)
+                snapshot['lockers'] = cur.fetchall()
+                snapshot['version'] = version
+            snapshot['checked_at'] = now
+        return available_response(version, snapshot['lockers'], since)
     except Exception as e: return db_utils.format_response(500, {'error': str(e)})
-    finally: conn.close()
+    finally: db_utils.release_db_connection(conn)
 
 def assign_locker(event):
     conn = None
@@ -153,7 +247,9 @@ def assign_locker(event):
         body = json.loads(event.get('body', '{}'))
         logger.info(f"Intento de asignación: {body}") # Log para debug
 
-        user_id = body.get('user_id')
+        user_id, auth_error = auth_tokens.resolve_user_id(event, body.get('user_id'))
+
+        if auth_error: return auth_error
         locker_id = body.get('locker_id')
         days = int(body.get('days', 1))
         color = body.get('color', '#000000')
@@ -161,92 +257,71 @@ def assign_locker(event):
         if not user_id or not locker_id:
             return db_utils.format_response(400, {'message': 'Faltan datos (user_id o locker_id)'})
 
+        # Generar OTP antes de tocar la BD (no depende del estado)
+        otp_plain, salt, otp_hash, otp_secret = generate_initial_otp()
+
         conn = db_utils.get_db_connection()
         with conn.cursor() as cur:
-            # 1. Verificar si el usuario YA tiene locker
-            cur.execute("SELECT id FROM lockers WHERE current_user_id = %s", (user_id,))
+            # Asignación atómica en un solo UPDATE (ver queries.ASSIGN_LOCKER)
+            # Orden de parámetros CRUCIAL: user_id (join), user_id, days, hash, salt, secret, color, locker_id
+            params = (user_id, user_id, days, otp_hash, salt, otp_secret, color, locker_id)
+
+            import pymysql  # ya cargado por db_utils al conectar
+            try:
+                cur.execute(queries.ASSIGN_LOCKER, params)
+            except pymysql.err.IntegrityError:
+                # Carrera del mismo usuario contra dos lockers: el UNIQUE la resuelve
+                conn.rollback()
+                return db_utils.format_response(409, {'message': 'El usuario ya tiene un locker asignado'})
+
+            if cur.rowcount == 1:
+                db_utils.bump_availability_version(cur, [locker_id])
+                conn.commit()
+                db_utils.pin_to_writer(f'user:{user_id}')
+                logger.info(f"Locker {locker_id} asignado a usuario {user_id}")
+                return db_utils.format_response(200, {
+                    'message': 'Locker asignado correctamente', 
+                    'initial_otp': otp_plain
+                })
+
+            # No se asignó: solo en el camino de error averiguamos el motivo
+            conn.rollback()
+            cur.execute(queries.LOCKER_ID_BY_USER, (user_id,))
             if cur.fetchone():
                 return db_utils.format_response(409, {'message': 'El usuario ya tiene un locker asignado'})
 
-            # 2. Verificar disponibilidad del locker
-            cur.execute("SELECT status FROM lockers WHERE id = %s", (locker_id,))
-            locker = cur.fetchone()
-            
-            if not locker:
+            cur.execute(queries.LOCKER_STATUS_BY_ID, (locker_id,))
+            if not cur.fetchone():
                 return db_utils.format_response(404, {'message': 'Locker no encontrado'})
-            
-            if locker['status'] != 'available':
-                return db_utils.format_response(409, {'message': 'Locker no disponible (ya ocupado)'})
 
-            # 3. Generar OTP y Asignar
-            otp_plain, salt, otp_hash = generate_otp()
-            
-            # Query simplificada para evitar errores de sintaxis
-            sql = """
-                UPDATE lockers 
-                SET status='occupied', 
-                    current_user_id=%s, 
-                    assigned_at=NOW(), 
-                    expires_at=DATE_ADD(NOW(), INTERVAL %s DAY),
-                    current_otp_hash=%s, 
-                    otp_salt=%s, 
-                    otp_valid_until=DATE_ADD(NOW(), INTERVAL 15 MINUTE), 
-                    color_hex=%s
-                WHERE id=%s
-            """
-            # Orden de parámetros CRUCIAL: user_id, days, hash, salt, color, locker_id
-            params = (user_id, days, otp_hash, salt, color, locker_id)
-            
-            cur.execute(sql, params)
-            conn.commit()
-            
-            logger.info(f"Locker {locker_id} asignado a usuario {user_id}")
-
-            return db_utils.format_response(200, {
-                'message': 'Locker asignado correctamente', 
-                'initial_otp': otp_plain
-            })
+            return db_utils.format_response(409, {'message': 'Locker no disponible (ya ocupado)'})
 
     except Exception as e:
         logger.error(f"Error en assign_locker: {str(e)}")
         return db_utils.format_response(500, {'error': str(e)})
     finally:
-        if conn: conn.close()
-    try:
-        body = json.loads(event.get('body', '{}'))
-        user_id = body.get('user_id')
-        locker_id = body.get('locker_id')
-        days = int(body.get('days', 1))
-        color = body.get('color', '#000000')
-        if not user_id or not locker_id: return db_utils.format_response(400, {'message': 'Faltan datos'})
-        conn = db_utils.get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM lockers WHERE current_user_id = %s", (user_id,))
-            if cur.fetchone(): return db_utils.format_response(409, {'message': 'Ya tienes locker'})
-            cur.execute("SELECT status FROM lockers WHERE id = %s", (locker_id,))
-            locker = cur.fetchone()
-            if not locker or locker['status'] != 'available': return db_utils.format_response(409, {'message': 'Locker no disponible'})
-            otp_plain, salt, otp_hash = generate_otp()
-            sql = "UPDATE lockers SET status='occupied', current_user_id=%s, assigned_at=NOW(), expires_at=DATE_ADD(NOW(), INTERVAL %s DAY), current_otp_hash=%s, otp_salt=%s, otp_valid_until=DATE_ADD(NOW(), INTERVAL 15 MINUTE), color_hex=%s WHERE id=%s"
-            cur.execute(sql, (user_id, days, otp_hash, salt, color, locker_id))
-            conn.commit()
-            return db_utils.format_response(200, {'message': 'Asignado', 'initial_otp': otp_plain})
-    except Exception as e: return db_utils.format_response(500, {'error': str(e)})
-    finally: 
-        if 'conn' in locals(): conn.close()
+        if conn: db_utils.release_db_connection(conn)
 
 def get_my_locker(event):
     try:
         params = event.get('queryStringParameters', {}) or {}
-        user_id = params.get('user_id')
+        user_id, auth_error = auth_tokens.resolve_user_id(event, params.get('user_id'))
+        if auth_error: return auth_error
         if not user_id: return db_utils.format_response(400, {'message': 'Falta user_id'})
-        conn = db_utils.get_db_connection()
+        conn = db_utils.get_db_connection('read', pin_key=f'user:{user_id}')
         with conn.cursor() as cur:
-            sql = "SELECT id, code, status, expires_at, color_hex FROM lockers WHERE current_user_id = %s"
-            cur.execute(sql, (user_id,))
+            cur.execute(queries.MY_LOCKER_BY_USER, (user_id,))
             locker = cur.fetchone()
-            if not locker: return db_utils.format_response(404, {'message': 'Sin locker'})
-            return db_utils.format_response(200, locker)
+        if not locker and db_utils.is_reader_connection(conn):
+            # La réplica puede no tener aún una asignación hecha en otro contenedor:
+            # antes de responder 404 se confirma en el writer
+            db_utils.release_db_connection(conn)
+            conn = db_utils.get_db_connection()
+            with conn.cursor() as cur:
+                cur.execute(queries.MY_LOCKER_BY_USER, (user_id,))
+                locker = cur.fetchone()
+        if not locker: return db_utils.format_response(404, {'message': 'Sin locker'})
+        return db_utils.format_response(200, locker)
     except Exception as e: return db_utils.format_response(500, {'error': str(e)})
     finally: 
-        if 'conn' in locals(): conn.close()
\ No newline at end of file
+        if 'conn' in locals(): db_utils.release_db_connection(conn)
\ No newline at end of file
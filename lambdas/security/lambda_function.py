@@ -2,18 +2,79 @@ import json
 import logging
 import hashlib
 import os
-import boto3 # Cliente AWS para DynamoDB
+import math
+import time
+from collections import OrderedDict
 from datetime import datetime
 import db_utils # Helper compartido
+import queries
+import totp
+from audit_sink import AuditSink, AccessLogSink, audit_sort_key, audit_window_key
+from after_response import AfterResponse
+from rate_limiter import FailureLimiter, MemoryBucketStore, DynamoBucketStore
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Cliente DynamoDB (se inicializa fuera del handler para reuso)
-dynamodb = boto3.resource('dynamodb')
 AUDIT_TABLE_NAME = 'SmartLocker_AuditLogs' # Asegurarse de que coincida con la que cree
 
+# Pasos de tiempo aceptados antes/después del actual para lockers en modo TOTP
+OTP_SKEW_STEPS = int(os.environ.get('OTP_SKEW_STEPS', '1'))
+
+# Tope de intentos por request en el endpoint de lote
+MAX_BATCH_ATTEMPTS = int(os.environ.get('MAX_BATCH_ATTEMPTS', '100'))
+
+# Cache LRU del estado OTP por locker (0 entradas = desactivada). El TTL es
+# la ventana máxima en la que un rechazo puede salir de un estado viejo
+OTP_CACHE_SIZE = int(os.environ.get('OTP_CACHE_SIZE', '1024'))
+OTP_CACHE_TTL_SECONDS = float(os.environ.get('OTP_CACHE_TTL_SECONDS', '2'))
+
+# Throttling de intentos fallidos (token bucket por locker y por IP de origen).
+# THROTTLE_TABLE_NAME activa el backend compartido en DynamoDB entre contenedores.
+THROTTLE_WINDOW_SECONDS = float(os.environ.get('THROTTLE_WINDOW_SECONDS', '60'))
+THROTTLE_LOCKER_MAX_FAILURES = int(os.environ.get('THROTTLE_LOCKER_MAX_FAILURES', '5'))
+THROTTLE_IP_MAX_FAILURES = int(os.environ.get('THROTTLE_IP_MAX_FAILURES', '20'))
+# Un item THROTTLED por locker y ventana de este largo, compartido entre contenedores
+THROTTLE_AUDIT_INTERVAL_SECONDS = float(os.environ.get('THROTTLE_AUDIT_INTERVAL_SECONDS', '10'))
+THROTTLE_TABLE_NAME = os.environ.get('THROTTLE_TABLE_NAME')
+
+throttle_store = DynamoBucketStore(THROTTLE_TABLE_NAME) if THROTTLE_TABLE_NAME else MemoryBucketStore()
+locker_limiter = FailureLimiter(THROTTLE_LOCKER_MAX_FAILURES, THROTTLE_WINDOW_SECONDS, throttle_store)
+ip_limiter = FailureLimiter(THROTTLE_IP_MAX_FAILURES, THROTTLE_WINDOW_SECONDS, throttle_store)
+
+# Sink de auditoría (se inicializa fuera del handler para reuso).
+# Por defecto el lote se escribe en cada invocación pero después de
+# responder (extensión interna, ver after_response): el veredicto no espera
+# a DynamoDB y el contenedor no se congela con items pendientes. Fuera de
+# Lambda o con AFTER_RESPONSE_ENABLED=0 el flush queda en el finally.
+# AUDIT_BACKGROUND_FLUSH=1 (opt-in) lo delega a un hilo que puede quedar
+# congelado con el contenedor.
+AUDIT_BACKGROUND_FLUSH = os.environ.get('AUDIT_BACKGROUND_FLUSH', '0') == '1'
+audit_sink = AuditSink(
+    AUDIT_TABLE_NAME,
+    max_buffer=int(os.environ.get('AUDIT_MAX_BUFFER', '1000')),
+    background=AUDIT_BACKGROUND_FLUSH
+)
+after_response = AfterResponse('security-audit-flush')
+if not AUDIT_BACKGROUND_FLUSH:
+    # Por nombre y no audit_sink.flush: los benchmarks reemplazan el sink
+    after_response.add(lambda: audit_sink.flush())
+    after_response.start()
+
+# Copia relacional de los intentos en access_logs (la lee el audit_worker)
+access_log = AccessLogSink()
+
+@db_utils.instrumented_handler('security')
 def lambda_handler(event, context):
+    try:
+        return route(event)
+    finally:
+        if not AUDIT_BACKGROUND_FLUSH:
+            after_response.done()
+        if not access_log.background:
+            access_log.flush()
+
+def route(event):
     path = event.get('path', '') or event.get('rawPath', '')
     http_method = event.get('httpMethod', '') or event.get('requestContext', {}).get('http', {}).get('method')
     
@@ -22,29 +83,203 @@ def lambda_handler(event, context):
     if http_method == 'OPTIONS':
         return db_utils.format_response(200, {})
 
+    # Lote de intentos: /security/lockers/access-attempts/batch
+    if 'access-attempts/batch' in path and http_method == 'POST':
+        return validate_access_batch(event)
+
     # Esperamos ruta: /security/lockers/{lockerId}/access-attempt
     if 'access-attempt' in path and http_method == 'POST':
         return validate_access(event, path)
     
     return db_utils.format_response(404, {'message': 'Ruta de seguridad no encontrada'})
 
+def build_audit_item(locker_id, status, reason):
+    return {
+        'locker_id': str(locker_id),
+        'timestamp': audit_sort_key(),
+        'status': status, # 'SUCCESS', 'FAILED', 'EXPIRED'
+        'reason': reason
+    }
+
 def log_attempt_dynamodb(locker_id, status, reason):
-    """Escribe el intento en DynamoDB via VPC Endpoint"""
+    """Encola el intento para DynamoDB; el sink lo escribe en lote fuera del camino crítico"""
     try:
-        table = dynamodb.Table(AUDIT_TABLE_NAME)
-        timestamp = datetime.now().isoformat()
-        
-        item = {
-            'locker_id': str(locker_id),
-            'timestamp': timestamp,
-            'status': status, # 'SUCCESS', 'FAILED', 'EXPIRED'
-            'reason': reason
-        }
-        table.put_item(Item=item)
-        logger.info(f"Audit log guardado: {item}")
+        item = build_audit_item(locker_id, status, reason)
+        audit_sink.record(item)
+        logger.info(f"Audit log encolado: {item}")
     except Exception as e:
         # No fallamos la petición si falla el log, pero lo reportamos
-        logger.error(f"Error escribiendo en DynamoDB: {str(e)}")
+        logger.error(f"Error encolando auditoría: {str(e)}")
+
+def access_log_status(status, reason):
+    """Estado para access_logs: el OTP incorrecto tiene valor propio en el ENUM."""
+    return 'INVALID_OTP' if reason == 'Invalid OTP' else status
+
+def log_attempt_mysql(event, locker_id, status, reason):
+    """Encola el intento para access_logs con la IP y el User-Agent del request"""
+    try:
+        access_log.record_event(locker_id, 'access_attempt', access_log_status(status, reason), reason, event=event)
+    except Exception as e:
+        logger.error(f"Error encolando access_log: {str(e)}")
+
+def throttle_keys(locker_id, source_ip):
+    keys = [(locker_limiter, f'locker#{locker_id}')]
+    if source_ip:
+        keys.append((ip_limiter, f'ip#{source_ip}'))
+    return keys
+
+def throttle_retry_after(locker_id, source_ip=None):
+    """Segundos de espera si alguna llave agotó sus fallos (0 si puede intentar)"""
+    try:
+        return max(limiter.retry_after(key) for limiter, key in throttle_keys(locker_id, source_ip))
+    except Exception as e:
+        # Si el backend compartido falla no bloqueamos el acceso
+        logger.error(f"Error consultando throttling: {str(e)}")
+        return 0
+
+def register_failure(locker_id, source_ip=None):
+    try:
+        for limiter, key in throttle_keys(locker_id, source_ip):
+            limiter.record_failure(key)
+    except Exception as e:
+        logger.error(f"Error registrando fallo en throttling: {str(e)}")
+
+def note_throttled(locker_id):
+    """
+    Suma el intento rechazado al item THROTTLED del locker en la ventana
+    actual (UpdateItem ADD en el flush): un item por locker y ventana sin
+    importar cuántas invocaciones o contenedores lo rechacen.
+    """
+    audit_sink.record_count(str(locker_id), audit_window_key(THROTTLE_AUDIT_INTERVAL_SECONDS, 'throttled'),
+                            status='THROTTLED', reason='Attempts throttled')
+
+def throttled_response(retry_after):
+    return db_utils.format_response(429, {
+        'message': 'Demasiados intentos fallidos, intenta más tarde',
+        'retry_after': math.ceil(retry_after)
+    })
+
+class LockerStateCache:
+    """
+    LRU acotada por contenedor con el estado OTP de cada locker.
+    El TTL de cada entrada nunca pasa de OTP_CACHE_TTL_SECONDS ni de
+    otp_valid_until / expires_at. Solo los rechazos salen de la cache sin
+    consultar MySQL; un acceso concedido siempre relee la fila (ver
+    read_locker_state).
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'cached_rejections': 0, 'revalidations': 0, 'stale': 0, 'evictions': 0}
+
+    def get(self, locker_id):
+        entry = self._entries.get(locker_id)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        row, expires = entry
+        if time.monotonic() >= expires:
+            del self._entries[locker_id]
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(locker_id)
+        self.stats['hits'] += 1
+        return row
+
+    def put(self, locker_id, row):
+        if self.max_entries <= 0 or not row:
+            return
+        ttl = self.ttl_seconds
+        # El estado no puede sobrevivir a la vigencia del OTP ni de la asignación
+        limit = row['otp_valid_until'] if not row['otp_secret'] else row['expires_at']
+        if limit:
+            ttl = min(ttl, (limit - datetime.now()).total_seconds())
+        if ttl <= 0:
+            self._entries.pop(locker_id, None)
+            return
+        self._entries[locker_id] = (row, time.monotonic() + ttl)
+        self._entries.move_to_end(locker_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, locker_id):
+        self._entries.pop(locker_id, None)
+
+locker_cache = LockerStateCache(OTP_CACHE_SIZE, OTP_CACHE_TTL_SECONDS)
+
+def fetch_locker_state(locker_id):
+    """Lee la fila de OTP del locker directamente de MySQL."""
+    conn = db_utils.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(queries.LOCKER_OTP_STATE_BY_ID, (locker_id,))
+            return cur.fetchone()
+    finally:
+        db_utils.release_db_connection(conn)
+
+def read_locker_state(locker_id, input_otp):
+    """
+    Estado del locker y veredicto, usando la cache para los rechazos.
+    Un rechazo con una entry vigente se responde sin consultar MySQL: es
+    el camino de la fuerza bruta. Staleness acotada: un OTP rotado o una
+    asignación hecha por otro Lambda se ve a más tardar en
+    OTP_CACHE_TTL_SECONDS (mientras tanto el código nuevo se rechaza y el
+    cliente reintenta). Si el acceso se concedería, se relee la fila
+    completa, así que nunca se abre la puerta con estado viejo.
+    """
+    cached = locker_cache.get(locker_id)
+    if cached is not None:
+        verdict = check_locker_otp(cached, input_otp)
+        if verdict[0] != 200:
+            locker_cache.stats['cached_rejections'] += 1
+            return verdict
+        locker_cache.stats['revalidations'] += 1
+
+    locker_data = fetch_locker_state(locker_id)
+    if cached is not None and (not locker_data or any(locker_data[c] != cached[c]
+                                                      for c in queries.LOCKER_OTP_VERSION_COLUMNS)):
+        locker_cache.stats['stale'] += 1
+    if locker_data:
+        locker_cache.put(locker_id, locker_data)
+    else:
+        locker_cache.invalidate(locker_id)
+    return check_locker_otp(locker_data, input_otp)
+
+def check_locker_otp(locker_data, input_otp):
+    """
+    Reglas de negocio del OTP sobre una fila de lockers (o None).
+    Devuelve (status_code, body, audit_status, audit_reason).
+    """
+    if not locker_data:
+        return 404, {'message': 'Locker no encontrado'}, 'FAILED', 'Locker not found'
+
+    if locker_data['status'] != 'occupied':
+        return 403, {'message': 'El locker no está en uso'}, 'FAILED', 'Locker not occupied'
+
+    granted = (200, {'message': 'Acceso Concedido', 'door_open': True}, 'SUCCESS', 'Access Granted')
+    denied = (401, {'message': 'Código Incorrecto'}, 'FAILED', 'Invalid OTP')
+
+    # Modo TOTP: el locker tiene secreto propio y el código depende del paso de tiempo
+    if locker_data['otp_secret']:
+        expires_at = locker_data['expires_at']
+        if expires_at and datetime.now() > expires_at:
+            return 403, {'message': 'El código ha expirado'}, 'EXPIRED', 'Assignment Expired'
+        return granted if totp.verify(locker_data['otp_secret'], input_otp, skew=OTP_SKEW_STEPS) else denied
+
+    stored_hash = locker_data['current_otp_hash']
+    salt = locker_data['otp_salt']
+    valid_until = locker_data['otp_valid_until']
+
+    # Checar expiración de tiempo
+    if not valid_until or datetime.now() > valid_until:
+        return 403, {'message': 'El código ha expirado'}, 'EXPIRED', 'OTP Expired'
+
+    # Validar Hash (SHA-256)
+    check_hash = hashlib.sha256((input_otp + salt).encode('utf-8')).hexdigest()
+    return granted if check_hash == stored_hash else denied
 
 def validate_access(event, path):
     try:
@@ -55,53 +290,118 @@ def validate_access(event, path):
         idx = parts.index('access-attempt')
         locker_id = parts[idx - 1]
 
+        # Throttling antes de cualquier I/O de BD o auditoría
+        source_ip = db_utils.get_source_ip(event)
+        retry_after = throttle_retry_after(locker_id, source_ip)
+        if retry_after:
+            note_throttled(locker_id)
+            return throttled_response(retry_after)
+
         # 2. Obtener OTP del body
         body = json.loads(event.get('body', '{}'))
         input_otp = body.get('otp')
 
         if not input_otp:
+            register_failure(locker_id, source_ip)
             log_attempt_dynamodb(locker_id, 'FAILED', 'Missing OTP')
+            log_attempt_mysql(event, locker_id, 'FAILED', 'Missing OTP')
             return db_utils.format_response(400, {'message': 'Falta el OTP'})
 
-        # 3. Consultar la "Verdad" en MySQL
-        conn = db_utils.get_db_connection()
-        locker_data = None
-        with conn.cursor() as cur:
-            sql = "SELECT current_otp_hash, otp_salt, otp_valid_until, status FROM lockers WHERE id = %s"
-            cur.execute(sql, (locker_id,))
-            locker_data = cur.fetchone()
-        conn.close()
+        # 3. Consultar la "Verdad" en MySQL (o en la cache si el veredicto es rechazo)
+        # 4. Validaciones de Negocio
+        status_code, response_body, audit_status, reason = read_locker_state(locker_id, input_otp)
+        if audit_status != 'SUCCESS':
+            register_failure(locker_id, source_ip)
+        log_attempt_dynamodb(locker_id, audit_status, reason)
+        log_attempt_mysql(event, locker_id, audit_status, reason)
+        return db_utils.format_response(status_code, response_body)
 
-        if not locker_data:
-            log_attempt_dynamodb(locker_id, 'FAILED', 'Locker not found')
-            return db_utils.format_response(404, {'message': 'Locker no encontrado'})
+    except Exception as e:
+        logger.error(str(e))
+        return db_utils.format_response(500, {'error': str(e)})
 
-        # 4. Validaciones de Negocio
-        if locker_data['status'] != 'occupied':
-            log_attempt_dynamodb(locker_id, 'FAILED', 'Locker not occupied')
-            return db_utils.format_response(403, {'message': 'El locker no está en uso'})
-
-        stored_hash = locker_data['current_otp_hash']
-        salt = locker_data['otp_salt']
-        valid_until = locker_data['otp_valid_until']
-
-        # Checar expiración de tiempo
-        if not valid_until or datetime.now() > valid_until:
-            log_attempt_dynamodb(locker_id, 'EXPIRED', 'OTP Expired')
-            return db_utils.format_response(403, {'message': 'El código ha expirado'})
-
-        # 5. Validar Hash (SHA-256)
-        check_hash = hashlib.sha256((input_otp + salt).encode('utf-8')).hexdigest()
-
-        if check_hash == stored_hash:
-            # ¡BINGO!
-            log_attempt_dynamodb(locker_id, 'SUCCESS', 'Access Granted')
-            return db_utils.format_response(200, {'message': 'Acceso Concedido', 'door_open': True})
-        else:
-            # Fallo
-            log_attempt_dynamodb(locker_id, 'FAILED', 'Invalid OTP')
-            return db_utils.format_response(401, {'message': 'Código Incorrecto'})
+def validate_access_batch(event):
+    """
+    Valida varios intentos de un banco de lockers en un solo request.
+    Body: {"attempts": [{"locker_id": 1, "otp": "123456"}, ...]}
+    Una sola consulta IN (...) y un solo lote de auditoría.
+    El throttling aquí es solo por locker: todas las puertas del banco
+    comparten la IP del controlador. Se vuelve a revisar después de cada
+    fallo, así repetir un locker_id no da más intentos que el límite.
+    """
+    try:
+        body = json.loads(event.get('body', '{}'))
+        attempts = body.get('attempts')
+
+        if not isinstance(attempts, list) or not attempts:
+            return db_utils.format_response(400, {'message': 'Falta la lista "attempts"'})
+        if len(attempts) > MAX_BATCH_ATTEMPTS:
+            return db_utils.format_response(400, {'message': f'Máximo {MAX_BATCH_ATTEMPTS} intentos por lote'})
+
+        # 1. IDs válidos (sin duplicados y sin throttling) para una sola consulta
+        retry_after_by_id = {}
+        for a in attempts:
+            lid = str(a.get('locker_id', '')) if isinstance(a, dict) else ''
+            if lid.isdigit() and lid not in retry_after_by_id:
+                retry_after_by_id[lid] = throttle_retry_after(lid)
+        locker_ids = sorted(int(lid) for lid, wait in retry_after_by_id.items() if not wait)
+
+        lockers_by_id = {}
+        if locker_ids:
+            conn = db_utils.get_db_connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(queries.locker_otp_state_by_ids(len(locker_ids)), locker_ids)
+                    lockers_by_id = {row['id']: row for row in cur.fetchall()}
+                for row in lockers_by_id.values():
+                    locker_cache.put(str(row['id']), row)
+            finally:
+                db_utils.release_db_connection(conn)
+
+        # 2. Veredicto por intento en una pasada
+        results = []
+        audit_items = []
+        access_rows = []
+        for attempt in attempts:
+            attempt = attempt if isinstance(attempt, dict) else {}
+            locker_id = str(attempt.get('locker_id', ''))
+            input_otp = attempt.get('otp')
+
+            if not locker_id.isdigit():
+                results.append({'locker_id': locker_id, 'statusCode': 400, 'message': 'ID de locker inválido'})
+                continue
+            if retry_after_by_id.get(locker_id):
+                note_throttled(locker_id)
+                results.append({'locker_id': locker_id, 'statusCode': 429,
+                                'message': 'Demasiados intentos fallidos, intenta más tarde',
+                                'retry_after': math.ceil(retry_after_by_id[locker_id])})
+                continue
+            if not input_otp:
+                status_code, response_body, audit_status, reason = 400, {'message': 'Falta el OTP'}, 'FAILED', 'Missing OTP'
+            else:
+                status_code, response_body, audit_status, reason = check_locker_otp(
+                    lockers_by_id.get(int(locker_id)), str(input_otp)
+                )
+            if audit_status != 'SUCCESS':
+                register_failure(locker_id)
+                # Un locker repetido en el lote consume su bucket como intentos separados
+                retry_after_by_id[locker_id] = throttle_retry_after(locker_id)
+            audit_items.append(build_audit_item(locker_id, audit_status, reason))
+            if access_log.enabled:
+                access_rows.append(access_log.build_row(
+                    locker_id, 'access_attempt', access_log_status(audit_status, reason), reason, event=event))
+            results.append(dict(response_body, locker_id=locker_id, statusCode=status_code))
+
+        # 3. Auditoría del lote completo de una vez
+        try:
+            audit_sink.record_many(audit_items)
+            if access_rows:
+                access_log.record_many(access_rows)
+        except Exception as e:
+            logger.error(f"Error encolando auditoría: {str(e)}")
+
+        return db_utils.format_response(200, {'results': results})
 
     except Exception as e:
         logger.error(str(e))
-        return db_utils.format_response(500, {'error': str(e)})
\ No newline at end of file
+        return db_utils.format_response(500, {'error': str(e)})
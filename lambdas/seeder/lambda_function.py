@@ -1,23 +1,16 @@
-import sys
 import os
+import json
 import pymysql
 import logging
 import hashlib # para hashear el passowrd admin
+import db_utils # config de RDS (variables RDS_* o RDS_SECRET_ID)
+import migrate # migraciones versionadas (migrations/*.sql)
+import synthetic # generador de volumen para pruebas de escala
 
 # Configuración básica de logs
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Lectura de variables de entorno
-try:
-    rds_host = os.environ['RDS_HOST']
-    name = os.environ['RDS_USER']
-    password = os.environ['RDS_PASSWORD']
-    db_name = os.environ['RDS_DB_NAME']
-except KeyError as e:
-    logger.error(f"Error: Falta la variable de entorno {e}")
-    sys.exit(1)
-
 def hash_password(password):
     """Genera hash compatible con el sistema de Auth"""
     salt = os.urandom(16).hex()
@@ -49,35 +42,53 @@ def create_admin_user(conn):
         conn.commit()
         logger.info("Usuario Admin creado exitosamente.")
 
+def connect_server(force_refresh=False):
+    """Conexión sin BD seleccionada (la BD puede no existir todavía)."""
+    config = db_utils.get_db_config(force_refresh=force_refresh)
+    logger.info(f"Conectando a {config['host']}...")
+    conn = pymysql.connect(
+        host=config['host'], port=config['port'], user=config['user'], passwd=config['password'],
+        connect_timeout=10
+    )
+    return config, conn
+
 def lambda_handler(event, context):
     conn = None
     try:
-        logger.info(f"Conectando a {rds_host}...")
-        conn = pymysql.connect(
-            host=rds_host, user=name, passwd=password, connect_timeout=10
-        )
+        try:
+            config, conn = connect_server()
+        except pymysql.err.OperationalError as e:
+            if e.args[0] != db_utils.ER_ACCESS_DENIED or not db_utils.RDS_SECRET_ID:
+                raise
+            # Contraseña rotada desde la última lectura del secreto
+            config, conn = connect_server(force_refresh=True)
         logger.info("Conexión exitosa.")
-        
-        # 1. Ejecutar Schema SQL (Tablas)
-        with open('rds_schema.sql', 'r') as file:
-            sql_script = file.read()
-            
-        statements = sql_script.split(';')
-        with conn.cursor() as cur:
-            cur.execute(f"USE {db_name}") 
-            for statement in statements:
-                if statement.strip():
-                    cur.execute(statement)
-            conn.commit()
-        
+
+        # 1. Migraciones pendientes (sin pendientes = un SELECT a schema_migrations)
+        migrate.ensure_database(conn, config['db'])
+        migration = migrate.migrate(conn)
+        logger.info(f"Migraciones: {migration}")
+
+        # Modo sintético: {"mode": "synthetic", "users": 50000, "access_logs": 5000000, ...}
+        # (ver synthetic.DEFAULTS)
+        if (event or {}).get('mode') == 'synthetic':
+            params = {k: v for k, v in event.items() if k in synthetic.DEFAULTS}
+            result = synthetic.generate(conn, **params)
+            result['migrations'] = migration
+            logger.info(f"Datos sintéticos generados: {result}")
+            return {
+                'statusCode': 200,
+                'body': json.dumps(result)
+            }
+
         # 2. Inyectar Admin User (Python Logic)
-        # Nos reconectamos asegurando la DB seleccionada
-        conn.select_db(db_name)
         create_admin_user(conn)
 
         return {
             'statusCode': 200,
-            'body': "Base de datos actualizada y Admin creado (admin@utez.edu.mx)."
+            'body': f"Schema en versión {migration['current_version']} "
+                    f"(aplicadas: {', '.join(migration['applied']) or 'ninguna'}). "
+                    "Admin listo (admin@utez.edu.mx)."
         }
         
     except Exception as e:
@@ -0,0 +1,204 @@
+"""
+Runner de migraciones versionadas del schema RDS.
+
+Las migraciones viven en migrations/NNNN_nombre.sql y se aplican en orden.
+schema_migrations guarda las ya aplicadas (versión, nombre, checksum), así
+que un despliegue sin pendientes hace un solo SELECT y termina.
+
+Cada migración corre en su propia transacción y se registra en la misma.
+Ojo: en MySQL el DDL hace commit implícito, por eso las migraciones con DDL
+se escriben idempotentes (IF NOT EXISTS, INSERT IGNORE, PREPARE
+condicional): si una falla a la mitad, reintentarla es seguro.
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+# Evita que dos despliegues simultáneos apliquen la misma migración
+LOCK_NAME = 'smartlocker_schema_migrations'
+LOCK_TIMEOUT_SECONDS = 60
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+      version     INT PRIMARY KEY,
+      name        VARCHAR(255) NOT NULL,
+      checksum    CHAR(64) NOT NULL,
+      applied_at  DATETIME NOT NULL,
+      duration_ms INT NOT NULL
+    ) ENGINE=InnoDB
+"""
+
+class MigrationError(Exception):
+    pass
+
+def split_statements(sql):
+    """
+    Separa un script en sentencias por ';' ignorando los que están dentro de
+    strings ('...', "...", con escapes), identificadores `...` y comentarios
+    (-- , # y /* */). Los comentarios se descartan.
+    """
+    statements = []
+    current = []
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        nxt = sql[i + 1] if i + 1 < n else ''
+
+        if ch in ("'", '"', '`'):
+            quote = ch
+            j = i + 1
+            while j < n:
+                if sql[j] == '\\' and quote != '`':
+                    j += 2
+                    continue
+                if sql[j] == quote:
+                    if j + 1 < n and sql[j + 1] == quote:  # comilla duplicada ''
+                        j += 2
+                        continue
+                    break
+                j += 1
+            if j >= n:
+                raise MigrationError(f'String sin cerrar cerca de: {sql[i:i + 40]!r}')
+            current.append(sql[i:j + 1])
+            i = j + 1
+        elif (ch == '-' and nxt == '-' and (i + 2 >= n or sql[i + 2] in ' \t\r\n')) or ch == '#':
+            j = sql.find('\n', i)
+            i = n if j == -1 else j
+        elif ch == '/' and nxt == '*':
+            j = sql.find('*/', i + 2)
+            if j == -1:
+                raise MigrationError('Comentario /* sin cerrar')
+            current.append(' ')
+            i = j + 2
+        elif ch == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += 1
+        else:
+            current.append(ch)
+            i += 1
+
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def discover(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] ordenado por versión; versiones duplicadas = error."""
+    found = {}
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in found:
+            raise MigrationError(f'Versión {version} duplicada: {found[version][1]} y {filename}')
+        found[version] = (version, match.group(2), os.path.join(directory, filename))
+    return [found[v] for v in sorted(found)]
+
+def _checksum(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _row_value(row, key, index=0):
+    return row[key] if isinstance(row, dict) else row[index]
+
+def applied_versions(conn):
+    """{version: checksum}; crea schema_migrations la primera vez."""
+    with conn.cursor() as cur:
+        try:
+            cur.execute("SELECT version, checksum FROM schema_migrations")
+        except Exception as e:
+            # 1146 = la tabla no existe (BD nueva o creada por el seeder anterior)
+            if getattr(e, 'args', (None,))[0] != 1146:
+                raise
+            cur.execute(SCHEMA_MIGRATIONS_DDL)
+            conn.commit()
+            return {}
+        return {_row_value(r, 'version'): _row_value(r, 'checksum', 1) for r in cur.fetchall()}
+
+def apply_migration(conn, version, name, sql):
+    started = time.perf_counter()
+    statements = split_statements(sql)
+    with conn.cursor() as cur:
+        try:
+            for statement in statements:
+                cur.execute(statement)
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name, checksum, applied_at, duration_ms) "
+                "VALUES (%s, %s, %s, NOW(), %s)",
+                (version, name, _checksum(sql), duration_ms)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    logger.info(f"Migración {version:04d}_{name} aplicada ({len(statements)} sentencias, {duration_ms} ms)")
+    return duration_ms
+
+def migrate(conn, directory=MIGRATIONS_DIR):
+    """
+    Aplica las migraciones pendientes en orden sobre la BD seleccionada.
+    Devuelve {'applied': [...], 'current_version': N, 'elapsed_ms': X}.
+    """
+    started = time.perf_counter()
+    migrations = discover(directory)
+    applied = applied_versions(conn)
+    pending = [m for m in migrations if m[0] not in applied]
+
+    for version, name, path in migrations:
+        if version in applied:
+            with open(path, 'r') as f:
+                if _checksum(f.read()) != applied[version]:
+                    logger.warning(f"La migración {version:04d}_{name} cambió después de aplicarse")
+
+    done = []
+    if pending:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, %s) AS got", (LOCK_NAME, LOCK_TIMEOUT_SECONDS))
+            if not _row_value(cur.fetchone(), 'got'):
+                raise MigrationError('No se obtuvo el lock de migraciones (¿otro despliegue en curso?)')
+        try:
+            # Releer con el lock tomado: otro despliegue pudo aplicar algunas
+            applied = applied_versions(conn)
+            for version, name, path in migrations:
+                if version in applied:
+                    continue
+                with open(path, 'r') as f:
+                    sql = f.read()
+                try:
+                    apply_migration(conn, version, name, sql)
+                except Exception as e:
+                    raise MigrationError(f'Falló {version:04d}_{name}: {str(e)}') from e
+                done.append(f'{version:04d}_{name}')
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+
+    return {
+        'applied': done,
+        'current_version': migrations[-1][0] if migrations else 0,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+def ensure_database(conn, db_name):
+    """Selecciona la BD; solo si no existe (error 1049) la crea."""
+    try:
+        conn.select_db(db_name)
+    except Exception as e:
+        if getattr(e, 'args', (None,))[0] != 1049:
+            raise
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}` "
+                        "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        conn.select_db(db_name)
@@ -1,9 +1,5 @@
--- Crear base de datos (si no existe) y seleccionarla
-CREATE DATABASE IF NOT EXISTS smartlocker_db
-  CHARACTER SET utf8mb4
-  COLLATE utf8mb4_unicode_ci;
-
-USE smartlocker_db;
+-- 0001: schema inicial (tablas + lockers de ejemplo).
+-- La base de datos la crea migrate.py (RDS_DB_NAME); aquí no va CREATE DATABASE/USE.
 
 -- Tabla de usuarios
 CREATE TABLE IF NOT EXISTS users (
@@ -27,15 +23,29 @@ CREATE TABLE IF NOT EXISTS lockers (
   current_otp_hash CHAR(64) NULL,   -- SHA-256(OTP + salt)
   otp_salt         CHAR(32) NULL,   -- salt en hex
   otp_valid_until  DATETIME NULL,
+  otp_secret       CHAR(40) NULL,   -- secreto TOTP por asignación (OTP_MODE=totp)
   color_hex        CHAR(7) NULL,    -- #RRGGBB (locker personalizado)
+  availability_version BIGINT NOT NULL DEFAULT 0, -- versión del feed /lockers/available
   created_at       DATETIME NOT NULL,
   updated_at       DATETIME NULL,
+  UNIQUE KEY uq_lockers_current_user (current_user_id), -- un locker por usuario (NULL no cuenta)
+  KEY idx_lockers_status_expires (status, expires_at), -- barrido de expirados
+  KEY idx_lockers_updated_at (updated_at),            -- ETag del listado admin
+  KEY idx_lockers_availability_version (availability_version), -- deltas ?since=
   CONSTRAINT fk_lockers_user
     FOREIGN KEY (current_user_id) REFERENCES users(id)
     ON UPDATE CASCADE
     ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+-- Contador global del feed de disponibilidad (una sola fila)
+CREATE TABLE IF NOT EXISTS locker_feed_version (
+  id      TINYINT PRIMARY KEY,
+  version BIGINT NOT NULL
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO locker_feed_version (id, version) VALUES (1, 0);
+
 -- Tabla de logs de acceso y eventos
 CREATE TABLE IF NOT EXISTS access_logs (
   id          BIGINT AUTO_INCREMENT PRIMARY KEY,
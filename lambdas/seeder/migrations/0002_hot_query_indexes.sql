@@ -0,0 +1,47 @@
+-- 0002: índices de las queries calientes.
+-- MySQL no tiene CREATE INDEX IF NOT EXISTS: cada índice se crea con un
+-- PREPARE condicional sobre information_schema para que la migración sea
+-- idempotente (BDs creadas con infra/sql/rds_schema.sql ya los traen).
+--
+-- lockers(status) no se crea aparte: idx_lockers_status_expires
+-- (status, expires_at) ya resuelve los filtros solo por status con su
+-- prefijo izquierdo. Aquí solo se asegura que exista en BDs viejas.
+
+-- Barrido de expirados y conteos por status
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE lockers ADD INDEX idx_lockers_status_expires (status, expires_at)',
+            'DO 0')
+  FROM information_schema.statistics
+  WHERE table_schema = DATABASE() AND table_name = 'lockers'
+    AND index_name = 'idx_lockers_status_expires'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Historial por locker ordenado por fecha (WHERE locker_id = ? ORDER BY created_at DESC)
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE access_logs ADD INDEX idx_access_logs_locker_created (locker_id, created_at)',
+            'DO 0')
+  FROM information_schema.statistics
+  WHERE table_schema = DATABASE() AND table_name = 'access_logs'
+    AND index_name = 'idx_access_logs_locker_created'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Bandeja de solicitudes pendientes del admin (WHERE status = 'pending' ORDER BY created_at)
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE locker_requests ADD INDEX idx_locker_requests_status_created (status, created_at)',
+            'DO 0')
+  FROM information_schema.statistics
+  WHERE table_schema = DATABASE() AND table_name = 'locker_requests'
+    AND index_name = 'idx_locker_requests_status_created'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,45 @@
+-- 0003: estado del detector de actividad sospechosa (LambdaSecurityAuditWorker).
+
+-- Último access_logs.id procesado por cada consumidor incremental
+CREATE TABLE IF NOT EXISTS audit_watermarks (
+  name        VARCHAR(64) PRIMARY KEY,
+  last_id     BIGINT NOT NULL DEFAULT 0,
+  updated_at  DATETIME NULL
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO audit_watermarks (name, last_id, updated_at) VALUES ('suspicious_activity', 0, NOW());
+
+-- Fallos por locker en buckets de tiempo (ventana deslizante = suma de buckets)
+CREATE TABLE IF NOT EXISTS security_locker_failures (
+  locker_id     INT NOT NULL,
+  bucket_start  DATETIME NOT NULL,
+  failures      INT NOT NULL,
+  PRIMARY KEY (locker_id, bucket_start),
+  KEY idx_security_locker_failures_bucket (bucket_start) -- purga de buckets viejos
+) ENGINE=InnoDB;
+
+-- Fallos por IP y locker: fallos por IP y lockers distintos (enumeración)
+CREATE TABLE IF NOT EXISTS security_ip_failures (
+  source_ip     VARCHAR(45) NOT NULL,
+  bucket_start  DATETIME NOT NULL,
+  locker_id     INT NOT NULL,
+  failures      INT NOT NULL,
+  PRIMARY KEY (source_ip, bucket_start, locker_id),
+  KEY idx_security_ip_failures_bucket (bucket_start)
+) ENGINE=InnoDB;
+
+-- Alertas persistidas: el endpoint solo lee de aquí
+CREATE TABLE IF NOT EXISTS security_alerts (
+  id                BIGINT AUTO_INCREMENT PRIMARY KEY,
+  alert_type        ENUM('locker_burst','ip_burst','enumeration') NOT NULL,
+  locker_id         INT NULL,
+  source_ip         VARCHAR(45) NULL,
+  failures          INT NOT NULL,
+  distinct_lockers  INT NULL,
+  window_start      DATETIME NOT NULL,
+  window_end        DATETIME NOT NULL,
+  detected_at       DATETIME NOT NULL,
+  dedupe_key        VARCHAR(120) NOT NULL,  -- una alerta por tipo/llave/ventana
+  UNIQUE KEY uq_security_alerts_dedupe (dedupe_key),
+  KEY idx_security_alerts_type (alert_type, id)
+) ENGINE=InnoDB;
@@ -0,0 +1,71 @@
+-- 0004: columnas e índices de lockers en BDs creadas por el seeder viejo.
+-- En esas BDs el CREATE TABLE IF NOT EXISTS de 0001 no hace nada sobre la
+-- tabla lockers existente, así que aquí se agregan con el mismo PREPARE
+-- condicional sobre information_schema que usa 0002 (en BDs nuevas todo ya
+-- existe y cada paso es un DO 0).
+
+-- Secreto TOTP por asignación (lo leen y escriben security y lockers en ambos modos)
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE lockers ADD COLUMN otp_secret CHAR(40) NULL AFTER otp_valid_until',
+            'DO 0')
+  FROM information_schema.columns
+  WHERE table_schema = DATABASE() AND table_name = 'lockers'
+    AND column_name = 'otp_secret'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Versión del feed /lockers/available
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE lockers ADD COLUMN availability_version BIGINT NOT NULL DEFAULT 0 AFTER color_hex',
+            'DO 0')
+  FROM information_schema.columns
+  WHERE table_schema = DATABASE() AND table_name = 'lockers'
+    AND column_name = 'availability_version'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Un locker por usuario. Si la BD vieja tiene usuarios con dos lockers el
+-- ALTER falla: hay que liberar los sobrantes y volver a correr la migración.
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE lockers ADD UNIQUE KEY uq_lockers_current_user (current_user_id)',
+            'DO 0')
+  FROM information_schema.statistics
+  WHERE table_schema = DATABASE() AND table_name = 'lockers'
+    AND index_name = 'uq_lockers_current_user'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- ETag del listado admin
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE lockers ADD INDEX idx_lockers_updated_at (updated_at)',
+            'DO 0')
+  FROM information_schema.statistics
+  WHERE table_schema = DATABASE() AND table_name = 'lockers'
+    AND index_name = 'idx_lockers_updated_at'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Deltas ?since= del feed de disponibilidad
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE lockers ADD INDEX idx_lockers_availability_version (availability_version)',
+            'DO 0')
+  FROM information_schema.statistics
+  WHERE table_schema = DATABASE() AND table_name = 'lockers'
+    AND index_name = 'idx_lockers_availability_version'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,42 @@
+-- 0005: techo asentado del detector de actividad sospechosa.
+-- access_logs.id se asigna en el INSERT pero la fila se ve recién en el
+-- COMMIT, así que un id menor puede aparecer después de uno mayor. El worker
+-- solo avanza hasta safe_id: el MAX(id) observado (observed_id) pasa a
+-- safe_id cuando lleva AUDIT_SETTLE_SECONDS sin que haya commits pendientes
+-- por debajo. Mismo ADD COLUMN condicional que 0002/0004.
+
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE audit_watermarks ADD COLUMN safe_id BIGINT NOT NULL DEFAULT 0 AFTER last_id',
+            'DO 0')
+  FROM information_schema.columns
+  WHERE table_schema = DATABASE() AND table_name = 'audit_watermarks'
+    AND column_name = 'safe_id'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE audit_watermarks ADD COLUMN observed_id BIGINT NOT NULL DEFAULT 0 AFTER safe_id',
+            'DO 0')
+  FROM information_schema.columns
+  WHERE table_schema = DATABASE() AND table_name = 'audit_watermarks'
+    AND column_name = 'observed_id'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = (
+  SELECT IF(COUNT(*) = 0,
+            'ALTER TABLE audit_watermarks ADD COLUMN observed_at DATETIME NULL AFTER observed_id',
+            'DO 0')
+  FROM information_schema.columns
+  WHERE table_schema = DATABASE() AND table_name = 'audit_watermarks'
+    AND column_name = 'observed_at'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
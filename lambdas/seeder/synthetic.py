@@ -0,0 +1,332 @@
+"""
+Generador de datos sintéticos para pruebas de escala.
+
+Crea usuarios, lockers (repartidos en prefijos de código, con mezcla
+ocupado/disponible/deshabilitado), access_logs y locker_requests con
+INSERT multi-fila (executemany de PyMySQL) en transacciones grandes.
+Todo sale de random.Random(seed): misma semilla + mismos parámetros =
+mismos datos. Los timestamps se calculan respecto a `anchor`.
+"""
+import os
+import time
+import random
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+EMAIL_DOMAIN = '@synthetic.local'
+PASSWORD = 'Synthetic123'  # misma contraseña para todos (se puede loguear en pruebas)
+
+DEFAULTS = {
+    'seed': 42,
+    'users': 20000,
+    'lockers': 20000,
+    'prefixes': ['SA', 'SB', 'SC', 'SD', 'SE'],
+    'occupied_ratio': 0.6,
+    'disabled_ratio': 0.02,
+    'expired_ratio': 0.05,    # de los ocupados, cuántos ya vencieron (trabajo para el sweeper)
+    'access_logs': 1000000,
+    'locker_requests': 200000,
+    'history_days': 90,
+    'batch_size': 5000,       # filas por executemany (PyMySQL lo reescribe como INSERT multi-fila)
+    'commit_every': 100000,   # filas por transacción
+    'defer_indexes': False,
+    'disable_fk_checks': True,
+    'reset': False,
+    'anchor': None,           # 'YYYY-MM-DD HH:MM:SS'; por defecto hoy a medianoche
+}
+
+# Índices secundarios que se pueden quitar durante la carga y recrear al final.
+# No incluye UNIQUE; los que respaldan una FK solo se quitan si otro índice
+# cubre la misma columna (si no, MySQL rechaza el DROP).
+DEFERRABLE_INDEXES = {
+    'lockers': [
+        ('idx_lockers_status_expires', '(status, expires_at)'),
+        ('idx_lockers_updated_at', '(updated_at)'),
+        ('idx_lockers_availability_version', '(availability_version)'),
+    ],
+    'access_logs': [
+        ('idx_access_logs_locker_created', '(locker_id, created_at)'),
+    ],
+    'locker_requests': [
+        ('idx_locker_requests_status_created', '(status, created_at)'),
+    ],
+}
+FK_COLUMNS = {'lockers': {'current_user_id'}, 'access_logs': {'locker_id', 'user_id'},
+              'locker_requests': {'locker_id', 'user_id'}}
+
+ACCESS_EVENTS = [
+    # (event_type, status, reason, peso)
+    ('access_attempt', 'success', None, 70),
+    ('access_attempt', 'invalid_otp', 'OTP incorrecto', 15),
+    ('access_attempt', 'expired', 'OTP expirado', 5),
+    ('otp_rotation', 'success', None, 6),
+    ('time_changed', 'success', None, 2),
+    ('owner_removed', 'expired', 'Asignación expirada (barrido automático)', 2),
+]
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/124.0',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) Mobile/15E148',
+    'SmartLockerController/1.0',
+]
+
+def _fmt(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+def _hash_password(rng, password):
+    salt = '%032x' % rng.getrandbits(128)
+    return f"{salt}${hashlib.sha256((password + salt).encode('utf-8')).hexdigest()}"
+
+class _Loader:
+    """executemany por lotes con commit cada `commit_every` filas y conteo de filas/s."""
+
+    def __init__(self, conn, batch_size, commit_every):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.report = {}
+
+    def load(self, table, sql, rows):
+        started = time.perf_counter()
+        total = 0
+        since_commit = 0
+        batch = []
+        with self.conn.cursor() as cur:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    cur.executemany(sql, batch)
+                    total += len(batch)
+                    since_commit += len(batch)
+                    batch = []
+                    if since_commit >= self.commit_every:
+                        self.conn.commit()
+                        since_commit = 0
+            if batch:
+                cur.executemany(sql, batch)
+                total += len(batch)
+        self.conn.commit()
+        elapsed = time.perf_counter() - started
+        self.report[table] = {
+            'rows': total,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(total / elapsed) if elapsed else total,
+        }
+        logger.info(f"{table}: {total} filas en {elapsed:.2f}s ({self.report[table]['rows_per_second']} filas/s)")
+        return total
+
+def _existing_indexes(cur, table):
+    """{nombre_índice: primera columna}"""
+    cur.execute("""
+        SELECT index_name AS name, column_name AS first_column FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND seq_in_index = 1
+    """, (table,))
+    return {(r['name'] if isinstance(r, dict) else r[0]): (r['first_column'] if isinstance(r, dict) else r[1])
+            for r in cur.fetchall()}
+
+def _droppable(existing, name, table):
+    first_column = existing[name]
+    if first_column not in FK_COLUMNS.get(table, ()):
+        return True
+    return any(col == first_column for other, col in existing.items() if other != name)
+
+def drop_deferrable_indexes(conn):
+    dropped = {}
+    with conn.cursor() as cur:
+        for table, indexes in DEFERRABLE_INDEXES.items():
+            existing = _existing_indexes(cur, table)
+            names = [name for name, _ in indexes if name in existing and _droppable(existing, name, table)]
+            if names:
+                cur.execute(f"ALTER TABLE {table} " + ', '.join(f'DROP INDEX {n}' for n in names))
+                dropped[table] = names
+    return dropped
+
+def create_deferred_indexes(conn, dropped):
+    """Recrea en un solo ALTER por tabla (un solo recorrido de la tabla)."""
+    with conn.cursor() as cur:
+        for table, names in dropped.items():
+            columns = dict(DEFERRABLE_INDEXES[table])
+            cur.execute(f"ALTER TABLE {table} " + ', '.join(f'ADD INDEX {n} {columns[n]}' for n in names))
+
+def reset_synthetic(conn, prefixes):
+    """Borra lo generado antes (los logs/requests caen por ON DELETE CASCADE)."""
+    with conn.cursor() as cur:
+        for prefix in prefixes:
+            cur.execute("DELETE FROM lockers WHERE code LIKE %s", (f'{prefix}-%',))
+        cur.execute("DELETE FROM users WHERE email LIKE %s", ('%' + EMAIL_DOMAIN,))
+    conn.commit()
+
+def generate(conn, **params):
+    """
+    Genera el volumen pedido en la BD ya seleccionada de `conn`.
+    Devuelve filas, segundos y filas/s por tabla.
+    """
+    cfg = dict(DEFAULTS)
+    cfg.update({k: v for k, v in params.items() if v is not None})
+    rng = random.Random(cfg['seed'])
+    anchor = (datetime.strptime(cfg['anchor'], '%Y-%m-%d %H:%M:%S') if cfg['anchor']
+              else datetime.now().replace(hour=0, minute=0, second=0, microsecond=0))
+    history_seconds = int(cfg['history_days']) * 86400
+    prefixes = cfg['prefixes']
+    started = time.perf_counter()
+
+    if cfg['reset']:
+        reset_synthetic(conn, prefixes)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) AS n FROM users WHERE email LIKE %s", ('%' + EMAIL_DOMAIN,))
+        row = cur.fetchone()
+        if (row['n'] if isinstance(row, dict) else row[0]):
+            raise ValueError("Ya hay datos sintéticos; usar reset=true para regenerarlos")
+        if cfg['disable_fk_checks']:
+            # Los ids salen de la BD recién insertada: las FKs son válidas por construcción
+            cur.execute("SET SESSION foreign_key_checks = 0")
+
+    dropped = drop_deferrable_indexes(conn) if cfg['defer_indexes'] else {}
+    loader = _Loader(conn, int(cfg['batch_size']), int(cfg['commit_every']))
+
+    try:
+        # 1. Usuarios (VALUES solo con placeholders: si no, PyMySQL no arma el INSERT multi-fila)
+        def user_rows():
+            for i in range(cfg['users']):
+                created = anchor - timedelta(seconds=rng.randrange(history_seconds))
+                yield (f'u{i}.s{cfg["seed"]}{EMAIL_DOMAIN}', f'Usuario Sintético {i}',
+                       _hash_password(rng, PASSWORD), 'user', _fmt(created))
+        loader.load('users', """
+            INSERT INTO users (email, name, password_hash, role, created_at)
+            VALUES (%s, %s, %s, %s, %s)
+        """, user_rows())
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM users WHERE email LIKE %s ORDER BY id", ('%' + EMAIL_DOMAIN,))
+            user_ids = [r['id'] if isinstance(r, dict) else r[0] for r in cur.fetchall()]
+
+        # 2. Lockers: cada ocupado con un usuario distinto (uq_lockers_current_user)
+        owners = list(user_ids)
+        rng.shuffle(owners)
+
+        def locker_rows():
+            per_prefix = -(-cfg['lockers'] // len(prefixes))
+            for i in range(cfg['lockers']):
+                code = f'{prefixes[i // per_prefix]}-{i % per_prefix + 1}'
+                created = anchor - timedelta(seconds=history_seconds + rng.randrange(86400))
+                roll = rng.random()
+                if roll < cfg['disabled_ratio']:
+                    yield (code, 'disabled', None, None, None, None, None, None, None, _fmt(created))
+                elif roll < cfg['disabled_ratio'] + cfg['occupied_ratio'] and owners:
+                    assigned = anchor - timedelta(seconds=rng.randrange(7 * 86400))
+                    if rng.random() < cfg['expired_ratio']:
+                        expires = anchor - timedelta(seconds=rng.randrange(1, 86400))
+                    else:
+                        expires = anchor + timedelta(days=rng.randint(1, 7))
+                    salt = '%032x' % rng.getrandbits(128)
+                    otp_hash = '%064x' % rng.getrandbits(256)
+                    yield (code, 'occupied', owners.pop(), _fmt(assigned), _fmt(expires), otp_hash, salt,
+                           _fmt(expires), '#%06X' % rng.getrandbits(24), _fmt(created))
+                else:
+                    yield (code, 'available', None, None, None, None, None, None, None, _fmt(created))
+        loader.load('lockers', """
+            INSERT INTO lockers (code, status, current_user_id, assigned_at, expires_at,
+                                 current_otp_hash, otp_salt, otp_valid_until, color_hex, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, locker_rows())
+
+        with conn.cursor() as cur:
+            clauses = ' OR '.join(['code LIKE %s'] * len(prefixes))
+            cur.execute(f"SELECT id, current_user_id FROM lockers WHERE {clauses}",
+                        [f'{p}-%' for p in prefixes])
+            lockers = [(r['id'], r['current_user_id']) if isinstance(r, dict) else (r[0], r[1])
+                       for r in cur.fetchall()]
+        lockers.sort()
+        holders = [pair for pair in lockers if pair[1]]
+
+        # 3. access_logs: la mayoría sobre lockers con dueño, en orden cronológico
+        events, weights = ACCESS_EVENTS, [e[3] for e in ACCESS_EVENTS]
+
+        def access_rows():
+            n = cfg['access_logs']
+            pool = holders or lockers
+            for i in range(n):
+                locker_id, user_id = rng.choice(pool)
+                event_type, status, reason, _ = rng.choices(events, weights)[0]
+                created = anchor - timedelta(seconds=history_seconds * (n - i) // n)
+                ip = f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}'
+                yield (locker_id, user_id, event_type, status, reason, ip,
+                       rng.choice(USER_AGENTS), _fmt(created))
+        loader.load('access_logs', """
+            INSERT INTO access_logs (locker_id, user_id, event_type, status, reason,
+                                     source_ip, user_agent, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, access_rows())
+
+        # 4. locker_requests: casi todas resueltas, algunas pendientes recientes
+        def request_rows():
+            n = cfg['locker_requests']
+            pool = holders or ([(lid, rng.choice(user_ids)) for lid, _ in lockers[:1000]] if user_ids else [])
+            if not pool:
+                return
+            for i in range(n):
+                locker_id, user_id = rng.choice(pool)
+                created = anchor - timedelta(seconds=history_seconds * (n - i) // n)
+                request_type = 'change_time' if rng.random() < 0.7 else 'cancel'
+                requested_until = _fmt(created + timedelta(days=rng.randint(1, 7))) \
+                    if request_type == 'change_time' else None
+                if anchor - created < timedelta(days=2) and rng.random() < 0.5:
+                    status, resolved = 'pending', None
+                else:
+                    status = 'approved' if rng.random() < 0.8 else 'rejected'
+                    resolved = _fmt(created + timedelta(seconds=rng.randrange(1, 86400)))
+                yield (locker_id, user_id, request_type, status, requested_until, _fmt(created), resolved)
+        loader.load('locker_requests', """
+            INSERT INTO locker_requests (locker_id, user_id, request_type, status,
+                                         requested_until, created_at, resolved_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, request_rows())
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SET SESSION foreign_key_checks = 1")
+
+    if dropped:
+        t0 = time.perf_counter()
+        create_deferred_indexes(conn, dropped)
+        loader.report['deferred_indexes'] = {'indexes': dropped, 'seconds': round(time.perf_counter() - t0, 3)}
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(r['rows'] for k, r in loader.report.items() if 'rows' in r)
+    return {
+        'seed': cfg['seed'],
+        'anchor': _fmt(anchor),
+        'tables': loader.report,
+        'total_rows': total_rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(total_rows / elapsed) if elapsed else total_rows,
+    }
+
+if __name__ == '__main__':
+    # Corrida local contra MySQL: python lambdas/seeder/synthetic.py --users 50000 ...
+    import json
+    import argparse
+    import pymysql
+
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for key, value in DEFAULTS.items():
+        if isinstance(value, bool):
+            parser.add_argument(f'--{key.replace("_", "-")}', action='store_true', default=None)
+        elif isinstance(value, list):
+            parser.add_argument(f'--{key.replace("_", "-")}', type=lambda s: s.split(','))
+        else:
+            parser.add_argument(f'--{key.replace("_", "-")}', type=type(value) if value is not None else str)
+    args = parser.parse_args()
+
+    conn = pymysql.connect(host=os.environ['RDS_HOST'], user=os.environ['RDS_USER'],
+                           passwd=os.environ['RDS_PASSWORD'], db=os.environ['RDS_DB_NAME'],
+                           cursorclass=pymysql.cursors.DictCursor)
+    try:
+        print(json.dumps(generate(conn, **vars(args)), indent=2))
+    finally:
+        conn.close()
@@ -0,0 +1,77 @@
+import os
+import time
+import logging
+import db_utils # Helper compartido
+import queries
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Lockers liberados por transacción: chunks chicos = locks cortos
+SWEEP_CHUNK_SIZE = int(os.environ.get('SWEEP_CHUNK_SIZE', '500'))
+# Tope del chunk_size que llega en el evento (invocación manual)
+SWEEP_MAX_CHUNK_SIZE = int(os.environ.get('SWEEP_MAX_CHUNK_SIZE', '5000'))
+# Margen para no agotar el timeout del Lambda a mitad de un chunk
+SWEEP_MIN_REMAINING_MS = int(os.environ.get('SWEEP_MIN_REMAINING_MS', '5000'))
+
+@db_utils.instrumented_handler('sweeper')
+def lambda_handler(event, context):
+    """
+    Barrido programado (EventBridge/CloudWatch) de lockers expirados.
+    Libera en chunks usando el índice (status, expires_at) y registra un
+    'owner_removed' en access_logs por cada locker liberado.
+    """
+    try:
+        chunk_size = min(max(int((event or {}).get('chunk_size', SWEEP_CHUNK_SIZE)), 1), SWEEP_MAX_CHUNK_SIZE)
+    except (ValueError, TypeError):
+        return db_utils.format_response(400, {'message': 'chunk_size inválido'})
+    try:
+        result = sweep_expired_lockers(chunk_size, context)
+        logger.info(f"Barrido terminado: {result}")
+        return db_utils.format_response(200, result)
+    except Exception as e:
+        logger.error(f"Error en barrido de expirados: {str(e)}")
+        return db_utils.format_response(500, {'error': str(e)})
+
+def has_time_left(context):
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return True
+    return context.get_remaining_time_in_millis() > SWEEP_MIN_REMAINING_MS
+
+def sweep_expired_lockers(chunk_size, context=None):
+    started = time.perf_counter()
+    swept = 0
+    chunks = 0
+    conn = db_utils.get_db_connection()
+    try:
+        while has_time_left(context):
+            with conn.cursor() as cur:
+                # 1. Bloquear un chunk de expirados (rango sobre idx_lockers_status_expires)
+                cur.execute(queries.EXPIRED_LOCKERS_FOR_UPDATE, (chunk_size,))
+                expired = cur.fetchall()
+                if not expired:
+                    conn.commit()
+                    break
+
+                # 2. Liberar con las mismas columnas que request_cancel / force-release
+                ids = [row['id'] for row in expired]
+                cur.execute(queries.release_lockers_by_ids(len(ids)), ids)
+                db_utils.bump_availability_version(cur, ids)
+
+                # 3. Un log 'owner_removed' por locker, en un solo executemany
+                cur.executemany(queries.INSERT_SWEPT_ACCESS_LOG,
+                                [(row['id'], row['current_user_id']) for row in expired])
+                conn.commit()
+
+            swept += len(expired)
+            chunks += 1
+            if len(expired) < chunk_size:
+                break
+    finally:
+        db_utils.release_db_connection(conn)
+
+    return {
+        'swept': swept,
+        'chunks': chunks,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
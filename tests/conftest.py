@@ -0,0 +1,96 @@
+"""
+Fixtures compartidas por los tests unitarios.
+Igual que benchmarks/_lambdas.py: lambdas/common en el path y cada
+lambda_function.py cargado como módulo propio. Sin MySQL ni AWS: las
+conexiones se reemplazan por FakeConnection.
+"""
+import os
+import sys
+import importlib.util
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDAS_DIR = os.path.join(REPO_ROOT, 'lambdas')
+COMMON_DIR = os.path.join(LAMBDAS_DIR, 'common')
+
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+os.environ.setdefault('AUTH_TOKEN_SECRET', 'test-secret')
+os.environ.setdefault('METRICS_ENABLED', '0')
+
+_loaded = {}
+
+def load_lambda(name, module='lambda_function'):
+    """
+    Importa lambdas/<name>/<module>.py una sola vez: lambda_function como
+    '<name>_lambda', cualquier otro como '<name>_<module>'.
+    """
+    key = (name, module)
+    if key not in _loaded:
+        path = os.path.join(LAMBDAS_DIR, name, f'{module}.py')
+        alias = f'{name}_lambda' if module == 'lambda_function' else f'{name}_{module}'
+        spec = importlib.util.spec_from_file_location(alias, path)
+        loaded = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(loaded)
+        _loaded[key] = loaded
+    return _loaded[key]
+
+class FakeCursor:
+    """Cursor que delega cada execute en handler(sql, args) -> filas."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=()):
+        sql = ' '.join(sql.split())
+        self.conn.executed.append((sql, tuple(args or ())))
+        self.rows = list(self.conn.handler(sql, tuple(args or ())) or [])
+        self.rowcount = len(self.rows)
+
+    def executemany(self, sql, rows):
+        for row in rows:
+            self.execute(sql, row)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+class FakeConnection:
+    def __init__(self, handler):
+        self.handler = handler
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """fake_db(handler) instala una FakeConnection en db_utils y la devuelve."""
+    import db_utils
+
+    def install(handler):
+        conn = FakeConnection(handler)
+        monkeypatch.setattr(db_utils, 'get_db_connection', lambda *args, **kwargs: conn)
+        monkeypatch.setattr(db_utils, 'release_db_connection', lambda c: None)
+        return conn
+    return install
@@ -0,0 +1,149 @@
+import pytest
+
+from conftest import load_lambda
+
+admin = load_lambda('admin')
+
+LOCKERS = {i: {'id': i, 'code': f'A-{i:03d}', 'status': 'occupied', 'current_user_id': 100 + i}
+           for i in range(1, 7)}
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(admin, 'ADMIN_BULK_CHUNK_SIZE', 2)
+    monkeypatch.setattr(admin, 'ADMIN_BULK_MAX_ITEMS', 100)
+    monkeypatch.setattr(admin, 'has_time_left', lambda context: True)
+
+def lockers_db(fail_on=None):
+    """SELECT de lockers por ids o por prefijo; el UPDATE que toca fail_on falla."""
+    def handler(sql, args):
+        if sql.startswith('SELECT') and 'IN (' in sql:
+            return [dict(LOCKERS[i]) for i in args if i in LOCKERS]
+        if sql.startswith('SELECT'):
+            after, limit = args[-2], args[-1]
+            matches = [l for l in LOCKERS.values() if l['code'] > after]
+            return [dict(l) for l in sorted(matches, key=lambda l: l['code'])[:limit]]
+        if sql.startswith('UPDATE') and fail_on is not None and fail_on in args:
+            raise RuntimeError('(1213, Deadlock found)')
+        return []
+    return handler
+
+def release(cur, rows, requested):
+    cur.execute(f"UPDATE lockers SET status = 'available' WHERE id IN ({', '.join(['%s'] * len(rows))})",
+                [row['id'] for row in rows])
+    return [{'id': row['id'], 'result': 'released'} for row in rows]
+
+def filter_selection(after=''):
+    return admin.BulkSelection(page_sql="SELECT id, code FROM lockers WHERE code > %s LIMIT %s",
+                               key='code', after=after)
+
+def ids_selection(ids):
+    return admin.BulkSelection(ids=ids, by_ids=lambda n: f"SELECT id FROM lockers WHERE id IN ({', '.join(['%s'] * n)})")
+
+def test_ids_mode_reports_failed_chunk_and_continues(fake_db):
+    conn = fake_db(lockers_db(fail_on=3))
+    result = admin.run_bulk(ids_selection([1, 2, 3, 4, 5]), release, None)
+
+    assert [(item['id'], item['result']) for item in result['items']] == [
+        (1, 'released'), (2, 'released'), (3, 'error'), (4, 'error'), (5, 'released')]
+    assert result['summary'] == {'released': 3, 'error': 2}
+    assert 'unprocessed_ids' not in result
+    assert conn.rollbacks == 1
+
+def test_filter_mode_reports_failed_chunk_and_rewinds_cursor(fake_db):
+    fake_db(lockers_db(fail_on=3))
+    result = admin.run_bulk(filter_selection(), release, None)
+
+    assert [(item['id'], item['result']) for item in result['items']] == [
+        (1, 'released'), (2, 'released'), (3, 'error'), (4, 'error')]
+    assert result['error'] == '(1213, Deadlock found)'
+    # El cursor apunta antes del chunk revertido: reintentar lo vuelve a tomar
+    assert admin.decode_cursor(result['next_cursor']) == 'A-002'
+
+def test_filter_mode_first_chunk_failure_is_not_lost(fake_db):
+    fake_db(lockers_db(fail_on=1))
+    result = admin.run_bulk(filter_selection(), release, None)
+
+    assert result['summary'] == {'error': 2}
+    assert result['error']
+    assert admin.decode_cursor(result['next_cursor']) == ''
+
+def test_select_failure_stops_with_error(fake_db):
+    def handler(sql, args):
+        raise RuntimeError('(1205, Lock wait timeout exceeded)')
+    fake_db(handler)
+    result = admin.run_bulk(ids_selection([1, 2, 3]), release, None)
+
+    assert [item['id'] for item in result['items']] == [1, 2]
+    assert result['error'].startswith('(1205')
+    assert result['unprocessed_ids'] == [3]
+
+def test_filter_mode_without_failures_reaches_the_end(fake_db):
+    fake_db(lockers_db())
+    result = admin.run_bulk(filter_selection(), release, None)
+
+    assert result['summary'] == {'released': 6}
+    assert 'next_cursor' not in result and 'error' not in result
+
+def test_change_time_without_items_is_409(fake_db, monkeypatch):
+    fake_db(lockers_db())
+    monkeypatch.setattr(admin, 'has_time_left', lambda context: False)
+    event = {'body': '{"days": 1}'}
+    response = admin.change_locker_time(event, '/admin/lockers/3/time', None)
+
+    assert response['statusCode'] == 409
+
+def test_selection_by_ids_walks_chunks_in_order(fake_db):
+    conn = fake_db(lockers_db())
+    selection = ids_selection([1, 2, 3, 9, 5])
+    cur = conn.cursor()
+
+    chunks = []
+    while (chunk := selection.next_chunk(cur)) is not None:
+        rows, requested = chunk
+        chunks.append((requested, [row['id'] for row in rows]))
+
+    # El 9 no existe: se pide pero no vuelve fila (el llamador lo informa como not_found)
+    assert chunks == [([1, 2], [1, 2]), ([3, 9], [3]), ([5], [5])]
+    assert selection.continuation() == {}
+
+def test_selection_by_filter_respects_request_cap(fake_db, monkeypatch):
+    monkeypatch.setattr(admin, 'ADMIN_BULK_MAX_ITEMS', 3)
+    conn = fake_db(lockers_db())
+    selection = filter_selection()
+    cur = conn.cursor()
+
+    first, _ = selection.next_chunk(cur)
+    second, requested = selection.next_chunk(cur)
+
+    assert [row['code'] for row in first + second] == ['A-001', 'A-002', 'A-003']
+    assert requested == [3]
+    assert selection.next_chunk(cur) is None
+    assert admin.decode_cursor(selection.continuation()['next_cursor']) == 'A-003'
+
+def test_selection_rewind_returns_the_chunk_to_the_filter(fake_db):
+    conn = fake_db(lockers_db())
+    selection = filter_selection(after='A-002')
+    cur = conn.cursor()
+
+    rows, _ = selection.next_chunk(cur)
+    selection.rewind()
+    again, _ = selection.next_chunk(cur)
+
+    assert [row['code'] for row in again] == [row['code'] for row in rows] == ['A-003', 'A-004']
+    assert selection.taken == 2
+
+def test_selection_rewind_is_a_no_op_for_ids(fake_db):
+    conn = fake_db(lockers_db())
+    selection = ids_selection([1, 2, 3])
+    selection.next_chunk(conn.cursor())
+    selection.rewind()
+
+    assert selection.continuation() == {'unprocessed_ids': [3]}
+
+@pytest.mark.parametrize('value', [[], '1,2', [1, 'x'], [True], [-1]])
+def test_parse_bulk_ids_rejects_invalid_input(value):
+    with pytest.raises(ValueError):
+        admin.parse_bulk_ids(value)
+
+def test_parse_bulk_ids_dedupes_in_order():
+    assert admin.parse_bulk_ids([3, '1', 3, 2]) == [3, 1, 2]
@@ -0,0 +1,52 @@
+import auth_tokens
+from conftest import load_lambda
+
+admin = load_lambda('admin')
+
+ROWS = [{'id': 1, 'code': 'A-001', 'status': 'occupied', 'expires_at': None, 'color_hex': None,
+         'user_name': 'Ana', 'user_email': 'ana@example.com'}]
+
+def listing_db(rows, checksum):
+    def handler(sql, args):
+        if 'BIT_XOR' in sql:
+            return [{'n': len(rows), 'checksum': checksum[0]}]
+        return [dict(row) for row in rows]
+    return handler
+
+def get(etag=None):
+    token = auth_tokens.issue_token(1, 'admin', 'Admin', 'admin@example.com')
+    headers = {'Authorization': f'Bearer {token}'}
+    if etag:
+        headers['If-None-Match'] = etag
+    return admin.lambda_handler({'httpMethod': 'GET', 'path': '/admin/lockers', 'headers': headers}, None)
+
+def test_not_modified_skips_the_page_query(fake_db):
+    checksum = [123]
+    conn = fake_db(listing_db(ROWS, checksum))
+    first = get()
+    assert first['statusCode'] == 200
+    conn.executed.clear()
+
+    second = get(first['headers']['ETag'])
+
+    assert second['statusCode'] == 304 and second['body'] == ''
+    assert len(conn.executed) == 1 and 'BIT_XOR' in conn.executed[0][0]
+
+def test_changed_checksum_returns_the_page(fake_db):
+    checksum = [123]
+    fake_db(listing_db(ROWS, checksum))
+    etag = get()['headers']['ETag']
+    checksum[0] = 456  # p. ej. cambió el nombre del usuario en el mismo segundo
+
+    response = get(etag)
+
+    assert response['statusCode'] == 200
+    assert response['headers']['ETag'] != etag
+
+def test_checksum_runs_before_the_page(fake_db):
+    conn = fake_db(listing_db(ROWS, [1]))
+    get()
+
+    assert 'BIT_XOR' in conn.executed[0][0]
+    # Misma página: mismos parámetros (incluido el LIMIT + 1)
+    assert conn.executed[0][1] == conn.executed[1][1]
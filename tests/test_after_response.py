@@ -0,0 +1,66 @@
+import queue
+import threading
+
+from after_response import AfterResponse
+
+class FakeExtensionsApi(AfterResponse):
+    """Extensions API en memoria: register devuelve un id y event/next lee de una cola."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, runtime_api='127.0.0.1:9001', **kwargs)
+        self.events = queue.Queue()
+        self.calls = []
+
+    def _call(self, method, path, body=None, headers=None):
+        self.calls.append((method, path, headers))
+        if path == 'register':
+            return {'Lambda-Extension-Identifier': 'ext-1'}, {}
+        event = self.events.get(timeout=5)
+        if isinstance(event, Exception):
+            raise event
+        return {}, event
+
+def test_without_runtime_api_callbacks_run_inline():
+    ran = []
+    hook = AfterResponse('test', runtime_api='')
+    hook.add(lambda: ran.append('flush'))
+
+    assert hook.start() is False
+    hook.done()
+    assert ran == ['flush'] and hook.stats['inline'] == 1
+
+def test_extension_runs_callbacks_only_after_done():
+    flushed = threading.Event()
+    hook = FakeExtensionsApi('test')
+    hook.add(flushed.set)
+
+    assert hook.start() is True
+    assert hook.calls[0] == ('POST', 'register', {'Lambda-Extension-Name': 'test'})
+    hook.events.put({'eventType': 'INVOKE', 'deadlineMs': None})
+
+    # La invocación sigue en curso: nada se escribe hasta el done() del handler
+    assert not flushed.wait(0.1)
+    hook.done()
+    assert flushed.wait(2)
+    assert hook.stats['invocations'] == 1 and hook.stats['inline'] == 0
+
+def test_callback_errors_do_not_stop_the_rest():
+    ran = []
+    hook = AfterResponse('test', runtime_api='')
+    hook.add(lambda: 1 / 0)
+    hook.add(lambda: ran.append('flush'))
+
+    hook.done()
+    assert ran == ['flush'] and hook.stats['errors'] == 1
+
+def test_extension_failure_falls_back_to_inline():
+    ran = []
+    hook = FakeExtensionsApi('test')
+    hook.add(lambda: ran.append('flush'))
+    hook.start()
+    hook.events.put(ConnectionError('runtime api caída'))
+    hook._thread.join(2)
+
+    assert hook.active is False
+    hook.done()
+    assert ran == ['flush']
@@ -0,0 +1,153 @@
+from audit_sink import AuditSink, audit_window_key
+
+class StubTable:
+    """batch_writer de DynamoDB en memoria; falla los primeros `failures` lotes."""
+
+    def __init__(self, failures=0, update_failures=0):
+        self.failures = failures
+        self.update_failures = update_failures
+        self.items = []
+        self.batches = 0
+        self.counters = {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues):
+        if self.update_failures:
+            self.update_failures -= 1
+            raise RuntimeError('ConditionalCheckFailed')
+        assert UpdateExpression.startswith('ADD #ct :n')
+        item = self.counters.setdefault((Key['locker_id'], Key['timestamp']), {'count': 0})
+        item['count'] += ExpressionAttributeValues[':n']
+        for alias, name in ExpressionAttributeNames.items():
+            if alias != '#ct':
+                item[name] = ExpressionAttributeValues[':' + alias[1:]]
+
+    def batch_writer(self, **kwargs):
+        assert not kwargs, 'las llaves son únicas: sin overwrite_by_pkeys'
+        table = self
+
+        class Writer:
+            def __enter__(self):
+                self.pending = []
+                return self
+
+            def __exit__(self, exc_type, exc, tb):
+                if exc_type:
+                    return False
+                table.batches += 1
+                if table.failures:
+                    table.failures -= 1
+                    raise RuntimeError('ProvisionedThroughputExceededException')
+                table.items.extend(self.pending)
+                return False
+
+            def put_item(self, Item):
+                self.pending.append(Item)
+        return Writer()
+
+def make_sink(table, **kwargs):
+    sink = AuditSink('SmartLocker_AuditLogs', **kwargs)
+    sink._table = table
+    return sink
+
+def items(n, start=0):
+    return [{'locker_id': '1', 'timestamp': f'2026-10-18T12:00:00.{i:06d}#x', 'status': 'FAILED'}
+            for i in range(start, start + n)]
+
+def test_flush_writes_everything_in_one_batch():
+    table = StubTable()
+    sink = make_sink(table)
+    sink.record_many(items(30))
+    sink.record(items(1, start=30)[0])
+
+    assert sink.flush() == 31
+    assert len(table.items) == 31 and table.batches == 1
+    assert sink.pending() == 0
+    assert sink.stats['written'] == 31
+
+def test_failed_batch_is_requeued_in_order_and_retried():
+    table = StubTable(failures=1)
+    sink = make_sink(table)
+    sink.record_many(items(3))
+
+    assert sink.flush() == 0
+    assert sink.pending() == 3 and sink.stats['retried'] == 3
+    sink.record(items(1, start=3)[0])
+
+    assert sink.flush() == 4
+    assert [item['timestamp'] for item in table.items] == [item['timestamp'] for item in items(4)]
+
+def test_items_are_dropped_after_max_retries():
+    table = StubTable(failures=10)
+    sink = make_sink(table, max_retries=2)
+    sink.record_many(items(5))
+
+    sink.flush()
+    sink.flush()
+
+    assert sink.pending() == 0
+    assert sink.stats['dropped'] == 5
+    assert table.items == []
+
+def test_buffer_bound_drops_oldest():
+    sink = make_sink(StubTable(), max_buffer=3)
+    sink.record_many(items(5))
+
+    assert sink.pending() == 3
+    assert sink.stats['dropped'] == 2
+    sink.flush()
+    assert [item['timestamp'][-8:] for item in sink._table.items] == ['000002#x', '000003#x', '000004#x']
+
+def test_requeued_retries_respect_buffer_bound():
+    table = StubTable(failures=1)
+    sink = make_sink(table, max_buffer=4)
+    sink.record_many(items(3))
+    sink.flush()
+    sink.record_many(items(3, start=3))
+
+    assert sink.pending() == 4
+    assert sink.stats['dropped'] == 2
+    assert sink.stats['recorded'] == 6
+
+def test_record_does_no_io():
+    table = StubTable()
+    sink = make_sink(table)
+    sink.record_many(items(2))
+
+    assert table.batches == 0
+
+def test_window_key_is_shared_within_the_window():
+    assert audit_window_key(10, 'throttled', now=1_000_003) == audit_window_key(10, 'throttled', now=1_000_009.9)
+    assert audit_window_key(10, 'throttled', now=1_000_003) != audit_window_key(10, 'throttled', now=1_000_010)
+    assert audit_window_key(10, 'throttled', now=1_000_003).endswith('.000000#throttled')
+
+def test_counts_aggregate_across_flushes_and_sinks():
+    table = StubTable()
+    # Dos contenedores, varias invocaciones cada uno, misma ventana
+    first, second = make_sink(table), make_sink(table)
+    for sink, attempts in ((first, 3), (second, 2), (first, 4)):
+        for _ in range(attempts):
+            sink.record_count('7', '2026-10-18T12:00:10.000000#throttled', status='THROTTLED')
+        sink.flush()
+
+    assert table.counters == {('7', '2026-10-18T12:00:10.000000#throttled'): {'count': 9, 'status': 'THROTTLED'}}
+    assert first.stats['counter_updates'] == 2 and second.stats['counter_updates'] == 1
+    assert table.items == []
+
+def test_failed_counter_is_merged_and_retried():
+    table = StubTable(update_failures=1)
+    sink = make_sink(table)
+    sink.record_count('7', 'w#throttled', 2)
+    sink.flush()
+    sink.record_count('7', 'w#throttled', 1)
+    sink.flush()
+
+    assert table.counters[('7', 'w#throttled')]['count'] == 3
+    assert sink.stats['retried'] == 1 and sink.pending() == 0
+
+def test_counter_is_dropped_after_max_retries():
+    sink = make_sink(StubTable(update_failures=5), max_retries=2)
+    sink.record_count('7', 'w#throttled', 2)
+    sink.flush()
+    sink.flush()
+
+    assert sink.pending() == 0 and sink.stats['dropped'] == 1
@@ -0,0 +1,128 @@
+import json
+import base64
+
+import pytest
+
+import auth_tokens
+from conftest import load_lambda
+
+def claimed_event(token=None):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    return {'headers': headers}
+
+def test_issued_token_round_trips_its_claims():
+    token = auth_tokens.issue_token(7, 'admin', name='Ana', email='ana@example.com')
+
+    claims = auth_tokens.verify_token(token)
+
+    assert (claims['sub'], claims['role'], claims['name'], claims['email']) == ('7', 'admin', 'Ana', 'ana@example.com')
+    assert claims['exp'] - claims['iat'] == auth_tokens.TOKEN_TTL_SECONDS
+
+def test_token_expires_even_after_being_cached(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(auth_tokens.time, 'time', lambda: now[0])
+    token = auth_tokens.issue_token(8, 'user', ttl_seconds=60)
+
+    assert auth_tokens.verify_token(token)['sub'] == '8'
+    now[0] += 59
+    assert auth_tokens.verify_token(token)['sub'] == '8'
+    now[0] += 1
+    with pytest.raises(auth_tokens.InvalidToken, match='expirado'):
+        auth_tokens.verify_token(token)
+
+def _b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).rstrip(b'=').decode('ascii')
+
+@pytest.mark.parametrize('tamper, message', [
+    (lambda h, p, s: f"{h}.{_b64({'sub': '1', 'role': 'admin', 'exp': 2**40})}.{s}", 'Firma inválida'),
+    (lambda h, p, s: f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{p}.", 'Algoritmo no soportado'),
+    (lambda h, p, s: f"{h}.{p}", 'Formato de token inválido'),
+    (lambda h, p, s: f"{h}.{p}.{s[:-2]}", 'Firma inválida'),
+])
+def test_tampered_tokens_are_rejected(tamper, message):
+    header, payload, signature = auth_tokens.issue_token(9, 'user').split('.')
+
+    with pytest.raises(auth_tokens.InvalidToken, match=message):
+        auth_tokens.verify_token(tamper(header, payload, signature))
+
+def test_token_signed_with_another_secret_is_rejected(monkeypatch):
+    monkeypatch.setenv('AUTH_TOKEN_SECRET', 'another-secret')
+    foreign = auth_tokens.issue_token(10, 'admin')
+    monkeypatch.undo()
+
+    with pytest.raises(auth_tokens.InvalidToken, match='Firma inválida'):
+        auth_tokens.verify_token(foreign)
+
+def test_bearer_token_header_is_case_insensitive():
+    assert auth_tokens.bearer_token({'headers': {'authorization': 'Bearer abc '}}) == 'abc'
+    assert auth_tokens.bearer_token({'headers': {'Authorization': 'Basic abc'}}) is None
+    assert auth_tokens.bearer_token({'headers': None}) is None
+
+def test_user_routes_require_a_token_by_default():
+    assert auth_tokens.AUTH_REQUIRED is True
+    user_id, error = auth_tokens.resolve_user_id(claimed_event(), claimed_user_id=7)
+
+    assert user_id is None
+    assert error['statusCode'] == 401
+
+def test_raw_user_id_only_with_explicit_opt_out(monkeypatch):
+    monkeypatch.setattr(auth_tokens, 'AUTH_REQUIRED', False)
+
+    assert auth_tokens.resolve_user_id(claimed_event(), claimed_user_id=7) == (7, None)
+
+def test_token_wins_and_mismatched_user_id_is_forbidden():
+    token = auth_tokens.issue_token(7, 'user')
+
+    assert auth_tokens.resolve_user_id(claimed_event(token)) == ('7', None)
+    _, error = auth_tokens.resolve_user_id(claimed_event(token), claimed_user_id=8)
+    assert error['statusCode'] == 403
+
+@pytest.mark.parametrize('role, status', [('user', 403), ('admin', None)])
+def test_require_admin(role, status):
+    error = auth_tokens.require_admin(claimed_event(auth_tokens.issue_token(1, role)))
+
+    assert (error['statusCode'] if error else None) == status
+
+def test_require_admin_without_token_even_when_auth_is_optional(monkeypatch):
+    monkeypatch.setattr(auth_tokens, 'AUTH_REQUIRED', False)
+    error = auth_tokens.require_admin(claimed_event())
+
+    assert error['statusCode'] == 401
+    assert 'token' in json.loads(error['body'])['message'].lower()
+
+def test_missing_secret_is_a_configuration_error(monkeypatch):
+    token = auth_tokens.issue_token(70, 'user')  # Nunca verificado: no está en la caché
+    monkeypatch.delenv('AUTH_TOKEN_SECRET')
+    monkeypatch.setattr(auth_tokens, 'AUTH_TOKEN_SECRET_ID', '')
+
+    assert auth_tokens.token_secret_configured() is False
+    with pytest.raises(auth_tokens.TokenConfigError):
+        auth_tokens.issue_token(7, 'user')
+    _, error = auth_tokens.resolve_user_id(claimed_event(token))
+    assert error['statusCode'] == 500
+    assert 'AUTH_TOKEN_SECRET' in json.loads(error['body'])['message']
+
+def test_secret_loaded_from_secret_id(monkeypatch, tmp_path):
+    secret_file = tmp_path / 'token-secret.json'
+    secret_file.write_text(json.dumps({'secret': 'from-secrets-manager'}))
+    env_token = auth_tokens.issue_token(7, 'user')
+    monkeypatch.delenv('AUTH_TOKEN_SECRET')
+    monkeypatch.setattr(auth_tokens, 'AUTH_TOKEN_SECRET_ID', f'file://{secret_file}')
+
+    token = auth_tokens.issue_token(7, 'user')
+
+    assert auth_tokens.verify_token(token)['sub'] == '7'
+    with pytest.raises(auth_tokens.InvalidToken):
+        auth_tokens.verify_token(env_token)
+
+def test_login_without_secret_returns_configuration_error(monkeypatch, fake_db):
+    auth = load_lambda('auth')
+    monkeypatch.delenv('AUTH_TOKEN_SECRET')
+    monkeypatch.setattr(auth_tokens, 'AUTH_TOKEN_SECRET_ID', '')
+    conn = fake_db(lambda sql, args: [])
+
+    response = auth.login({'body': json.dumps({'email': 'a@b.c', 'password': 'x'})})
+
+    assert response['statusCode'] == 500
+    assert 'AUTH_TOKEN_SECRET' in json.loads(response['body'])['message']
+    assert conn.executed == []
@@ -0,0 +1,74 @@
+import json
+
+import pymysql
+import pytest
+
+import auth_tokens
+import queries
+from conftest import load_lambda
+
+lockers = load_lambda('lockers')
+
+def assign_event(user_id=7, locker_id=3):
+    token = auth_tokens.issue_token(user_id, 'user')
+    return {'headers': {'Authorization': f'Bearer {token}'},
+            'body': json.dumps({'locker_id': locker_id, 'days': 2})}
+
+def assign_db(updated=True, user_has_locker=False, locker_exists=True, duplicate=False):
+    """ASSIGN_LOCKER afecta 1 fila si updated; las consultas del motivo según el caso."""
+    def handler(sql, args):
+        if sql == ' '.join(queries.ASSIGN_LOCKER.split()):
+            if duplicate:
+                raise pymysql.err.IntegrityError(1062, "Duplicate entry for key 'current_user_id'")
+            return [{}] if updated else []
+        if sql == queries.LOCKER_ID_BY_USER:
+            return [{'id': 9}] if user_has_locker else []
+        if sql == queries.LOCKER_STATUS_BY_ID:
+            return [{'status': 'occupied'}] if locker_exists else []
+        return []
+    return handler
+
+def status_and_message(response):
+    return response['statusCode'], json.loads(response['body']).get('message')
+
+def test_assigned_in_a_single_update(fake_db):
+    conn = fake_db(assign_db())
+
+    response = lockers.assign_locker(assign_event())
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['initial_otp']
+    # Un UPDATE de asignación más el bump del feed; sin SELECT previos
+    assert not any(sql.startswith('SELECT') for sql, _ in conn.executed)
+    assert conn.executed[0][1][:2] == ('7', '7')
+    assert conn.executed[0][1][-1] == 3
+    assert conn.commits == 1
+
+@pytest.mark.parametrize('case, expected', [
+    ({'user_has_locker': True}, (409, 'El usuario ya tiene un locker asignado')),
+    ({'locker_exists': False}, (404, 'Locker no encontrado')),
+    ({}, (409, 'Locker no disponible (ya ocupado)')),
+])
+def test_reason_is_looked_up_only_when_nothing_was_updated(fake_db, case, expected):
+    conn = fake_db(assign_db(updated=False, **case))
+
+    assert status_and_message(lockers.assign_locker(assign_event())) == expected
+    assert conn.rollbacks == 1
+    assert conn.commits == 0
+
+def test_concurrent_assignment_of_the_same_user_is_a_conflict(fake_db):
+    conn = fake_db(assign_db(duplicate=True))
+
+    response = lockers.assign_locker(assign_event())
+
+    assert status_and_message(response) == (409, 'El usuario ya tiene un locker asignado')
+    assert len(conn.executed) == 1
+    assert conn.rollbacks == 1
+
+def test_missing_locker_id_never_touches_the_database(fake_db):
+    conn = fake_db(assign_db())
+    event = assign_event()
+    event['body'] = json.dumps({'days': 1})
+
+    assert lockers.assign_locker(event)['statusCode'] == 400
+    assert conn.executed == []
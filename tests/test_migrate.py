@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import load_lambda
+
+migrate = load_lambda('seeder', 'migrate')
+
+def test_splits_on_semicolons_and_drops_empty_statements():
+    sql = "CREATE TABLE a (id INT);\n\n  ;INSERT INTO a VALUES (1);\nSELECT 1"
+
+    assert migrate.split_statements(sql) == [
+        'CREATE TABLE a (id INT)', 'INSERT INTO a VALUES (1)', 'SELECT 1']
+
+@pytest.mark.parametrize('literal', [
+    "'a;b'",
+    '"a;b"',
+    "'it''s; fine'",
+    r"'escaped \' ; quote'",
+    '`weird;column`',
+])
+def test_semicolons_inside_quotes_do_not_split(literal):
+    sql = f"INSERT INTO t VALUES ({literal}); SELECT 2"
+
+    assert migrate.split_statements(sql) == [f"INSERT INTO t VALUES ({literal})", 'SELECT 2']
+
+def test_comments_are_dropped_with_their_semicolons():
+    sql = (
+        "-- comentario; con punto y coma\n"
+        "SELECT 1; # otro; comentario\n"
+        "SELECT /* en medio; */ 2;\n"
+        "SELECT 3--4\n"
+    )
+
+    assert migrate.split_statements(sql) == ['SELECT 1', 'SELECT   2', 'SELECT 3--4']
+
+def test_comment_markers_inside_strings_are_kept():
+    sql = "INSERT INTO t VALUES ('-- no', '# no', '/* no */');"
+
+    assert migrate.split_statements(sql) == ["INSERT INTO t VALUES ('-- no', '# no', '/* no */')"]
+
+@pytest.mark.parametrize('sql', ["SELECT 'sin cerrar; SELECT 1", 'SELECT 1 /* sin cerrar'])
+def test_unterminated_strings_and_comments_fail(sql):
+    with pytest.raises(migrate.MigrationError):
+        migrate.split_statements(sql)
@@ -0,0 +1,45 @@
+import pytest
+
+from rate_limiter import FailureLimiter, MemoryBucketStore
+
+def test_failures_drain_the_bucket_then_block():
+    limiter = FailureLimiter(capacity=3, window_seconds=30)
+
+    for _ in range(3):
+        assert limiter.allow('locker:1', now=0)
+        limiter.record_failure('locker:1', now=0)
+
+    assert not limiter.allow('locker:1', now=0)
+    assert limiter.allow('locker:2', now=0)
+
+def test_tokens_refill_at_capacity_per_window():
+    limiter = FailureLimiter(capacity=3, window_seconds=30)  # 1 token cada 10 s
+    for _ in range(3):
+        limiter.record_failure('locker:1', now=0)
+
+    assert limiter.retry_after('locker:1', now=4) == pytest.approx(6)
+    assert not limiter.allow('locker:1', now=9.9)
+    assert limiter.allow('locker:1', now=10)
+    limiter.record_failure('locker:1', now=10)
+    assert not limiter.allow('locker:1', now=10)
+
+def test_refill_is_capped_at_capacity():
+    limiter = FailureLimiter(capacity=2, window_seconds=10)
+    limiter.record_failure('locker:1', now=0)
+
+    # Una hora sin fallos no acumula más de capacity tokens
+    limiter.record_failure('locker:1', now=3600)
+    limiter.record_failure('locker:1', now=3600)
+
+    assert not limiter.allow('locker:1', now=3600)
+
+def test_memory_store_evicts_least_recently_used_keys():
+    store = MemoryBucketStore(max_keys=2)
+    store.save('a', (1.0, 0))
+    store.save('b', (1.0, 0))
+    store.load('a')
+    store.save('c', (1.0, 0))
+
+    assert store.load('b') is None
+    assert store.load('a') == (1.0, 0)
+    assert store.load('c') == (1.0, 0)
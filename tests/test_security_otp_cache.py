@@ -0,0 +1,67 @@
+import hashlib
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import load_lambda
+
+security = load_lambda('security')
+
+def legacy_row(otp, salt='s'):
+    return {
+        'id': 1, 'status': 'occupied', 'otp_secret': None, 'otp_salt': salt,
+        'current_otp_hash': hashlib.sha256((otp + salt).encode('utf-8')).hexdigest(),
+        'otp_valid_until': datetime.now() + timedelta(minutes=10),
+        'expires_at': datetime.now() + timedelta(days=1), 'updated_at': datetime.now(),
+    }
+
+@pytest.fixture
+def db(monkeypatch):
+    """Fila actual del locker 1 y conteo de lecturas a MySQL."""
+    state = {'row': legacy_row('111111'), 'reads': 0}
+
+    def fetch(locker_id):
+        state['reads'] += 1
+        return dict(state['row'])
+    monkeypatch.setattr(security, 'fetch_locker_state', fetch)
+    monkeypatch.setattr(security, 'locker_cache', security.LockerStateCache(16, 60))
+    return state
+
+def test_rejections_within_ttl_do_not_query(db):
+    verdicts = [security.read_locker_state(1, f'{i:06d}')[0] for i in range(10)]
+
+    assert verdicts == [401] * 10
+    assert db['reads'] == 1
+    assert security.locker_cache.stats['cached_rejections'] == 9
+
+def test_grant_always_rereads_the_row(db):
+    security.read_locker_state(1, '000000')
+    assert security.read_locker_state(1, '111111')[0] == 200
+    assert db['reads'] == 2
+
+def test_rotated_otp_is_never_granted_from_cache(db):
+    security.read_locker_state(1, '000000')
+    db['row'] = legacy_row('222222')
+
+    # El código viejo coincide con la entry pero la relectura lo rechaza
+    assert security.read_locker_state(1, '111111')[0] == 401
+    assert security.locker_cache.stats['stale'] == 1
+
+def test_staleness_is_bounded_by_ttl(db, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(security.time, 'monotonic', lambda: clock[0])
+    security.locker_cache = security.LockerStateCache(16, 2)
+    security.read_locker_state(1, '000000')
+    db['row'] = legacy_row('222222')
+
+    # Dentro del TTL el código nuevo todavía se rechaza con la entry vieja...
+    assert security.read_locker_state(1, '222222')[0] == 401
+    clock[0] += 2
+    # ...y al vencer se relee la fila
+    assert security.read_locker_state(1, '222222')[0] == 200
+
+def test_cache_disabled_reads_every_time(db, monkeypatch):
+    monkeypatch.setattr(security, 'locker_cache', security.LockerStateCache(0, 60))
+    for _ in range(3):
+        security.read_locker_state(1, '000000')
+    assert db['reads'] == 3
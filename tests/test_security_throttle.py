@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from conftest import load_lambda
+
+security = load_lambda('security')
+
+class CountingSink:
+    def __init__(self):
+        self.counts = {}
+
+    def record_count(self, locker_id, sort_key, increment=1, **attributes):
+        key = (locker_id, sort_key)
+        self.counts[key] = self.counts.get(key, 0) + increment
+
+@pytest.fixture
+def sink(monkeypatch):
+    sink = CountingSink()
+    monkeypatch.setattr(security, 'audit_sink', sink)
+    return sink
+
+def test_throttled_attempts_share_one_item_per_locker_and_window(sink, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(security.time, 'time', lambda: clock[0])
+    for _ in range(5):
+        security.note_throttled(9)
+        clock[0] += 1
+    security.note_throttled(10)
+    clock[0] += security.THROTTLE_AUDIT_INTERVAL_SECONDS
+    security.note_throttled(9)
+
+    assert sorted(sink.counts.values()) == [1, 1, 5]
+    assert {locker_id for locker_id, _ in sink.counts} == {'9', '10'}
+
+def test_throttled_response_carries_retry_after():
+    response = security.throttled_response(2.2)
+
+    assert response['statusCode'] == 429
+    assert json.loads(response['body'])['retry_after'] == 3
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+import queries
+from conftest import load_lambda
+
+sweeper = load_lambda('sweeper')
+
+def expired_db(expired):
+    """Devuelve hasta LIMIT lockers expirados de la lista, que se vacía al liberarlos."""
+    def handler(sql, args):
+        if sql == ' '.join(queries.EXPIRED_LOCKERS_FOR_UPDATE.split()):
+            return [{'id': i, 'current_user_id': 100 + i} for i in expired[:args[0]]]
+        if sql.startswith('UPDATE lockers SET status'):
+            del expired[:len(args)]
+        return []
+    return handler
+
+def test_sweeps_in_chunks_and_logs_each_locker(fake_db):
+    conn = fake_db(expired_db(list(range(1, 6))))
+
+    result = sweeper.sweep_expired_lockers(2)
+
+    assert (result['swept'], result['chunks']) == (5, 3)
+    logs = [args for sql, args in conn.executed if sql == ' '.join(queries.INSERT_SWEPT_ACCESS_LOG.split())]
+    assert logs == [(i, 100 + i) for i in range(1, 6)]
+    assert conn.commits == 3
+
+@pytest.mark.parametrize('chunk_size, limit', [(0, 1), (-5, 1), ('20', 20), (10 ** 9, 5000)])
+def test_event_chunk_size_is_clamped(fake_db, monkeypatch, chunk_size, limit):
+    monkeypatch.setattr(sweeper, 'SWEEP_MAX_CHUNK_SIZE', 5000)
+    conn = fake_db(expired_db([]))
+
+    response = sweeper.lambda_handler({'chunk_size': chunk_size}, None)
+
+    assert response['statusCode'] == 200
+    assert conn.executed[0][1] == (limit,)
+
+@pytest.mark.parametrize('chunk_size', ['abc', None, [1]])
+def test_invalid_chunk_size_is_rejected(fake_db, chunk_size):
+    conn = fake_db(expired_db([1]))
+
+    response = sweeper.lambda_handler({'chunk_size': chunk_size}, None)
+
+    assert response['statusCode'] == 400
+    assert 'chunk_size' in json.loads(response['body'])['message']
+    assert conn.executed == []
@@ -0,0 +1,44 @@
+import pytest
+
+import totp
+
+# Secreto y códigos de prueba del apéndice D de RFC 4226 ('12345678901234567890')
+RFC_SECRET = b'12345678901234567890'.hex()
+RFC_CODES = ['755224', '287082', '359152', '969429', '338314',
+             '254676', '287922', '162583', '399871', '520489']
+
+@pytest.mark.parametrize('step, code', list(enumerate(RFC_CODES)))
+def test_code_for_step_matches_rfc4226(step, code):
+    assert totp.code_for_step(RFC_SECRET, step) == code
+
+def test_current_code_reports_seconds_left_in_the_step():
+    at = 100 * totp.STEP_SECONDS + 4
+
+    code, remaining = totp.current_code(RFC_SECRET, at=at)
+
+    assert code == totp.code_for_step(RFC_SECRET, 100)
+    assert remaining == totp.STEP_SECONDS - 4
+
+@pytest.mark.parametrize('delta, accepted', [(-2, False), (-1, True), (0, True), (1, True), (2, False)])
+def test_verify_tolerates_one_step_of_skew(delta, accepted):
+    at = 100 * totp.STEP_SECONDS
+    code = totp.code_for_step(RFC_SECRET, 100 + delta)
+
+    assert totp.verify(RFC_SECRET, code, at=at) is accepted
+
+def test_verify_without_skew_accepts_only_the_current_step():
+    at = 100 * totp.STEP_SECONDS
+
+    assert totp.verify(RFC_SECRET, totp.code_for_step(RFC_SECRET, 100), skew=0, at=at)
+    assert not totp.verify(RFC_SECRET, totp.code_for_step(RFC_SECRET, 99), skew=0, at=at)
+
+def test_verify_accepts_integer_codes_and_rejects_missing_input():
+    assert totp.verify(RFC_SECRET, 755224, skew=0, at=0)
+    assert not totp.verify(None, '755224', at=0)
+    assert not totp.verify(RFC_SECRET, '', at=0)
+
+def test_generate_secret_fits_the_column():
+    secret = totp.generate_secret()
+
+    assert len(secret) == 40
+    assert secret != totp.generate_secret()
@@ -27,6 +27,8 @@ const Dashboard = () => {
     const storedId = localStorage.getItem('userId') || 1; // Fallback a 1 para pruebas
 
     if (!token) navigate('/login');
+    // Token firmado del login: las Lambdas identifican al usuario con él
+    if (token) axios.defaults.headers.common['Authorization'] = `Bearer ${token}`;
 
     setUser({
         name: storedName || 'Usuario',